@@ -0,0 +1,86 @@
+"""
+Concurrency limit that adapts by additive increase / multiplicative decrease.
+
+Callers hold a slot while they work (`with limiter:`) and report how each
+upstream call went (`limiter.observe(...)`). Fast successes grow the limit
+by about one slot per limit's worth of successes; a 429, an error or a
+response slower than the latency target shrinks it by a constant factor, at
+most once per cooldown so one burst of failures counts as one signal. The
+limit always stays between the floor and the ceiling.
+"""
+
+import logging
+import threading
+import time
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class AimdLimiter:
+    """Blocking slot limiter whose limit follows AIMD on observed latency, throttling and errors."""
+
+    def __init__(self, name: str, initial: int, floor: int, ceiling: int, latency_target: float,
+                 increase: float = 1.0, decrease_factor: float = 0.5, cooldown: float = 2.0):
+        self.name = name
+        self.floor = max(1, floor)
+        self.ceiling = max(self.floor, ceiling)
+        self.limit = float(min(max(initial, self.floor), self.ceiling))
+        self.latency_target = latency_target
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+        self._in_flight = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+        metrics.CONCURRENCY_LIMIT.labels(limiter=name).set(self.limit)
+
+    @property
+    def current_limit(self) -> int:
+        return int(self.limit)
+
+    def acquire(self):
+        with self._cond:
+            while self._in_flight >= int(self.limit):
+                self._cond.wait()
+            self._in_flight += 1
+
+    def release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+    def observe(self, outcome: str, latency: float = 0.0):
+        """
+        Feeds one upstream result into the limit. `outcome` is 'ok', 'throttled' or 'error';
+        an 'ok' slower than the latency target counts as congestion.
+        """
+        if outcome == 'ok' and latency > self.latency_target:
+            outcome = 'slow'
+        with self._cond:
+            previous = self.limit
+            if outcome == 'ok':
+                self.limit = min(self.ceiling, self.limit + self.increase / self.limit)
+                direction = 'increase'
+            else:
+                now = time.monotonic()
+                if now - self._last_decrease < self.cooldown:
+                    return
+                self._last_decrease = now
+                self.limit = max(self.floor, self.limit * self.decrease_factor)
+                direction = 'decrease'
+            if int(self.limit) == int(previous):
+                return
+            limit = self.limit
+            self._cond.notify_all()
+        metrics.CONCURRENCY_LIMIT.labels(limiter=self.name).set(limit)
+        metrics.CONCURRENCY_ADJUSTMENTS.labels(limiter=self.name, direction=direction, reason=outcome).inc()
+        logger.info(f"{self.name} concurrency {direction}d to {int(limit)} ({outcome})")
@@ -1,80 +1,55 @@
 # Lava_Stat_Checker/app.py
-from flask import Flask, render_template, jsonify, request, redirect, url_for
+from flask import Flask, render_template, jsonify, request, redirect, url_for, make_response, Response, stream_with_context
+from config import (
+    API_REQUEST_DEADLINE, BULK_MAX_USERS, BULK_MAX_CONCURRENCY, BULK_PLAYER_TIMEOUT, PAGE_REQUEST_DEADLINE,
+    SUGGEST_LIMIT, TRACE_SLOW_REQUEST_SECONDS, TRACE_TOKEN,
+)
 import hypixel_api
+import hypixel_budget
+import deadlines
+import http_cache
+import metrics
+import tracing
+import name_index
+import suggest
 import os
-import datetime
+import hmac
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from supabase_handler import supabase_handler
+from models import PlayerStats
 
 app = Flask(__name__)
+logger = logging.getLogger(__name__)
 
-# ... (keep existing setup code and helper functions like calculate_ratio, format_number, etc.) ...
 if not os.path.exists('static'): os.makedirs('static')
 if not os.path.exists('static/css'): os.makedirs('static/css')
 if not os.path.exists('static/js'): os.makedirs('static/js')
 if not os.path.exists('templates'): os.makedirs('templates')
 
-def calculate_ratio(numerator, denominator):
-    """Helper to calculate ratio, handling division by zero and None inputs."""
-    numerator = float(numerator) if numerator is not None else 0
-    denominator = float(denominator) if denominator is not None else 0
-    if denominator == 0:
-        return float(numerator) if numerator != 0 else 0.0
-    return round(numerator / denominator, 2)
-
-def calculate_win_rate(wins, games_played):
-    """Helper to calculate win rate, handling division by zero and None inputs."""
-    wins = float(wins) if wins is not None else 0
-    games_played = float(games_played) if games_played is not None else 0
-    if games_played == 0:
-        return 0.0
-    return round((wins / games_played) * 100, 2)
-
-def calculate_finals_per_game(final_kills, games_played):
-     """Helper to calculate finals per game, handling division by zero and None inputs."""
-     final_kills = float(final_kills) if final_kills is not None else 0
-     games_played = float(games_played) if games_played is not None else 0
-     if games_played == 0:
-        return final_kills
-     return round(final_kills / games_played, 2)
-
-def format_number(value):
-    """Formats a number with apostrophe as thousand separator, returns N/A for None/invalid."""
-    if value is None:
-        return 'N/A'
-    try:
-        return "{:,}".format(int(float(value))).replace(',', "'")
-    except (ValueError, TypeError):
-        return 'N/A'
-
-def time_ago(dt, now=None):
-    """Returns a 'time ago' string for a given datetime object."""
-    if now is None:
-        now = datetime.datetime.now()
-    diff = now - dt
-
-    seconds = int(diff.total_seconds())
-    if seconds < 5: # Consider anything less than 5 seconds as "just now"
-        return "just now"
-    if seconds < 60:
-        return f"{seconds} seconds ago"
-    minutes = round(seconds / 60)
-    if minutes < 60:
-        return f"{minutes} minutes ago"
-    hours = round(minutes / 60)
-    if hours < 24:
-        return f"{hours} hours ago"
-    days = round(hours / 24)
-    return f"{days} days ago"
-
-def get_safe_int(value):
-    """Converts a value to an integer, returning 0 if None or invalid."""
-    if value is None:
-        return 0
-    try:
-        return int(float(str(value).replace(',', '')))
-    except (ValueError, TypeError):
-        return 0
-        
+_background_started = False
+_background_lock = threading.Lock()
+
+def start_background_tasks():
+    """
+    Starts this worker's background loaders once: from gunicorn's post_worker_init (gunicorn.conf.py),
+    or on the first request elsewhere. Never at import, so importing the app stays cheap.
+    """
+    global _background_started
+    if _background_started:
+        return
+    with _background_lock:
+        if _background_started:
+            return
+        _background_started = True
+    # Fill the local name index from the names stored in Supabase (or another worker's seed)
+    name_index.seed_in_background()
+    # Search box suggestions: load known names, then keep pulling new ones
+    suggest.refresher.start()
+
 def get_safe_level(value):
     if value is None:
         return None
@@ -88,152 +63,71 @@ def get_safe_level(value):
     except ValueError:
         return None
 
-def transform_scrapper_data(scraped_data):
-    """
-    Transforms scrapper data from bwstats.shivam.pro to the app's standard structure.
-    """
-    if not scraped_data or scraped_data.get('error'):
-        return scraped_data
-
-    print(f"Debug transform_scrapper_data - Input keys: {scraped_data.keys() if scraped_data else 'None'}")
-    username = scraped_data.get('username')
-    player_uuid = None
-    if username:
-        try:
-            import requests
-            response = requests.get(f"https://api.mojang.com/users/profiles/minecraft/{username}", timeout=5)
-            if response.status_code == 200:
-                data = response.json()
-                if data and 'id' in data:
-                    player_uuid = data.get('id')
-        except Exception as e:
-            print(f"Error getting UUID from Mojang for {username}: {e}")
-
-    final_modes = {}
-    scraped_modes = scraped_data.get('modes', {})
-    print(f"Debug: scraped_modes keys: {scraped_modes.keys()}")
-    
-    # First, process all modes from the scraper
-    for mode_key, mode_data in scraped_modes.items():
-        processed_mode = {}
-        for key, value in mode_data.items():
-            # Always convert numerical stats to integers, ignore pre-calculated ratios from scraper
-            if key not in ['wlr', 'kdr', 'fkdr', 'bblr']:
-                processed_mode[key] = get_safe_int(value)
-
-        # Recalculate all ratios to ensure consistency
-        processed_mode['wlr'] = calculate_ratio(processed_mode.get('wins'), processed_mode.get('losses'))
-        processed_mode['kdr'] = calculate_ratio(processed_mode.get('kills'), processed_mode.get('deaths'))
-        processed_mode['fkdr'] = calculate_ratio(processed_mode.get('final_kills'), processed_mode.get('final_deaths'))
-        processed_mode['bblr'] = calculate_ratio(processed_mode.get('beds_broken'), processed_mode.get('beds_lost'))
-        processed_mode['win_rate'] = calculate_win_rate(processed_mode.get('wins'), processed_mode.get('games_played'))
-        processed_mode['finals_per_game'] = calculate_finals_per_game(processed_mode.get('final_kills'), processed_mode.get('games_played'))
-        final_modes[mode_key] = processed_mode
-
-    # Aggregate stats for 'Core Modes'
-    core_keys = ['solos', 'doubles', 'threes', 'fours']
-    core_agg = {
-        'wins': 0, 'losses': 0, 'final_kills': 0, 'final_deaths': 0, 'beds_broken': 0,
-        'beds_lost': 0, 'kills': 0, 'deaths': 0, 'games_played': 0
-    }
-    for mode_key in core_keys:
-        if mode_key in final_modes:
-            for stat in core_agg:
-                core_agg[stat] += final_modes[mode_key].get(stat, 0)
-
-    # Calculate ratios for core mode
-    core_agg['wlr'] = calculate_ratio(core_agg['wins'], core_agg['losses'])
-    core_agg['fkdr'] = calculate_ratio(core_agg['final_kills'], core_agg['final_deaths'])
-    core_agg['bblr'] = calculate_ratio(core_agg['beds_broken'], core_agg['beds_lost'])
-    core_agg['kdr'] = calculate_ratio(core_agg['kills'], core_agg['deaths'])
-    core_agg['win_rate'] = calculate_win_rate(core_agg['wins'], core_agg['games_played'])
-    core_agg['finals_per_game'] = calculate_finals_per_game(core_agg['final_kills'], core_agg['games_played'])
-    final_modes['core'] = core_agg
-
-    # Calculate 4v4 stats
-    if 'overall' in final_modes and 'core' in final_modes:
-        overall_stats = final_modes['overall']
-        core_stats = final_modes['core']
-        v4_stats = {}
-        for stat in core_stats:
-            if stat not in ['wlr', 'fkdr', 'bblr', 'kdr', 'win_rate', 'finals_per_game']:
-                v4_stats[stat] = overall_stats.get(stat, 0) - core_stats.get(stat, 0)
-
-        v4_stats['wlr'] = calculate_ratio(v4_stats.get('wins'), v4_stats.get('losses'))
-        v4_stats['fkdr'] = calculate_ratio(v4_stats.get('final_kills'), v4_stats.get('final_deaths'))
-        v4_stats['bblr'] = calculate_ratio(v4_stats.get('beds_broken'), v4_stats.get('beds_lost'))
-        v4_stats['kdr'] = calculate_ratio(v4_stats.get('kills'), v4_stats.get('deaths'))
-        v4_stats['win_rate'] = calculate_win_rate(v4_stats.get('wins'), v4_stats.get('games_played'))
-        v4_stats['finals_per_game'] = calculate_finals_per_game(v4_stats.get('final_kills'), v4_stats.get('games_played'))
-        final_modes['4v4'] = v4_stats
-
-    level = scraped_data.get("star", 0)
-    # Try to parse level as int if it's a string
-    if isinstance(level, str):
-        try:
-            level = int(level)
-        except (ValueError, TypeError):
-            level = 0
-    
-    overall_fk = final_modes.get('overall', {}).get('final_kills', 0)
-    if level and overall_fk:
-        final_modes.get('overall', {})['finals_per_star'] = round(overall_fk / level, 2)
-    
-    transformed = {
-        'username': username,
-        'uuid': player_uuid,
-        'rank_info': {'display_rank': 'LAVA'},
-        'level': level,
-        'most_played_gamemode': 'N/A',
-        'overall': final_modes.get('overall'),
-        'modes': final_modes,
-        'fetched_by': scraped_data.get('fetched_by', 'scrapper'),  # Preserve original fetched_by
-        'original_search': username,
-        'last_updated': scraped_data.get('last_updated')
-    }
-    
-    if transformed.get('overall'):
-        transformed['overall']['bedwars_slumber_ticket_master'] = None # Not available from this source
-
-    return transformed
-
-# ... (The rest of your app.py file remains the same) ...
-
 def format_stats_for_display(stats_data):
-    """Formats numerical stats and calculates ratios for display."""
-    if not stats_data:
-        return stats_data
-
-    # Handle overall and mode sections
-    sections_to_format = []
-    if 'overall' in stats_data and stats_data['overall'] is not None:
-        sections_to_format.append(stats_data['overall'])
-    if 'modes' in stats_data:
-        for mode_key, mode_data in stats_data['modes'].items():
-             if mode_data is not None and mode_key != 'overall':
-                sections_to_format.append(mode_data)
-
-
-    for section in sections_to_format:
-        for key in ['wins', 'losses', 'final_kills', 'final_deaths', 'beds_broken', 'beds_lost', 'kills', 'deaths', 'coins', 'games_played', 'bedwars_slumber_ticket_master']:
-            section[f'{key}_formatted'] = format_number(section.get(key))
-
-        for ratio_key in ['wlr', 'fkdr', 'bblr', 'kdr', 'win_rate', 'finals_per_star', 'finals_per_game']:
-             value = section.get(ratio_key)
-             # Try to convert to float, ignoring non-numeric values like '-'
-             try:
-                 float_value = float(value)
-             except (ValueError, TypeError, AttributeError):
-                 float_value = None
-
-             if float_value is not None:
-                  section[ratio_key] = "{:,.2f}".format(float_value)
-             else:
-                 # If value is a non-numeric string (like '-'), display it as is, otherwise 'N/A'
-                 section[ratio_key] = value if isinstance(value, str) and not value.replace('.','',1).isdigit() else 'N/A'
-                 
+    """Builds the display shape (`*_formatted` strings, two-decimal ratios) of a PlayerStats model; error dicts pass through."""
+    if isinstance(stats_data, PlayerStats):
+        return stats_data.to_display()
     return stats_data
 
+def trace_requested():
+    """Debug tracing is returned to clients that send TRACE_TOKEN as the X-Lava-Trace header."""
+    if not TRACE_TOKEN:
+        return False
+    return hmac.compare_digest(request.headers.get('X-Lava-Trace', '').encode(), TRACE_TOKEN.encode())
+
+@app.before_request
+def ensure_background_tasks():
+    start_background_tasks()
+
+@app.before_request
+def start_request_timer():
+    request.environ['lava.start_time'] = time.perf_counter()
+    # Trace every request when the slow-request log is on, so slow ones can be explained afterwards
+    if trace_requested() or TRACE_SLOW_REQUEST_SECONDS > 0:
+        request.environ['lava.trace'] = tracing.start_trace(request.path, method=request.method)
+
+@app.after_request
+def record_request_latency(response):
+    start = request.environ.get('lava.start_time')
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.REQUEST_LATENCY.labels(route=route, status=str(response.status_code)).observe(time.perf_counter() - start)
+    return response
+
+@app.after_request
+def attach_trace(response):
+    trace = request.environ.pop('lava.trace', None)
+    if trace is None:
+        return response
+    root, token = trace
+    tracing.finish_trace(root, token)
+    tracing.log_slow_trace(root, TRACE_SLOW_REQUEST_SECONDS)
+
+    if trace_requested():
+        response.headers['Server-Timing'] = tracing.server_timing(root)
+        # Attach the full span tree to JSON bodies (e.g. /api/player); caches store the untraced body
+        if response.is_json and not response.is_streamed and response.status_code != 304:
+            payload = response.get_json(silent=True)
+            if isinstance(payload, dict):
+                payload['_trace'] = root.to_dict()
+                response.set_data(json.dumps(payload))
+        response.headers['Cache-Control'] = 'no-store'
+    return response
+
+@app.teardown_request
+def discard_trace(exc):
+    # after_request is skipped on unhandled errors; never leave a trace current on this thread
+    trace = request.environ.pop('lava.trace', None)
+    if trace is not None:
+        root, token = trace
+        tracing.finish_trace(root, token)
+        tracing.log_slow_trace(root, TRACE_SLOW_REQUEST_SECONDS)
+
+@app.route('/metrics')
+def metrics_endpoint():
+    body, content_type = metrics.render_latest()
+    return Response(body, mimetype=None, content_type=content_type)
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -244,10 +138,17 @@ def player_stats_page():
     if not username:
         return redirect(url_for('index'))
 
-    result_data = hypixel_api.fetch_player_data(username)
+    cache_key = ('player', username.lower())
+    cached_response = http_cache.serve_cached(cache_key)
+    if cached_response is not None:
+        suggest.suggest_index.record_lookup(username)
+        return cached_response
+
+    with deadlines.deadline(PAGE_REQUEST_DEADLINE):
+        result_data = hypixel_api.fetch_player_data(username)
 
     if result_data and result_data.get('error') == 'name_changed':
-        print(f"App: Handling name change error for {username}.")
+        logger.info(f"Handling name change error for {username}.")
         return render_template('stats.html',
                                error_type='name_changed',
                                original_search=result_data.get('original_search'),
@@ -255,7 +156,7 @@ def player_stats_page():
                                uuid=result_data.get('uuid'))
 
     if result_data and result_data.get('error'):
-         print(f"App: Handling general error for {username}. Error: {result_data.get('error')}. Source: {result_data.get('fetched_by')}.")
+         logger.info(f"Handling general error for {username}. Error: {result_data.get('error')}. Source: {result_data.get('fetched_by')}.")
          return render_template('stats.html',
                                 error=result_data.get('error'),
                                 username=result_data.get('original_search', username),
@@ -263,31 +164,29 @@ def player_stats_page():
                                 )
 
     if result_data:
-         print(f"App: Successfully fetched data for {username} via {result_data.get('fetched_by')}.")
-         fetched_time = datetime.datetime.now()
-
-         # Check both 'scrapper' and 'scraper' for compatibility
-         if result_data.get('fetched_by') in ['scrapper', 'scraper']:
-             print(f"Debug: Transforming scraper data. Keys: {result_data.keys()}")
-             if 'modes' in result_data and 'overall' in result_data.get('modes', {}):
-                 print(f"Debug: Overall stats keys: {result_data['modes']['overall'].keys()}")
-             stats_for_display = transform_scrapper_data(result_data)
-         else:
-             stats_for_display = result_data
-
-         formatted_stats = format_stats_for_display(stats_for_display)
-         
-         # Use the scraped timestamp if available, otherwise use the current time
-         if stats_for_display.get('fetched_by') == 'scrapper' and 'last_updated' in stats_for_display:
-             fetched_time = datetime.datetime.fromisoformat(stats_for_display['last_updated'])
-         else:
-             fetched_time = datetime.datetime.now()
-
-         formatted_stats['fetched_at'] = time_ago(fetched_time)
-
-         return render_template('stats.html', stats=formatted_stats, username=stats_for_display.get('username', username))
+         logger.info(f"Successfully fetched data for {username} via {result_data.get('fetched_by')}.")
+         suggest.suggest_index.record_lookup(result_data.get('username') or username)
+
+         stats_for_display = result_data
+
+         version = http_cache.data_version(stats_for_display)
+
+         def render_stats():
+             formatted_stats = format_stats_for_display(stats_for_display)
+
+             # The page is cached per data version, so it carries the absolute fetch time;
+             # main.js turns it into "3 minutes ago" when the page is shown
+             fetched_time = http_cache.data_timestamp(stats_for_display)
+             formatted_stats['fetched_at'] = fetched_time.strftime('%Y-%m-%d %H:%M UTC')
+             formatted_stats['fetched_at_iso'] = fetched_time.isoformat()
+
+             with metrics.timed('render'):
+                 return render_template('stats.html', stats=formatted_stats, username=stats_for_display.get('username', username))
+
+         html = http_cache.render_fragment(version, stats_for_display, render_stats)
+         return http_cache.finalize(cache_key, make_response(html), stats_for_display, etag=version)
     else:
-         print(f"App: Unknown error or no data returned for {username}.")
+         logger.warning(f"Unknown error or no data returned for {username}.")
          return render_template('stats.html', error="Unknown error fetching data.", username=username)
 
 
@@ -299,7 +198,8 @@ def compare_stats_page():
     if not user1_orig or not user2_orig:
          return redirect(url_for('index'))
     
-    stats_dict_results = hypixel_api.fetch_multiple_player_data([user1_orig, user2_orig])
+    with deadlines.deadline(PAGE_REQUEST_DEADLINE):
+        stats_dict_results = hypixel_api.fetch_multiple_player_data([user1_orig, user2_orig])
 
     stats1_result = stats_dict_results.get(user1_orig.lower())
     stats2_result = stats_dict_results.get(user2_orig.lower())
@@ -314,32 +214,38 @@ def compare_stats_page():
         if stats_data.get('error'):
              return stats_data
 
-        if stats_data.get('fetched_by') == 'scrapper':
-             transformed_stats = transform_scrapper_data(stats_data)
-             return transformed_stats
-        else:
-             return format_stats_for_display(stats_data) 
+        return format_stats_for_display(stats_data)
 
 
     stats1_processed = prepare_stats_for_compare(stats1_result)
     stats2_processed = prepare_stats_for_compare(stats2_result)
 
-    return render_template('compare.html',
-        user1=user1_orig,
-        user2=user2_orig,
-        stats1=stats1_processed,
-        stats2=stats2_processed)
+    with metrics.timed('render'):
+        return render_template('compare.html',
+            user1=user1_orig,
+            user2=user2_orig,
+            stats1=stats1_processed,
+            stats2=stats2_processed)
 
 
+def prepare_api_stats(result_data):
+    """Formats any result (model or error dict) for the JSON API."""
+    return format_stats_for_display(result_data)
+
 @app.route('/api/player/<username>', methods=['GET'])
 def api_get_player_stats(username):
-    result_data = hypixel_api.fetch_player_data(username)
+    cache_key = ('api_player', username.lower())
+    cached_response = http_cache.serve_cached(cache_key)
+    if cached_response is not None:
+        suggest.suggest_index.record_lookup(username)
+        return cached_response
 
-    if result_data and result_data.get('fetched_by') == 'scrapper' and not result_data.get('error'):
-        stats_for_api = transform_scrapper_data(result_data)
-    else:
-        stats_for_api = result_data 
+    with deadlines.deadline(API_REQUEST_DEADLINE):
+        result_data = hypixel_api.fetch_player_data(username)
 
+    stats_for_api = result_data
+
+    version = http_cache.data_version(stats_for_api) if stats_for_api else None
     formatted_api_stats = format_stats_for_display(stats_for_api)
 
 
@@ -350,10 +256,20 @@ def api_get_player_stats(username):
 
          return jsonify(formatted_api_stats), status_code
     elif formatted_api_stats:
-        return jsonify(formatted_api_stats), 200
+        suggest.suggest_index.record_lookup(formatted_api_stats.get('username') or username)
+        return http_cache.finalize(cache_key, jsonify(formatted_api_stats), formatted_api_stats, etag=version)
     else:
         return jsonify({"error": "Unknown server error fetching player data.", "fetched_by": "unknown"}), 500
 
+@app.route('/api/suggest', methods=['GET'])
+def api_suggest():
+    """Known usernames starting with `q`, most looked-up first; "did you mean" corrections when none do."""
+    query = request.args.get('q', '').strip()
+    limit = min(max(request.args.get('limit', SUGGEST_LIMIT, type=int), 1), suggest.TOP_SIZE)
+    response = jsonify({'query': query, **suggest.suggest_index.suggest(query, limit)})
+    response.headers['Cache-Control'] = 'public, max-age=60'
+    return response
+
 @app.route('/api/compare', methods=['GET'])
 def api_compare_players():
     usernames_str = request.args.get('users')
@@ -363,22 +279,93 @@ def api_compare_players():
     if len(usernames) < 2:
          return jsonify({"error": "At least two usernames required for comparison"}), 400
 
-    stats_dict_results = hypixel_api.fetch_multiple_player_data(usernames)
+    with deadlines.deadline(API_REQUEST_DEADLINE):
+        stats_dict_results = hypixel_api.fetch_multiple_player_data(usernames)
 
     api_output_results = {}
     for username, result_data in stats_dict_results.items():
-         if result_data and result_data.get('fetched_by') == 'scrapper' and not result_data.get('error'):
-             transformed_stats = transform_scrapper_data(result_data)
-         else:
-             transformed_stats = result_data
-
-         api_output_results[username] = format_stats_for_display(transformed_stats)
+         api_output_results[username] = prepare_api_stats(result_data)
 
 
     has_critical_error = any(res and res.get('error') and res.get('error') != 'name_changed' for res in api_output_results.values())
     status_code = 500 if has_critical_error else 200
     return jsonify(api_output_results), status_code
 
+@app.route('/api/bulk', methods=['GET'])
+def api_bulk_players():
+    """
+    Streams one NDJSON line per player as soon as that player resolves.
+    Query params: users (comma separated), optional concurrency and timeout (seconds).
+    """
+    usernames_str = request.args.get('users')
+    if not usernames_str:
+        return jsonify({"error": "No usernames provided"}), 400
+    usernames = list(dict.fromkeys(name.strip() for name in usernames_str.split(',') if name.strip()))
+    if len(usernames) > BULK_MAX_USERS:
+        return jsonify({"error": f"At most {BULK_MAX_USERS} usernames per request"}), 400
+
+    concurrency = min(max(request.args.get('concurrency', BULK_MAX_CONCURRENCY, type=int), 1), BULK_MAX_CONCURRENCY)
+    player_timeout = min(max(request.args.get('timeout', BULK_PLAYER_TIMEOUT, type=float), 1.0), BULK_PLAYER_TIMEOUT)
+
+    def fetch_one(username, handle):
+        # Bulk lookups run as prefetch so they cannot eat the Hypixel budget reserved for single lookups.
+        # `handle` ends a little before the stream gives up on this player, so stale cache can still be sent,
+        # and is cancelled when the stream does give up, so the lookup stops instead of holding its thread
+        with hypixel_budget.priority('prefetch'), deadlines.use(handle):
+            return prepare_api_stats(hypixel_api.fetch_player_data(username))
+
+    def generate():
+        executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="bulk_lookup")
+        pending = {}
+        # Timed-out lookups still winding down; their threads are not free for new lookups yet
+        abandoned = set()
+        queue = list(usernames)
+        try:
+            while queue or pending:
+                abandoned = {future for future in abandoned if not future.done()}
+                # Keep at most `concurrency` lookups on threads; the timeout clock starts at submission
+                while queue and len(pending) + len(abandoned) < concurrency:
+                    username = queue.pop(0)
+                    submitted = time.monotonic()
+                    handle = deadlines.Deadline(submitted + player_timeout * 0.9)
+                    pending[executor.submit(fetch_one, username, handle)] = (username, submitted + player_timeout, handle)
+
+                if not pending:
+                    wait(abandoned, timeout=player_timeout, return_when=FIRST_COMPLETED)
+                    continue
+                next_deadline = min(deadline for _, deadline, _ in pending.values())
+                done, _ = wait(set(pending) | abandoned, timeout=max(0.0, next_deadline - time.monotonic()),
+                               return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    if future not in pending:
+                        continue
+                    username, _, _ = pending.pop(future)
+                    try:
+                        stats = future.result()
+                        line = {"username": username, "stats": stats}
+                        if not stats:
+                            line = {"username": username, "error": "Unknown server error fetching player data."}
+                    except Exception as e:
+                        logger.exception(f"Bulk lookup failed for {username}: {e}")
+                        line = {"username": username, "error": f"Internal error: {e}"}
+                    yield json.dumps(line) + "\n"
+
+                now = time.monotonic()
+                for future, (username, deadline, handle) in list(pending.items()):
+                    if deadline <= now and not future.done():
+                        # Threads cannot be interrupted: expire the lookup's deadline so it stops at its next step
+                        pending.pop(future)
+                        handle.cancel()
+                        abandoned.add(future)
+                        yield json.dumps({"username": username, "error": "timeout", "timeout": player_timeout}) + "\n"
+        finally:
+            for _, _, handle in pending.values():
+                handle.cancel()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
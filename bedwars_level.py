@@ -0,0 +1,71 @@
+"""
+Bedwars experience <-> level conversion.
+
+Every prestige is 100 levels and costs the same 487,000 exp: the first four
+levels cost 500, 1,000, 2,000 and 3,500 exp, every other level 5,000.
+`LEVEL_START` holds the cumulative exp at the start of each level within a
+prestige, built once at import, so a conversion is one divmod and one
+bisect instead of a branch chain. `levels_from_exp` converts a whole batch
+of Experience values with the same table.
+"""
+
+from bisect import bisect_right
+from itertools import accumulate
+from typing import Any, Dict, Iterable, List
+
+LEVELS_PER_PRESTIGE = 100
+EASY_LEVEL_COSTS = (500, 1000, 2000, 3500)
+LEVEL_COST = 5000
+
+# Exp cost of each level within a prestige, and the cumulative exp at which each level starts
+LEVEL_COSTS = EASY_LEVEL_COSTS + (LEVEL_COST,) * (LEVELS_PER_PRESTIGE - len(EASY_LEVEL_COSTS))
+LEVEL_START = (0,) + tuple(accumulate(LEVEL_COSTS))[:-1]
+PRESTIGE_EXP = sum(LEVEL_COSTS)
+
+
+def _clean_exp(exp: Any) -> float:
+    """Experience as a non-negative number; missing, negative or non-numeric values count as 0."""
+    if isinstance(exp, bool) or not isinstance(exp, (int, float)) or exp != exp or exp < 0:
+        return 0
+    return exp
+
+
+def level_from_exp(exp: Any) -> float:
+    """Fractional level for a Hypixel Bedwars Experience value, e.g. 2000 -> 2.25."""
+    prestige, remainder = divmod(_clean_exp(exp), PRESTIGE_EXP)
+    index = bisect_right(LEVEL_START, remainder) - 1
+    return prestige * LEVELS_PER_PRESTIGE + index + (remainder - LEVEL_START[index]) / LEVEL_COSTS[index]
+
+
+def levels_from_exp(exps: Iterable[Any]) -> List[float]:
+    """Fractional levels for a batch of Experience values, in the same order."""
+    starts, costs, prestige_exp = LEVEL_START, LEVEL_COSTS, PRESTIGE_EXP
+    levels = []
+    for exp in exps:
+        prestige, remainder = divmod(_clean_exp(exp), prestige_exp)
+        index = bisect_right(starts, remainder) - 1
+        levels.append(prestige * LEVELS_PER_PRESTIGE + index + (remainder - starts[index]) / costs[index])
+    return levels
+
+
+def exp_for_level(level: int) -> int:
+    """Total Experience needed to reach a given star, e.g. 100 -> 487000."""
+    prestige, index = divmod(max(int(level), 0), LEVELS_PER_PRESTIGE)
+    return prestige * PRESTIGE_EXP + LEVEL_START[index]
+
+
+def prestige_progress(exp: Any) -> Dict[str, Any]:
+    """Where an Experience value sits within its level and prestige."""
+    exp = _clean_exp(exp)
+    prestige, remainder = divmod(exp, PRESTIGE_EXP)
+    index = bisect_right(LEVEL_START, remainder) - 1
+    into_level = remainder - LEVEL_START[index]
+    return {
+        'level': int(prestige * LEVELS_PER_PRESTIGE + index),
+        'prestige': int(prestige),
+        'exp_into_level': into_level,
+        'exp_to_next_level': LEVEL_COSTS[index] - into_level,
+        'exp_into_prestige': remainder,
+        'exp_to_next_prestige': PRESTIGE_EXP - remainder,
+        'prestige_percent': round(remainder / PRESTIGE_EXP * 100, 2),
+    }
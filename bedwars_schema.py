@@ -0,0 +1,110 @@
+"""
+Declarative layout of Bedwars stats: which modes exist, how Hypixel names
+their counters and how bwstats.shivam.pro labels them.
+
+Hypixel stores every counter as a flat `<mode prefix><stat suffix>` key in
+`stats.Bedwars` (`eight_one_wins_bedwars`, `castle_final_kills_bedwars`, ...).
+`KEY_INDEX` maps each of those full keys to its (mode, stat) pair once at
+import, so `extract_bedwars` buckets a player's stats in a single pass over
+the keys that are actually present. Adding a mode is one entry in `MODES`.
+"""
+
+from typing import Any, Dict
+
+# mode key -> (Hypixel key prefix, display title, bwstats column header or None, group)
+# group: 'core' modes are summed into the Core view, 'standard' modes are always shown,
+# 'dreams' modes are shown only when the player has stats for them
+MODES = {
+    'solos': ('eight_one_', 'Solos', 'Solo', 'core'),
+    'doubles': ('eight_two_', 'Doubles', 'Doubles', 'core'),
+    'threes': ('four_three_', 'Threes', '3v3v3v3', 'core'),
+    'fours': ('four_four_', 'Fours', '4v4v4v4', 'core'),
+    '4v4': ('two_four_', '4v4', '4v4', 'standard'),
+    'rush_doubles': ('eight_two_rush_', 'Rush Doubles', None, 'dreams'),
+    'rush_fours': ('four_four_rush_', 'Rush Fours', None, 'dreams'),
+    'ultimate_doubles': ('eight_two_ultimate_', 'Ultimate Doubles', None, 'dreams'),
+    'ultimate_fours': ('four_four_ultimate_', 'Ultimate Fours', None, 'dreams'),
+    'lucky_doubles': ('eight_two_lucky_', 'Lucky Doubles', None, 'dreams'),
+    'lucky_fours': ('four_four_lucky_', 'Lucky Fours', None, 'dreams'),
+    'voidless_doubles': ('eight_two_voidless_', 'Voidless Doubles', None, 'dreams'),
+    'voidless_fours': ('four_four_voidless_', 'Voidless Fours', None, 'dreams'),
+    'armed_doubles': ('eight_two_armed_', 'Armed Doubles', None, 'dreams'),
+    'armed_fours': ('four_four_armed_', 'Armed Fours', None, 'dreams'),
+    'swappage_doubles': ('eight_two_swap_', 'Swappage Doubles', None, 'dreams'),
+    'swappage_fours': ('four_four_swap_', 'Swappage Fours', None, 'dreams'),
+    'underworld_doubles': ('eight_two_underworld_', 'Underworld Doubles', None, 'dreams'),
+    'underworld_fours': ('four_four_underworld_', 'Underworld Fours', None, 'dreams'),
+    'castle': ('castle_', 'Castle', None, 'dreams'),
+}
+
+# stat -> Hypixel key suffix
+STAT_SUFFIXES = {
+    'wins': 'wins_bedwars',
+    'losses': 'losses_bedwars',
+    'games_played': 'games_played_bedwars',
+    'kills': 'kills_bedwars',
+    'deaths': 'deaths_bedwars',
+    'final_kills': 'final_kills_bedwars',
+    'final_deaths': 'final_deaths_bedwars',
+    'beds_broken': 'beds_broken_bedwars',
+    'beds_lost': 'beds_lost_bedwars',
+    'winstreak': 'winstreak',
+    'items_purchased': 'items_purchased_bedwars',
+}
+# Overall counters whose key is not simply the suffix
+OVERALL_KEYS = {'items_purchased': '_items_purchased_bedwars'}
+
+# bwstats table row label -> stat (ratio rows are recomputed from the counters)
+SCRAPER_STAT_LABELS = {
+    'Games Played': 'games_played',
+    'Wins': 'wins',
+    'Losses': 'losses',
+    'Kills': 'kills',
+    'Deaths': 'deaths',
+    'Final Kills': 'final_kills',
+    'Final Deaths': 'final_deaths',
+    'Beds Broken': 'beds_broken',
+    'Beds Lost': 'beds_lost',
+    'Winstreak': 'winstreak',
+    'Items Purchased': 'items_purchased',
+}
+# bwstats column header -> mode key
+SCRAPER_MODE_HEADERS = {'Overall': 'overall'}
+SCRAPER_MODE_HEADERS.update({header: mode for mode, (_, _, header, _) in MODES.items() if header})
+
+CORE_MODES = tuple(mode for mode, (_, _, _, group) in MODES.items() if group == 'core')
+STANDARD_MODES = tuple(mode for mode, (_, _, _, group) in MODES.items() if group in ('core', 'standard'))
+MODE_TITLES = {mode: title for mode, (_, title, _, _) in MODES.items()}
+
+
+def _build_key_index():
+    index = {}
+    for stat, suffix in STAT_SUFFIXES.items():
+        index[OVERALL_KEYS.get(stat, suffix)] = ('overall', stat)
+        for mode, (prefix, _, _, _) in MODES.items():
+            index[prefix + suffix] = (mode, stat)
+    return index
+
+
+# Full Hypixel key -> (mode, stat), e.g. 'eight_two_rush_final_kills_bedwars' -> ('rush_doubles', 'final_kills')
+KEY_INDEX = _build_key_index()
+
+
+def extract_bedwars(bw_stats: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    Buckets every known counter of a Hypixel stats.Bedwars object by mode
+    ('overall' for the unprefixed totals) in one pass over its keys.
+    Modes without any key present are absent from the result.
+    """
+    buckets = {}
+    lookup = KEY_INDEX.get
+    for key, value in bw_stats.items():
+        target = lookup(key)
+        if target is None:
+            continue
+        mode, stat = target
+        bucket = buckets.get(mode)
+        if bucket is None:
+            bucket = buckets[mode] = {}
+        bucket[stat] = value
+    return buckets
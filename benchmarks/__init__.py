@@ -0,0 +1 @@
+"""Offline benchmarks and load tests run against local stand-ins for every upstream."""
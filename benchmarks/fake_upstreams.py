@@ -0,0 +1,289 @@
+"""
+Local stand-ins for every upstream the app talks to, on one threaded HTTP server:
+
+    /hypixel/v2/player?uuid=...|name=...          Hypixel player endpoint
+    /mojang/users/profiles/minecraft/<name>       Mojang profile lookup
+    /bwstats/user/<name>                          bwstats.shivam.pro HTML page
+    /supabase/rest/v1/<table> and /rpc/<fn>       PostgREST subset used by supabase-py
+
+Latency, error rate and 429 rate are configurable per upstream, and every call
+is counted so callers can report upstream amplification.
+"""
+
+import datetime
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import parse_qs, unquote, urlparse
+
+from benchmarks import fixtures
+
+UPSTREAMS = ('hypixel', 'mojang', 'bwstats', 'supabase')
+
+
+class UpstreamProfile:
+    """Behaviour of one fake upstream."""
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0, rate_limit_rate: float = 0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+
+    @classmethod
+    def parse(cls, spec: str) -> 'UpstreamProfile':
+        """Builds a profile from 'latency_ms=50,jitter_ms=10,error_rate=0.01,rate_limit_rate=0'."""
+        values = {}
+        for item in spec.split(','):
+            key, _, value = item.partition('=')
+            if key.strip():
+                values[key.strip()] = float(value)
+        return cls(**values)
+
+    def to_dict(self):
+        return {'latency_ms': self.latency_ms, 'jitter_ms': self.jitter_ms,
+                'error_rate': self.error_rate, 'rate_limit_rate': self.rate_limit_rate}
+
+
+def build_profiles(latency_ms: float = 0.0, error_rate: float = 0.0, overrides=()) -> Dict[str, UpstreamProfile]:
+    """Same latency/error rate for every upstream, then 'upstream:spec' overrides (see UpstreamProfile.parse)."""
+    profiles = {name: UpstreamProfile(latency_ms=latency_ms, error_rate=error_rate) for name in UPSTREAMS}
+    for item in overrides:
+        upstream, _, spec = item.partition(':')
+        if upstream not in profiles:
+            raise ValueError(f"Unknown upstream '{upstream}', expected one of {', '.join(UPSTREAMS)}")
+        profiles[upstream] = UpstreamProfile.parse(spec)
+    return profiles
+
+
+class SupabaseStore:
+    """In-memory tables with the PostgREST filters supabase-py emits (eq, ilike, gte, lte, order, limit)."""
+
+    def __init__(self):
+        self.tables: Dict[str, list] = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _matches(row, filters):
+        for column, expression in filters.items():
+            op, _, operand = expression.partition('.')
+            value = row.get(column)
+            if op == 'eq' and str(value) != operand:
+                return False
+            if op == 'ilike' and str(value).lower() != operand.replace('*', '').lower():
+                return False
+            if op == 'gte' and not (value is not None and str(value) >= operand):
+                return False
+            if op == 'lte' and not (value is not None and str(value) <= operand):
+                return False
+        return True
+
+    def select(self, table, query):
+        filters = {key: values[0] for key, values in query.items() if key not in ('select', 'order', 'limit')}
+        with self.lock:
+            rows = [dict(row) for row in self.tables.get(table, []) if self._matches(row, filters)]
+        if 'order' in query:
+            column, _, direction = query['order'][0].partition('.')
+            rows.sort(key=lambda row: str(row.get(column, '')), reverse=direction.startswith('desc'))
+        if 'limit' in query:
+            rows = rows[:int(query['limit'][0])]
+        return rows
+
+    def insert(self, table, body):
+        rows = body if isinstance(body, list) else [body]
+        now = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        with self.lock:
+            stored = self.tables.setdefault(table, [])
+            for row in rows:
+                row.setdefault('created_at', now)
+                row.setdefault('updated_at', now)
+                stored.append(dict(row))
+        return rows
+
+    def update(self, table, query, body):
+        filters = {key: values[0] for key, values in query.items() if key != 'select'}
+        updated = []
+        with self.lock:
+            for row in self.tables.get(table, []):
+                if self._matches(row, filters):
+                    row.update(body)
+                    updated.append(dict(row))
+        return updated
+
+    def rpc(self, function, args):
+        if function == 'get_latest_stats_by_ign':
+            rows = self.select('stats', {'player_name': [f"ilike.{args.get('p_ign', '')}"]})
+        elif function == 'get_latest_stats':
+            rows = self.select('stats', {'player_uuid': [f"eq.{args.get('p_uuid', '')}"]})
+        else:
+            return []
+        rows.sort(key=lambda row: row.get('updated_at', ''), reverse=True)
+        return rows[:1]
+
+
+class FakeUpstreams:
+    """Runs the fake upstream server on a background thread."""
+
+    def __init__(self, profiles: Optional[Dict[str, UpstreamProfile]] = None, host: str = '127.0.0.1', port: int = 0,
+                 hypixel_padding_kb: int = 0):
+        self.profiles = {name: UpstreamProfile() for name in UPSTREAMS}
+        self.profiles.update(profiles or {})
+        self.hypixel_padding_kb = hypixel_padding_kb
+        self.store = SupabaseStore()
+        self.calls = {name: 0 for name in UPSTREAMS}
+        self.statuses: Dict[str, Dict[int, int]] = {name: {} for name in UPSTREAMS}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def env(self) -> Dict[str, str]:
+        """Environment variables pointing the app's config at this server."""
+        return {
+            'HYPIXEL_API_BASE': f"{self.base_url}/hypixel/v2",
+            'MOJANG_PROFILE_URL': f"{self.base_url}/mojang/users/profiles/minecraft/",
+            'BWSTATS_USER_URL': f"{self.base_url}/bwstats/user/",
+            'SUPABASE_URL': f"{self.base_url}/supabase",
+            'SUPABASE_ANON_KEY': 'benchmark-anon-key',
+        }
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake_upstreams', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset_counters(self):
+        with self._lock:
+            self.calls = {name: 0 for name in UPSTREAMS}
+            self.statuses = {name: {} for name in UPSTREAMS}
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            return {'calls': dict(self.calls), 'statuses': {name: dict(codes) for name, codes in self.statuses.items()}}
+
+    def _record(self, upstream, status):
+        with self._lock:
+            self.calls[upstream] += 1
+            codes = self.statuses[upstream]
+            codes[status] = codes.get(status, 0) + 1
+
+    def _handler_class(self):
+        upstreams = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, upstream, status, body=b'', content_type='application/json'):
+                if isinstance(body, (dict, list)):
+                    body = json.dumps(body).encode('utf-8')
+                elif isinstance(body, str):
+                    body = body.encode('utf-8')
+                upstreams._record(upstream, status)
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _simulate(self, upstream) -> bool:
+                """Applies latency and injected failures; returns False if a failure was sent."""
+                profile = upstreams.profiles[upstream]
+                delay = profile.latency_ms + random.uniform(-profile.jitter_ms, profile.jitter_ms)
+                if delay > 0:
+                    time.sleep(delay / 1000.0)
+                roll = random.random()
+                if roll < profile.rate_limit_rate:
+                    self._send(upstream, 429, {'success': False, 'cause': 'Key throttle'})
+                    return False
+                if roll < profile.rate_limit_rate + profile.error_rate:
+                    self._send(upstream, 500, {'success': False, 'cause': 'Injected error'})
+                    return False
+                return True
+
+            def _read_body(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                if not length:
+                    return None
+                return json.loads(self.rfile.read(length) or b'null')
+
+            def _route(self, method):
+                parsed = urlparse(self.path)
+                path = unquote(parsed.path)
+                query = parse_qs(parsed.query)
+                upstream = path.strip('/').split('/', 1)[0]
+                if upstream not in upstreams.profiles:
+                    self.send_response(404)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                body = self._read_body() if method in ('POST', 'PATCH') else None
+                if not self._simulate(upstream):
+                    return
+                getattr(self, f"_{upstream}")(method, path, query, body)
+
+            def _hypixel(self, method, path, query, body):
+                name = query.get('name', [None])[0]
+                uuid = query.get('uuid', [None])[0]
+                if name and fixtures.is_unknown(name):
+                    return self._send('hypixel', 200, {'success': True, 'player': None})
+                if name is None and uuid is None:
+                    return self._send('hypixel', 400, {'success': False, 'cause': 'Missing one or more fields'})
+                # UUID lookups resolve back to the name through the Mojang stand-in's mapping
+                name = name or upstreams_names.get(uuid.replace('-', ''), f"player_{uuid[:8]}")
+                self._send('hypixel', 200, {'success': True, 'player': fixtures.hypixel_player(name, upstreams.hypixel_padding_kb)})
+
+            def _mojang(self, method, path, query, body):
+                name = path.rsplit('/', 1)[-1]
+                if fixtures.is_unknown(name):
+                    return self._send('mojang', 204)
+                uuid = fixtures.player_uuid(name)
+                upstreams_names[uuid] = name
+                self._send('mojang', 200, {'id': uuid, 'name': name})
+
+            def _bwstats(self, method, path, query, body):
+                name = path.rsplit('/', 1)[-1]
+                if fixtures.is_unknown(name):
+                    return self._send('bwstats', 200, "<html><body>Player not found</body></html>", 'text/html')
+                self._send('bwstats', 200, fixtures.bwstats_html(name), 'text/html; charset=utf-8')
+
+            def _supabase(self, method, path, query, body):
+                parts = path.strip('/').split('/')
+                # supabase/rest/v1/<table> or supabase/rest/v1/rpc/<function>
+                if len(parts) >= 5 and parts[3] == 'rpc':
+                    return self._send('supabase', 200, upstreams.store.rpc(parts[4], body or {}))
+                table = parts[3] if len(parts) >= 4 else ''
+                if method == 'GET':
+                    return self._send('supabase', 200, upstreams.store.select(table, query))
+                if method == 'POST':
+                    return self._send('supabase', 201, upstreams.store.insert(table, body))
+                if method == 'PATCH':
+                    return self._send('supabase', 200, upstreams.store.update(table, query, body or {}))
+                self._send('supabase', 405, {'message': 'Method not allowed'})
+
+            def do_GET(self):
+                self._route('GET')
+
+            def do_POST(self):
+                self._route('POST')
+
+            def do_PATCH(self):
+                self._route('PATCH')
+
+        # uuid -> name for every player the Mojang stand-in has resolved
+        upstreams_names: Dict[str, str] = {}
+        return Handler
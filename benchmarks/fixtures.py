@@ -0,0 +1,133 @@
+"""
+Deterministic, real-world-shaped fixtures for benchmarks and the fake upstreams.
+
+Every player name maps to the same UUID and stats on every run, so results are
+comparable across commits.
+"""
+
+import random
+import uuid as uuid_lib
+import zlib
+
+# Hypixel key prefix -> bwstats column header, in bwstats column order
+MODE_PREFIXES = {
+    'eight_one_': 'Solo',
+    'eight_two_': 'Doubles',
+    'four_three_': '3v3v3v3',
+    'four_four_': '4v4v4v4',
+    'two_four_': '4v4',
+}
+DREAM_PREFIXES = [
+    'eight_two_rush_', 'four_four_rush_', 'eight_two_ultimate_', 'four_four_ultimate_',
+    'eight_two_lucky_', 'four_four_lucky_', 'castle_', 'eight_two_voidless_', 'four_four_armed_',
+]
+COUNTER_STATS = [
+    'games_played', 'wins', 'losses', 'kills', 'deaths', 'final_kills', 'final_deaths',
+    'beds_broken', 'beds_lost', 'items_purchased',
+]
+OTHER_GAMES = [
+    'SkyWars', 'Duels', 'Arcade', 'MurderMystery', 'BuildBattle', 'TNTGames', 'UHC',
+    'Walls3', 'SuperSmash', 'Pit', 'HungerGames', 'MCGO', 'Paintball', 'Quake',
+]
+
+
+def is_unknown(name: str) -> bool:
+    """Names starting with 'unknown' do not exist on any upstream."""
+    return name.lower().startswith('unknown')
+
+
+def _rng(name: str) -> random.Random:
+    return random.Random(zlib.crc32(name.lower().encode('utf-8')))
+
+
+def player_uuid(name: str) -> str:
+    """Undashed UUID, as returned by Mojang."""
+    return uuid_lib.UUID(int=_rng(name).getrandbits(128), version=4).hex
+
+
+def bedwars_stats(name: str) -> dict:
+    """Stats.Bedwars object with overall, core, 4v4 and dreams mode counters."""
+    rng = _rng(name)
+    stats = {'Experience': rng.randint(0, 5_000_000), 'coins': rng.randint(0, 2_000_000), 'winstreak': rng.randint(0, 40)}
+    overall = dict.fromkeys(COUNTER_STATS, 0)
+    for prefix in list(MODE_PREFIXES) + DREAM_PREFIXES:
+        wins = rng.randint(0, 4000)
+        losses = rng.randint(0, 4000)
+        finals = rng.randint(0, 15000)
+        mode = {
+            'games_played': wins + losses, 'wins': wins, 'losses': losses,
+            'kills': rng.randint(0, 20000), 'deaths': rng.randint(0, 20000),
+            'final_kills': finals, 'final_deaths': rng.randint(0, max(1, finals // 2)),
+            'beds_broken': rng.randint(0, 8000), 'beds_lost': rng.randint(0, 5000),
+            'items_purchased': rng.randint(0, 100000),
+        }
+        for stat, value in mode.items():
+            stats[f"{prefix}{stat}_bedwars"] = value
+            overall[stat] += value
+        stats[f"{prefix}winstreak"] = rng.randint(0, 20)
+        # Resource and misc per-mode counters the app never reads
+        for extra in ('iron_resources_collected', 'gold_resources_collected', 'diamond_resources_collected',
+                      'emerald_resources_collected', 'void_kills', 'fall_final_kills', 'entity_attack_deaths'):
+            stats[f"{prefix}{extra}_bedwars"] = rng.randint(0, 100000)
+    for stat, value in overall.items():
+        key = '_items_purchased_bedwars' if stat == 'items_purchased' else f"{stat}_bedwars"
+        stats[key] = value
+    return stats
+
+
+def hypixel_player(name: str, padding_kb: int = 0) -> dict:
+    """Full Hypixel /v2/player `player` object; padding_kb adds other-game stats to mimic large profiles."""
+    rng = _rng(name)
+    player = {
+        'uuid': player_uuid(name),
+        'displayname': name,
+        'newPackageRank': rng.choice(['VIP', 'VIP_PLUS', 'MVP', 'MVP_PLUS']),
+        'firstLogin': 1400000000000 + rng.randint(0, 10 ** 11),
+        'achievements': {'bedwars_slumber_ticket_master': rng.randint(0, 500), 'bedwars_level': rng.randint(0, 500)},
+        'stats': {'Bedwars': bedwars_stats(name)},
+        'quests': {},
+    }
+    target = padding_kb * 1024
+    size = 0
+    index = 0
+    while size < target:
+        game = OTHER_GAMES[index % len(OTHER_GAMES)]
+        block = {f"{game.lower()}_stat_{i}": rng.randint(0, 10 ** 6) for i in range(200)}
+        player['stats'].setdefault(game, {}).update(block)
+        player['achievements'].update({f"{game.lower()}_achievement_{index}_{i}": rng.randint(0, 100) for i in range(50)})
+        player['quests'][f"{game.lower()}_daily_{index}"] = {'completions': [{'time': 1600000000000 + i} for i in range(20)]}
+        size += 200 * 28 + 50 * 40 + 20 * 22
+        index += 1
+    return player
+
+
+def bwstats_html(name: str) -> str:
+    """bwstats.shivam.pro-style page: title with star, one table of stats by mode."""
+    stats = bedwars_stats(name)
+    star = stats['Experience'] // 4870
+    columns = [('Overall', '')] + [(title, prefix) for prefix, title in MODE_PREFIXES.items()]
+    rows = [
+        ('Games Played', 'games_played'), ('Wins', 'wins'), ('Losses', 'losses'), ('Win/Loss Ratio', None),
+        ('Kills', 'kills'), ('Deaths', 'deaths'), ('K/D Ratio (KDR)', None),
+        ('Final Kills', 'final_kills'), ('Final Deaths', 'final_deaths'), ('Final K/D Ratio (FKDR)', None),
+        ('Beds Broken', 'beds_broken'), ('Beds Lost', 'beds_lost'), ('Beds B/L Ratio (BBLR)', None),
+        ('Items Purchased', 'items_purchased'),
+    ]
+
+    def value(prefix, stat):
+        if stat == 'items_purchased' and not prefix:
+            return stats['_items_purchased_bedwars']
+        return stats.get(f"{prefix}{stat}_bedwars", 0)
+
+    html = [f"<html><head><title>{star}✫ {name} - BedWars Stats</title></head><body><div class='stats'><table>"]
+    html.append("<tr><th>Stat</th>" + "".join(f"<th>{title}</th>" for title, _ in columns) + "</tr>")
+    for label, stat in rows:
+        cells = []
+        for _, prefix in columns:
+            if stat is None:
+                cells.append("-")
+            else:
+                cells.append(f"{value(prefix, stat):,}")
+        html.append(f"<tr><td>{label}</td>" + "".join(f"<td>{cell}</td>" for cell in cells) + "</tr>")
+    html.append("</table></div></body></html>")
+    return "".join(html)
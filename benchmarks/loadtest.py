@@ -0,0 +1,331 @@
+"""
+End-to-end load generator for the Flask app under gunicorn.
+
+Starts the fake upstreams and a gunicorn server pointed at them, drives
+/player, /compare, /api/player/<username> and /api/compare with a realistic
+traffic mix, and prints a JSON report with sustained RPS, tail latency and
+error rate per route, the server's peak resident memory, plus upstream call
+amplification (outbound calls per inbound request):
+
+    python -m benchmarks.loadtest --scenario zipf --duration 60 --concurrency 32 --workers 4
+    python -m benchmarks.loadtest --scenario hot --rps 200 --profile bwstats:latency_ms=400
+    python -m benchmarks.loadtest --scenario cold --worker-class gthread --threads 8
+    python -m benchmarks.loadtest --scenario cold --worker-class gevent --worker-connections 1000 --concurrency 500
+
+Scenarios:
+    zipf   player popularity follows a Zipf distribution over --players names
+    hot    like zipf, but every --burst-every seconds one player receives all traffic for --burst-length seconds
+    cold   every request asks for a never-seen player (cold-cache storm)
+"""
+
+import argparse
+import bisect
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import quote
+
+import requests
+
+from benchmarks.fake_upstreams import FakeUpstreams, build_profiles
+from benchmarks.report import environment, summarize
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# route label -> (weight, number of players in the request)
+ROUTE_MIX = {
+    '/player': (0.45, 1),
+    '/api/player/<username>': (0.35, 1),
+    '/compare': (0.10, 2),
+    '/api/compare': (0.10, 2),
+}
+
+
+class ZipfNames:
+    """Samples player names with Zipf(s) popularity: name k is chosen with weight 1/k**s."""
+
+    def __init__(self, count: int, exponent: float, prefix: str = 'load_player'):
+        self.names = [f"{prefix}_{k}" for k in range(count)]
+        total = 0.0
+        self.cumulative = []
+        for k in range(1, count + 1):
+            total += 1.0 / (k ** exponent)
+            self.cumulative.append(total)
+
+    def sample(self, rng: random.Random) -> str:
+        return self.names[bisect.bisect_left(self.cumulative, rng.random() * self.cumulative[-1])]
+
+
+class Traffic:
+    """Chooses the player names for each request according to the scenario."""
+
+    def __init__(self, args):
+        self.scenario = args.scenario
+        self.zipf = ZipfNames(args.players, args.zipf_exponent)
+        self.burst_every = args.burst_every
+        self.burst_length = args.burst_length
+        self.started = time.monotonic()
+        self._cold_counter = 0
+        self._lock = threading.Lock()
+
+    def pick(self, rng: random.Random) -> str:
+        if self.scenario == 'cold':
+            with self._lock:
+                self._cold_counter += 1
+                return f"cold_player_{self._cold_counter}"
+        if self.scenario == 'hot':
+            elapsed = time.monotonic() - self.started
+            if elapsed % self.burst_every < self.burst_length:
+                burst = int(elapsed // self.burst_every)
+                return f"hot_player_{burst}"
+        return self.zipf.sample(rng)
+
+
+def build_request(route: str, names):
+    if route == '/player':
+        return f"/player?username={quote(names[0])}"
+    if route == '/api/player/<username>':
+        return f"/api/player/{quote(names[0])}"
+    if route == '/compare':
+        return f"/compare?user1={quote(names[0])}&user2={quote(names[1])}"
+    return f"/api/compare?users={quote(names[0])},{quote(names[1])}"
+
+
+class Pacer:
+    """Hands out evenly spaced send times for an open-loop target RPS (unpaced when rps is 0)."""
+
+    def __init__(self, rps: float):
+        self.interval = 1.0 / rps if rps > 0 else 0.0
+        self.next_send = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            send_at = max(self.next_send, time.monotonic())
+            self.next_send = send_at + self.interval
+        delay = send_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+
+def start_server(args, upstreams, port):
+    env = dict(os.environ)
+    env.update(upstreams.env())
+    env.setdefault('HYPIXEL_API_KEY', 'loadtest-key')
+    # The fake Hypixel has no quota; set HYPIXEL_BUDGET_PER_MINUTE to load test the scheduler itself
+    env.setdefault('HYPIXEL_BUDGET_PER_MINUTE', '0')
+    env.setdefault('LOG_LEVEL', 'WARNING')
+    # Keep stdout for the JSON report
+    env.setdefault('LOG_STREAM', 'stderr')
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [REPO_ROOT, env.get('PYTHONPATH')]))
+    command = [
+        sys.executable, '-m', 'gunicorn', 'app:app',
+        '-c', os.path.join(REPO_ROOT, 'gunicorn.conf.py'),
+        '--bind', f"127.0.0.1:{port}",
+        '--workers', str(args.workers),
+        '--worker-class', args.worker_class,
+        '--threads', str(args.threads),
+        '--timeout', str(args.server_timeout),
+        # Local cache files and metrics land in a scratch directory
+        '--chdir', tempfile.mkdtemp(prefix='lava_load_'),
+        '--pythonpath', REPO_ROOT,
+    ]
+    if args.worker_connections:
+        command += ['--worker-connections', str(args.worker_connections)]
+    process = subprocess.Popen(command, env=env)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"gunicorn exited with status {process.returncode}")
+        try:
+            requests.get(f"{base_url}/", timeout=1)
+            return process, base_url
+        except requests.exceptions.RequestException:
+            time.sleep(0.2)
+    process.terminate()
+    raise SystemExit("gunicorn did not become ready within 30s")
+
+
+def process_tree_rss_kb(pid: int):
+    """Resident memory of a process and all its descendants (gunicorn master + workers), in KB; None off Linux."""
+    try:
+        parents = {}
+        for entry in os.listdir('/proc'):
+            if entry.isdigit():
+                with open(f"/proc/{entry}/stat") as f:
+                    parents[int(entry)] = int(f.read().rsplit(')', 1)[1].split()[1])
+    except OSError:
+        return None
+    tree, frontier = {pid}, [pid]
+    while frontier:
+        parent = frontier.pop()
+        for child, ppid in parents.items():
+            if ppid == parent and child not in tree:
+                tree.add(child)
+                frontier.append(child)
+    total = 0
+    for member in tree:
+        try:
+            with open(f"/proc/{member}/status") as f:
+                total += next((int(line.split()[1]) for line in f if line.startswith('VmRSS:')), 0)
+        except OSError:
+            continue
+    return total
+
+
+class MemorySampler(threading.Thread):
+    """Samples the server's resident memory while the load runs and keeps the peak."""
+
+    def __init__(self, pid: int, interval: float = 0.5):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peak_kb = None
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            rss = process_tree_rss_kb(self.pid)
+            if rss is not None:
+                self.peak_kb = max(self.peak_kb or 0, rss)
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def run_load(args, base_url, traffic):
+    routes = list(ROUTE_MIX)
+    weights = [ROUTE_MIX[route][0] for route in routes]
+    results = {route: {'durations': [], 'errors': 0, 'statuses': {}} for route in routes}
+    lock = threading.Lock()
+    pacer = Pacer(args.rps)
+    stop_at = time.monotonic() + args.duration
+
+    def client(seed):
+        rng = random.Random(seed)
+        session = requests.Session()
+        while time.monotonic() < stop_at:
+            pacer.wait()
+            route = rng.choices(routes, weights)[0]
+            names = [traffic.pick(rng) for _ in range(ROUTE_MIX[route][1])]
+            start = time.perf_counter()
+            try:
+                response = session.get(base_url + build_request(route, names), timeout=args.request_timeout)
+                status = response.status_code
+            except requests.exceptions.RequestException:
+                status = 'error'
+            duration = time.perf_counter() - start
+            with lock:
+                entry = results[route]
+                entry['durations'].append(duration)
+                entry['statuses'][str(status)] = entry['statuses'].get(str(status), 0) + 1
+                # 404 (unknown player) and 304 are valid answers; 5xx, timeouts and connection errors are not
+                if status == 'error' or status >= 500:
+                    entry['errors'] += 1
+
+    threads = [threading.Thread(target=client, args=(args.seed + i,), daemon=True) for i in range(args.concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - started
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenario', choices=('zipf', 'hot', 'cold'), default='zipf')
+    parser.add_argument('--duration', type=float, default=30.0, help='seconds of load')
+    parser.add_argument('--concurrency', type=int, default=16, help='concurrent client connections')
+    parser.add_argument('--rps', type=float, default=0.0, help='open-loop target rate (0 = as fast as clients can go)')
+    parser.add_argument('--players', type=int, default=1000, help='distinct players in the zipf population')
+    parser.add_argument('--zipf-exponent', type=float, default=1.1)
+    parser.add_argument('--burst-every', type=float, default=10.0, help='hot scenario: seconds between bursts')
+    parser.add_argument('--burst-length', type=float, default=3.0, help='hot scenario: burst duration in seconds')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes')
+    parser.add_argument('--worker-class', default='sync', help='gunicorn worker class (sync, gthread, gevent)')
+    parser.add_argument('--threads', type=int, default=1, help='gunicorn threads per worker (gthread)')
+    parser.add_argument('--worker-connections', type=int, default=0, help='gunicorn connections per worker (gevent)')
+    parser.add_argument('--server-timeout', type=int, default=120, help='gunicorn worker timeout')
+    parser.add_argument('--request-timeout', type=float, default=60.0, help='client timeout per request')
+    parser.add_argument('--latency-ms', type=float, default=50.0, help='latency of every fake upstream')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of upstream calls answered with 500')
+    parser.add_argument('--profile', action='append', default=[], metavar='UPSTREAM:SPEC',
+                        help='per-upstream override, e.g. bwstats:latency_ms=400,rate_limit_rate=0.02')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='also write the JSON report to this file')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    profiles = build_profiles(args.latency_ms, args.error_rate, args.profile)
+
+    upstreams = FakeUpstreams(profiles).start()
+    process, base_url = start_server(args, upstreams, free_port())
+    sampler = MemorySampler(process.pid)
+    try:
+        upstreams.reset_counters()
+        sampler.start()
+        results, wall_time = run_load(args, base_url, Traffic(args))
+        sampler.stop()
+        upstream_snapshot = upstreams.snapshot()
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+        upstreams.stop()
+
+    inbound = sum(len(entry['durations']) for entry in results.values())
+    routes = {}
+    for route, entry in results.items():
+        summary = summarize(entry['durations'], entry['errors'], wall_time=wall_time)
+        summary['rps'] = summary.pop('ops_per_sec')
+        summary['error_rate'] = round(entry['errors'] / summary['count'], 4) if summary['count'] else 0.0
+        summary['statuses'] = entry['statuses']
+        routes[route] = summary
+
+    all_durations = [d for entry in results.values() for d in entry['durations']]
+    total = summarize(all_durations, sum(entry['errors'] for entry in results.values()), wall_time=wall_time)
+    total['rps'] = total.pop('ops_per_sec')
+    outbound = upstream_snapshot['calls']
+    report = {
+        'environment': environment(),
+        'config': {key: value for key, value in vars(args).items() if key not in ('profile', 'output')},
+        'profiles': {name: profile.to_dict() for name, profile in profiles.items()},
+        'wall_time_s': round(wall_time, 2),
+        'total': total,
+        'server_peak_rss_mb': round(sampler.peak_kb / 1024, 1) if sampler.peak_kb else None,
+        'routes': routes,
+        'upstream': {
+            'calls': outbound,
+            'statuses': upstream_snapshot['statuses'],
+            'amplification': round(sum(outbound.values()) / inbound, 3) if inbound else 0.0,
+            'amplification_by_upstream': {name: round(calls / inbound, 3) if inbound else 0.0 for name, calls in outbound.items()},
+        },
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+"""
+Latency summaries shared by the microbenchmarks and the load generator.
+"""
+
+import math
+import platform
+import sys
+from typing import Dict, List
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(durations: List[float], errors: int = 0, wall_time: float = None) -> Dict[str, float]:
+    """Throughput and latency percentiles (milliseconds) for a list of durations in seconds."""
+    values = sorted(durations)
+    count = len(values)
+    total = wall_time if wall_time is not None else sum(values)
+    return {
+        'count': count,
+        'errors': errors,
+        'ops_per_sec': round(count / total, 2) if total > 0 else 0.0,
+        'mean_ms': round(sum(values) / count * 1000, 3) if count else 0.0,
+        'p50_ms': round(percentile(values, 50) * 1000, 3),
+        'p90_ms': round(percentile(values, 90) * 1000, 3),
+        'p99_ms': round(percentile(values, 99) * 1000, 3),
+        'max_ms': round(values[-1] * 1000, 3) if count else 0.0,
+    }
+
+
+def environment() -> Dict[str, str]:
+    return {'python': sys.version.split()[0], 'implementation': platform.python_implementation(), 'platform': platform.platform()}
@@ -0,0 +1,301 @@
+"""
+Offline microbenchmarks for the player fetch pipeline.
+
+Starts the fake upstreams, points the app's config at them and times the hot
+functions, printing one JSON document with throughput and latency percentiles:
+
+    python -m benchmarks.run --iterations 200 --latency-ms 20 --output bench.json
+    python -m benchmarks.run --only parse_stats_from_html --only format_stats_for_display
+    python -m benchmarks.run --profile hypixel:latency_ms=80,error_rate=0.05
+    python -m benchmarks.run --only decode_player_full --only decode_player_response --only fetch_player_data --hypixel-padding-kb 512
+"""
+
+import argparse
+import json
+import os
+import random
+import string
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks import fixtures
+from benchmarks.fake_upstreams import FakeUpstreams, build_profiles
+from benchmarks.report import environment, summarize
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """Registers a factory that receives the imported modules and returns a callable(iteration)."""
+    def register(factory):
+        BENCHMARKS[name] = factory
+        return factory
+    return register
+
+
+@benchmark('fetch_player_data')
+def _fetch_player_data(modules):
+    hypixel_api = modules['hypixel_api']
+    return lambda i: hypixel_api.fetch_player_data(f"bench_api_{i}")
+
+
+@benchmark('fetch_multiple_player_data')
+def _fetch_multiple_player_data(modules):
+    hypixel_api = modules['hypixel_api']
+    return lambda i: hypixel_api.fetch_multiple_player_data([f"bench_multi_{i}_{n}" for n in range(5)])
+
+
+@benchmark('scrape_bwstats')
+def _scrape_bwstats(modules):
+    scrapper = modules['scrapper']
+    # Unique names so every iteration misses the cache and pays fetch + parse + save
+    return lambda i: scrapper.scrape_bwstats(f"bench_scrape_{i}")
+
+
+# Size of the padded Hypixel player object used by the decode benchmarks (other games, achievements, quests)
+LARGE_PLAYER_KB = 512
+
+
+def _large_player_body():
+    return json.dumps({'success': True, 'player': fixtures.hypixel_player('bench_decode', LARGE_PLAYER_KB)}).encode('utf-8')
+
+
+@benchmark('decode_player_full')
+def _decode_player_full(modules):
+    body = _large_player_body()
+    # Baseline: what response.json() does with the whole player object
+    run = lambda i: json.loads(body)
+    run.track_memory = True
+    return run
+
+
+@benchmark('decode_player_response')
+def _decode_player_response(modules):
+    body = _large_player_body()
+    run = lambda i: modules['hypixel_json'].decode_player_response(body)
+    run.track_memory = True
+    return run
+
+
+@benchmark('modes_from_bedwars')
+def _modes_from_bedwars(modules):
+    bw_stats = fixtures.bedwars_stats('bench_extract')
+    return lambda i: modules['models'].modes_from_bedwars(bw_stats)
+
+
+# (Experience, level) pairs at prestige and band boundaries, checked before the level benchmark runs
+LEVEL_REFERENCE = [
+    (0, 0.0), (250, 0.5), (500, 1.0), (1500, 2.0), (2000, 2.25), (3500, 3.0), (7000, 4.0), (12000, 5.0),
+    (486999, 99.9998), (487000, 100.0), (489000, 102.25), (4870000, 1000.0), (-1, 0.0), (None, 0.0),
+]
+
+
+def check_level_reference(bedwars_level):
+    """Raises if the level engine disagrees with the reference values or with its own inverse."""
+    for exp, expected in LEVEL_REFERENCE:
+        for level in (bedwars_level.level_from_exp(exp), bedwars_level.levels_from_exp([exp])[0]):
+            if abs(level - expected) > 1e-9:
+                raise AssertionError(f"level for {exp} exp is {level}, expected {expected}")
+    for star in range(0, 1001):
+        exp = bedwars_level.exp_for_level(star)
+        if bedwars_level.level_from_exp(exp) != star or int(bedwars_level.level_from_exp(exp - 1)) != max(star - 1, 0):
+            raise AssertionError(f"exp_for_level({star}) = {exp} does not round-trip")
+
+
+@benchmark('levels_from_exp')
+def _levels_from_exp(modules):
+    bedwars_level = modules['bedwars_level']
+    check_level_reference(bedwars_level)
+    # One tracker batch worth of players
+    exps = [fixtures.bedwars_stats(f"bench_level_{n}")['Experience'] for n in range(50)]
+    return lambda i: bedwars_level.levels_from_exp(exps)
+
+
+# Names in the synthetic suggestion index (roughly a busy deployment's player_names table)
+SUGGEST_NAMES = 50000
+
+
+def _suggest_index(suggest):
+    rng = random.Random(48)
+    alphabet = string.ascii_letters + string.digits + '_'
+    index = suggest.SuggestIndex()
+    names = [''.join(rng.choice(alphabet) for _ in range(rng.randint(3, 16))) for _ in range(SUGGEST_NAMES)]
+    for name in names:
+        index.add(name)
+    for name in rng.sample(names, 2000):
+        for _ in range(rng.randint(1, 20)):
+            index.record_lookup(name)
+    return index, names, rng
+
+
+@benchmark('suggest_prefix')
+def _suggest_prefix(modules):
+    index, names, rng = _suggest_index(modules['suggest'])
+    # One to four typed characters of a known name: the short, broad prefixes are the expensive ones
+    queries = [name[:rng.randint(1, 4)] for name in rng.sample(names, 500)]
+    return lambda i: index.suggest(queries[i % len(queries)])
+
+
+@benchmark('suggest_did_you_mean')
+def _suggest_did_you_mean(modules):
+    index, names, rng = _suggest_index(modules['suggest'])
+    # A known name with its last character replaced and one appended: no prefix matches, so the BK-tree answers.
+    # Every query is new, so the correction cache never hits.
+    return lambda i: index.suggest(f"{names[i % len(names)][:-1]}{i % 10}x")
+
+
+@benchmark('parse_stats_from_html')
+def _parse_stats_from_html(modules):
+    scrapper = modules['scrapper']
+    html = fixtures.bwstats_html('bench_parse')
+    return lambda i: scrapper.parse_stats_from_html(html, 'bench_parse')
+
+
+@benchmark('scrape_bwstats_cached')
+def _scrape_bwstats_cached(modules):
+    scrapper = modules['scrapper']
+    # Same name every iteration: after the first scrape this is a cache lookup of the normalized stats
+    return lambda i: scrapper.scrape_bwstats('bench_cached')
+
+
+@benchmark('normalize_scraped')
+def _normalize_scraped(modules):
+    scrapper = modules['scrapper']
+    scraped = scrapper.parse_stats_from_html(fixtures.bwstats_html('bench_normalize'), 'bench_normalize')
+    return lambda i: scrapper.normalize_scraped(scraped, 'bench_normalize')
+
+
+@benchmark('format_stats_for_display')
+def _format_stats_for_display(modules):
+    app = modules['app']
+    scraped = modules['scrapper'].parse_stats_from_html(fixtures.bwstats_html('bench_format'), 'bench_format')
+    stats = modules['models'].PlayerStats.from_dict(scraped)
+    return lambda i: app.format_stats_for_display(stats)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=200, help='timed iterations per benchmark')
+    parser.add_argument('--warmup', type=int, default=10, help='untimed iterations per benchmark')
+    parser.add_argument('--only', action='append', choices=sorted(BENCHMARKS), help='run only these benchmarks')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='latency of every fake upstream')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of upstream calls answered with 500')
+    parser.add_argument('--profile', action='append', default=[], metavar='UPSTREAM:SPEC',
+                        help='per-upstream override, e.g. hypixel:latency_ms=80,jitter_ms=20,rate_limit_rate=0.01')
+    parser.add_argument('--hypixel-padding-kb', type=int, default=0,
+                        help='pad fake Hypixel player objects with other-game stats to about this size')
+    parser.add_argument('--output', help='also write the JSON report to this file')
+    return parser.parse_args(argv)
+
+
+def import_app_modules():
+    """Imports the app only after the environment points at the fakes (config is read at import)."""
+    modules = {}
+    for name in ('bedwars_level', 'models', 'hypixel_json', 'scrapper', 'hypixel_api', 'suggest', 'app'):
+        modules[name] = __import__(name)
+    return modules
+
+
+IMPORT_TIME_MODULES = ('scrapper', 'supabase_handler', 'hypixel_api', 'compare_supabase', 'app')
+
+
+def measure_import_times(repo_root, repeats=3):
+    """Best-of-N cold import time per module, each in a fresh interpreter (milliseconds)."""
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [repo_root, env.get('PYTHONPATH')]))
+    code = "import sys, time; start = time.perf_counter(); __import__(sys.argv[1]); print(time.perf_counter() - start)"
+    times = {}
+    for module in IMPORT_TIME_MODULES:
+        samples = []
+        for _ in range(repeats):
+            result = subprocess.run([sys.executable, '-c', code, module], env=env, capture_output=True, text=True)
+            if result.returncode != 0:
+                break
+            samples.append(float(result.stdout.strip().splitlines()[-1]))
+        times[module] = round(min(samples) * 1000, 2) if samples else None
+    return times
+
+
+def peak_memory_kb(run):
+    """Peak Python allocations of one call, in KB."""
+    tracemalloc.start()
+    try:
+        run(-1)
+        return round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+    finally:
+        tracemalloc.stop()
+
+
+def run_benchmark(run, iterations, warmup, on_start=None):
+    if hasattr(run, 'prepare'):
+        run.prepare(iterations + warmup)
+    for i in range(warmup):
+        run(-1 - i)
+    if on_start:
+        on_start()
+    durations = []
+    errors = 0
+    started = time.perf_counter()
+    for i in range(iterations):
+        start = time.perf_counter()
+        try:
+            result = run(i)
+            if isinstance(result, dict) and result.get('error'):
+                errors += 1
+        except Exception:
+            errors += 1
+        durations.append(time.perf_counter() - start)
+    result = summarize(durations, errors, wall_time=time.perf_counter() - started)
+    if getattr(run, 'track_memory', False):
+        result['peak_memory_kb'] = peak_memory_kb(run)
+    return result
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    profiles = build_profiles(args.latency_ms, args.error_rate, args.profile)
+    upstreams = FakeUpstreams(profiles, hypixel_padding_kb=args.hypixel_padding_kb).start()
+
+    os.environ.update(upstreams.env())
+    os.environ.setdefault('HYPIXEL_API_KEY', 'benchmark-key')
+    # Time the pipeline itself, not the Hypixel budget scheduler (set it explicitly to include it)
+    os.environ.setdefault('HYPIXEL_BUDGET_PER_MINUTE', '0')
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    # Keep stdout for the JSON report
+    os.environ.setdefault('LOG_STREAM', 'stderr')
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, repo_root)
+    output_path = os.path.abspath(args.output) if args.output else None
+    # Local file cache and other scratch files land in a throwaway directory
+    workdir = tempfile.mkdtemp(prefix='lava_bench_')
+    os.chdir(workdir)
+
+    modules = import_app_modules()
+
+    report = {
+        'environment': environment(),
+        'config': {'iterations': args.iterations, 'warmup': args.warmup, 'hypixel_padding_kb': args.hypixel_padding_kb,
+                   'profiles': {name: profile.to_dict() for name, profile in profiles.items()}},
+        'import_time_ms': measure_import_times(repo_root),
+        'results': {},
+    }
+    try:
+        for name in args.only or BENCHMARKS:
+            result = run_benchmark(BENCHMARKS[name](modules), args.iterations, args.warmup, upstreams.reset_counters)
+            result['upstream_calls'] = upstreams.snapshot()['calls']
+            report['results'][name] = result
+    finally:
+        upstreams.stop()
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if output_path:
+        with open(output_path, 'w') as f:
+            f.write(output)
+
+
+if __name__ == '__main__':
+    main()
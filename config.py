@@ -1,15 +1,129 @@
 import os
+import logging
 from dotenv import load_dotenv
+from logging_setup import configure_logging
 
 load_dotenv()
+configure_logging()
+logger = logging.getLogger(__name__)
 
 API_KEY = os.getenv("HYPIXEL_API_KEY", "off")
+# Optional pool of keys (comma separated); requests are spread over them, see hypixel_keys.py
+API_KEYS = [key.strip() for key in os.getenv("HYPIXEL_API_KEYS", "").split(",") if key.strip()]
+
+# Upstream endpoints (overridable to point at local stand-ins, see benchmarks/)
+HYPIXEL_API_BASE = os.getenv("HYPIXEL_API_BASE", "https://api.hypixel.net/v2")
+MOJANG_PROFILE_URL = os.getenv("MOJANG_PROFILE_URL", "https://api.mojang.com/users/profiles/minecraft/")
+BWSTATS_USER_URL = os.getenv("BWSTATS_USER_URL", "https://bwstats.shivam.pro/user/")
 
 # If API_KEY is not set, default to "off" mode (scraper only)
-if not API_KEY:
+if API_KEY and API_KEY.lower() == "off" and os.getenv("HYPIXEL_API_KEY"):
+    API_KEYS = []
+    logger.info("HYPIXEL_API_KEY set to 'off', using scraper-only mode")
+elif API_KEYS:
+    API_KEY = API_KEYS[0]
+    logger.info(f"Using Hypixel API with {len(API_KEYS)} keys")
+elif not API_KEY or API_KEY.lower() == "off":
     API_KEY = "off"
-    print("No HYPIXEL_API_KEY found, using scraper-only mode")
-elif API_KEY.lower() == "off":
-    print("HYPIXEL_API_KEY set to 'off', using scraper-only mode")
+    logger.info("No HYPIXEL_API_KEY found, using scraper-only mode")
 else:
-    print(f"Using Hypixel API with key: {API_KEY[:8]}...")
+    API_KEYS = [API_KEY]
+    logger.info("Using Hypixel API with 1 key")
+
+# HTTP response caching for /player and /api/player (seconds, capped by the stats cache age)
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "60"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+
+# Negative cache of names an upstream definitively did not find (seconds per failure class, 0 = off;
+# see negative_cache.py)
+NEGATIVE_CACHE_MOJANG_TTL = float(os.getenv("NEGATIVE_CACHE_MOJANG_TTL", "300"))
+NEGATIVE_CACHE_HYPIXEL_TTL = float(os.getenv("NEGATIVE_CACHE_HYPIXEL_TTL", "300"))
+NEGATIVE_CACHE_SCRAPER_TTL = float(os.getenv("NEGATIVE_CACHE_SCRAPER_TTL", "600"))
+NEGATIVE_CACHE_MAX_ENTRIES = int(os.getenv("NEGATIVE_CACHE_MAX_ENTRIES", "10000"))
+
+# Local index of observed player names for resolving renames without upstream calls (see name_index.py).
+# Entries older than NAME_INDEX_MAX_AGE seconds are ignored (Mojang holds a changed name for 37 days).
+NAME_INDEX_PATH = os.getenv("NAME_INDEX_PATH", "./cache/name_index.json")
+NAME_INDEX_MAX_AGE = float(os.getenv("NAME_INDEX_MAX_AGE", str(37 * 24 * 3600)))
+NAME_INDEX_FLUSH_INTERVAL = float(os.getenv("NAME_INDEX_FLUSH_INTERVAL", "60"))
+NAME_INDEX_SEED_MAX_ROWS = int(os.getenv("NAME_INDEX_SEED_MAX_ROWS", "50000"))
+
+# Username suggestions (/api/suggest, see suggest.py): results per query, max edit distance of "did you mean"
+# corrections, seconds between pulls of new names from Supabase (0 = load once) and names loaded per table
+SUGGEST_LIMIT = int(os.getenv("SUGGEST_LIMIT", "8"))
+SUGGEST_MAX_DISTANCE = int(os.getenv("SUGGEST_MAX_DISTANCE", "2"))
+SUGGEST_REFRESH_INTERVAL = float(os.getenv("SUGGEST_REFRESH_INTERVAL", "300"))
+SUGGEST_MAX_NAMES = int(os.getenv("SUGGEST_MAX_NAMES", "200000"))
+# File the names pulled from Supabase are shared through by the workers of a host (see suggest.py)
+SUGGEST_SNAPSHOT_PATH = os.getenv("SUGGEST_SNAPSHOT_PATH", "./cache/suggest_names.json")
+
+# Sharded tracker sweeps (python lavatracker.py --sharded, see tracker_leases.py and create_tracker_leases_table.sql):
+# the sweep every worker joins (default: the newest unfinished sweep in Supabase, or a new one), this worker's name
+# (default: host:pid), how long a claimed batch stays leased without renewal (seconds; workers give a batch up after
+# two thirds of it without a renewal) and how many times a batch is claimed before it is given up on
+TRACKER_SWEEP_ID = os.getenv("TRACKER_SWEEP_ID", "")
+TRACKER_WORKER_ID = os.getenv("TRACKER_WORKER_ID", "")
+TRACKER_LEASE_SECONDS = int(os.getenv("TRACKER_LEASE_SECONDS", "300"))
+TRACKER_MAX_ATTEMPTS = int(os.getenv("TRACKER_MAX_ATTEMPTS", "3"))
+
+# Checkpoint of single-process tracker sweeps (see tracker_checkpoint.py), written after every batch so a restarted
+# sweep skips the players it already tracked; checkpoints older than TRACKER_CHECKPOINT_MAX_AGE seconds are not resumed.
+# It is kept in Supabase (create_tracker_checkpoints_table.sql); the file is only a fallback for when Supabase is
+# unreachable and does not survive redeploys on hosts with an ephemeral filesystem
+TRACKER_CHECKPOINT_PATH = os.getenv("TRACKER_CHECKPOINT_PATH", "./cache/tracker_checkpoint.json")
+TRACKER_CHECKPOINT_MAX_AGE = float(os.getenv("TRACKER_CHECKPOINT_MAX_AGE", "86400"))
+
+# Streaming bulk lookup (/api/bulk)
+BULK_MAX_USERS = int(os.getenv("BULK_MAX_USERS", "50"))
+BULK_MAX_CONCURRENCY = int(os.getenv("BULK_MAX_CONCURRENCY", "4"))
+BULK_PLAYER_TIMEOUT = float(os.getenv("BULK_PLAYER_TIMEOUT", "20"))
+
+# Requests slower than this (seconds) get their full span breakdown logged; 0 disables
+TRACE_SLOW_REQUEST_SECONDS = float(os.getenv("TRACE_SLOW_REQUEST_SECONDS", "5"))
+# Shared secret that returns a request's trace to the client when sent as the X-Lava-Trace header;
+# unset (the default) never returns traces, since they show upstream topology and timings
+TRACE_TOKEN = os.getenv("TRACE_TOKEN", "")
+
+# Shared Hypixel request budget per process and per key (see hypixel_budget.py); 0 disables the limit.
+# Interactive lookups may use the whole budget, prefetch and batch work only what is left after the reserve.
+HYPIXEL_BUDGET_PER_MINUTE = int(os.getenv("HYPIXEL_BUDGET_PER_MINUTE", "60"))
+HYPIXEL_INTERACTIVE_RESERVE = int(os.getenv("HYPIXEL_INTERACTIVE_RESERVE", "20"))
+# How long each class waits for budget before giving up (seconds); interactive lookups then fall back to the scraper
+HYPIXEL_INTERACTIVE_MAX_WAIT = float(os.getenv("HYPIXEL_INTERACTIVE_MAX_WAIT", "2"))
+HYPIXEL_PREFETCH_MAX_WAIT = float(os.getenv("HYPIXEL_PREFETCH_MAX_WAIT", "10"))
+
+# How long a key is taken out of the pool after Hypixel rejects it (seconds); a 429 uses Retry-After when sent
+HYPIXEL_KEY_FORBIDDEN_QUARANTINE = float(os.getenv("HYPIXEL_KEY_FORBIDDEN_QUARANTINE", "3600"))
+HYPIXEL_KEY_THROTTLED_QUARANTINE = float(os.getenv("HYPIXEL_KEY_THROTTLED_QUARANTINE", "60"))
+
+# Adaptive concurrency of bulk bwstats scraping (scrape_multiple_bwstats): starts at the initial value, grows
+# while responses are fast and successful, halves on 429s, errors or responses slower than the latency target
+SCRAPER_CONCURRENCY_INITIAL = int(os.getenv("SCRAPER_CONCURRENCY_INITIAL", "3"))
+SCRAPER_CONCURRENCY_MIN = int(os.getenv("SCRAPER_CONCURRENCY_MIN", "1"))
+SCRAPER_CONCURRENCY_MAX = int(os.getenv("SCRAPER_CONCURRENCY_MAX", "8"))
+SCRAPER_LATENCY_TARGET = float(os.getenv("SCRAPER_LATENCY_TARGET", "3"))
+
+# Pacing of bwstats requests per process (see pacing.py): minimum spacing between sends plus random jitter,
+# the longest a caller waits for its send time before giving up, and the host-wide backoff after 429s.
+# e.g. on a shared-IP host such as Render: SCRAPER_MIN_INTERVAL=1 SCRAPER_PACING_JITTER=1 SCRAPER_BACKOFF_MAX=3600
+SCRAPER_MIN_INTERVAL = float(os.getenv("SCRAPER_MIN_INTERVAL", "0"))
+SCRAPER_PACING_JITTER = float(os.getenv("SCRAPER_PACING_JITTER", "0"))
+SCRAPER_MAX_WAIT = float(os.getenv("SCRAPER_MAX_WAIT", "10"))
+SCRAPER_BACKOFF_BASE = float(os.getenv("SCRAPER_BACKOFF_BASE", "2"))
+SCRAPER_BACKOFF_MAX = float(os.getenv("SCRAPER_BACKOFF_MAX", "300"))
+
+# Deadline for the whole upstream chain of one request (seconds, 0 = none; see deadlines.py). When it runs out,
+# the newest cached stats are served with stale=True. /api/bulk uses its per-player timeout instead.
+API_REQUEST_DEADLINE = float(os.getenv("API_REQUEST_DEADLINE", "3"))
+PAGE_REQUEST_DEADLINE = float(os.getenv("PAGE_REQUEST_DEADLINE", "10"))
+# Supabase calls are capped at SUPABASE_TIMEOUT seconds and by the request's deadline; reading the stale cache
+# once the deadline has run out gets STALE_CACHE_TIMEOUT seconds of its own
+SUPABASE_TIMEOUT = float(os.getenv("SUPABASE_TIMEOUT", "5"))
+STALE_CACHE_TIMEOUT = float(os.getenv("STALE_CACHE_TIMEOUT", "1"))
+
+# Hedged lookups (see hedging.py): when the Hypixel API path has not answered after HYPIXEL_HEDGE_AFTER seconds
+# (set it near that path's p95, 0 = off), the cache/scraper path starts in parallel and the first valid result wins.
+# At most HYPIXEL_HEDGE_MAX_RATIO of lookups are hedged over time, with bursts of up to HYPIXEL_HEDGE_BURST.
+HYPIXEL_HEDGE_AFTER = float(os.getenv("HYPIXEL_HEDGE_AFTER", "1.5"))
+HYPIXEL_HEDGE_MAX_RATIO = float(os.getenv("HYPIXEL_HEDGE_MAX_RATIO", "0.1"))
+HYPIXEL_HEDGE_BURST = float(os.getenv("HYPIXEL_HEDGE_BURST", "5"))
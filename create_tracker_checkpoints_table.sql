@@ -0,0 +1,67 @@
+-- Checkpoints of single-process LavaTracker sweeps (python lavatracker.py)
+--
+-- track_all_players records the players tracked and failed in every batch
+-- here, so a sweep interrupted by a crash or a redeploy resumes on the next
+-- run even when the host's filesystem was wiped in between (Render and
+-- similar hosts). The local checkpoint file (TRACKER_CHECKPOINT_PATH) is only
+-- used while Supabase cannot be reached.
+--
+-- Run this in the Supabase SQL editor. The table is only reachable through
+-- the functions below, which the anon key may execute.
+
+CREATE TABLE IF NOT EXISTS tracker_checkpoints (
+    sweep_id TEXT PRIMARY KEY,
+    started_at TIMESTAMPTZ NOT NULL,
+    finished_at TIMESTAMPTZ,
+    elapsed DOUBLE PRECISION NOT NULL DEFAULT 0,
+    tracked TEXT[] NOT NULL DEFAULT '{}',
+    failed TEXT[] NOT NULL DEFAULT '{}',
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_tracker_checkpoints_unfinished
+    ON tracker_checkpoints (started_at DESC) WHERE finished_at IS NULL;
+
+ALTER TABLE tracker_checkpoints ENABLE ROW LEVEL SECURITY;
+
+-- The newest unfinished sweep, with started_at in epoch seconds. Returns no row when every sweep finished.
+CREATE OR REPLACE FUNCTION latest_tracker_checkpoint()
+RETURNS TABLE (sweep_id TEXT, started_at DOUBLE PRECISION, elapsed DOUBLE PRECISION, tracked TEXT[], failed TEXT[])
+LANGUAGE sql SECURITY DEFINER AS $$
+    SELECT c.sweep_id, extract(epoch FROM c.started_at)::DOUBLE PRECISION, c.elapsed, c.tracked, c.failed
+    FROM tracker_checkpoints AS c
+    WHERE c.finished_at IS NULL
+    ORDER BY c.started_at DESC
+    LIMIT 1;
+$$;
+
+-- Adds the players tracked and failed since the last call to a sweep, creating it on the first call, so each
+-- call only carries new batches. Players tracked now are dropped from the failed ones.
+CREATE OR REPLACE FUNCTION record_tracker_checkpoint(
+    p_sweep_id TEXT, p_started_at DOUBLE PRECISION, p_elapsed DOUBLE PRECISION,
+    p_tracked TEXT[], p_failed TEXT[], p_finished BOOLEAN
+)
+RETURNS VOID
+LANGUAGE plpgsql SECURITY DEFINER AS $$
+BEGIN
+    INSERT INTO tracker_checkpoints AS c (sweep_id, started_at, elapsed, tracked, failed, finished_at)
+    VALUES (
+        p_sweep_id, to_timestamp(p_started_at), p_elapsed, p_tracked,
+        ARRAY(SELECT unnest(p_failed) EXCEPT SELECT unnest(p_tracked)),
+        CASE WHEN p_finished THEN NOW() END
+    )
+    ON CONFLICT (sweep_id) DO UPDATE
+    SET tracked = ARRAY(SELECT unnest(c.tracked) UNION SELECT unnest(p_tracked)),
+        failed = ARRAY(
+            SELECT unnest(c.failed) UNION SELECT unnest(p_failed)
+            EXCEPT SELECT unnest(c.tracked) EXCEPT SELECT unnest(p_tracked)
+        ),
+        elapsed = p_elapsed,
+        finished_at = CASE WHEN p_finished THEN NOW() ELSE c.finished_at END,
+        updated_at = NOW();
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION latest_tracker_checkpoint() TO anon, authenticated;
+GRANT EXECUTE ON FUNCTION record_tracker_checkpoint(TEXT, DOUBLE PRECISION, DOUBLE PRECISION, TEXT[], TEXT[], BOOLEAN)
+    TO anon, authenticated;
@@ -0,0 +1,153 @@
+-- Work table for the sharded LavaTracker (python lavatracker.py --sharded)
+--
+-- A sweep splits the players table into numbered batches. Workers on any
+-- number of hosts claim one batch at a time under a lease, renew the lease
+-- while they work and mark the batch done when it is saved. A batch whose
+-- lease ran out (its worker crashed or hung) is claimed again by the next
+-- worker, so a sweep resumes after crashes and every batch is tracked at
+-- least once. Workers started without a sweep id join the unfinished sweep,
+-- so restarts at any time continue it.
+--
+-- Run this in the Supabase SQL editor. The table is only reachable through
+-- the functions below, which the anon key may execute.
+
+CREATE TABLE IF NOT EXISTS tracker_leases (
+    sweep_id TEXT NOT NULL,
+    batch_no INTEGER NOT NULL,
+    uuids TEXT[] NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'leased', 'done')),
+    worker TEXT,
+    lease_expires_at TIMESTAMPTZ,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    tracked INTEGER,
+    failed INTEGER,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (sweep_id, batch_no)
+);
+
+CREATE INDEX IF NOT EXISTS idx_tracker_leases_claimable
+    ON tracker_leases (sweep_id, status, batch_no);
+
+ALTER TABLE tracker_leases ENABLE ROW LEVEL SECURITY;
+
+-- Splits the players table into batches for a sweep; a no-op when the sweep already exists,
+-- so every worker may call it on start. Returns the number of batches in the sweep.
+CREATE OR REPLACE FUNCTION create_tracker_sweep(p_sweep_id TEXT, p_batch_size INTEGER)
+RETURNS INTEGER
+LANGUAGE plpgsql SECURITY DEFINER AS $$
+BEGIN
+    INSERT INTO tracker_leases (sweep_id, batch_no, uuids)
+    SELECT p_sweep_id, batch_no, array_agg(uuid ORDER BY uuid)
+    FROM (
+        SELECT uuid, ((row_number() OVER (ORDER BY uuid)) - 1) / p_batch_size AS batch_no
+        FROM players
+    ) numbered
+    GROUP BY batch_no
+    ON CONFLICT (sweep_id, batch_no) DO NOTHING;
+
+    RETURN (SELECT count(*) FROM tracker_leases WHERE sweep_id = p_sweep_id);
+END;
+$$;
+
+-- Returns the newest sweep that still has claimable or leased batches, or creates p_new_sweep_id when there is
+-- none. The advisory lock makes workers starting at the same time agree on one sweep.
+CREATE OR REPLACE FUNCTION join_tracker_sweep(p_new_sweep_id TEXT, p_batch_size INTEGER, p_max_attempts INTEGER)
+RETURNS TEXT
+LANGUAGE plpgsql SECURITY DEFINER AS $$
+DECLARE
+    v_sweep_id TEXT;
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('tracker_leases'));
+
+    SELECT l.sweep_id INTO v_sweep_id
+    FROM tracker_leases AS l
+    WHERE l.status <> 'done' AND l.attempts < p_max_attempts
+    GROUP BY l.sweep_id
+    ORDER BY min(l.created_at) DESC
+    LIMIT 1;
+
+    IF v_sweep_id IS NULL THEN
+        v_sweep_id := p_new_sweep_id;
+        PERFORM create_tracker_sweep(v_sweep_id, p_batch_size);
+    END IF;
+    RETURN v_sweep_id;
+END;
+$$;
+
+-- Leases the next pending batch, or one whose lease expired, to p_worker. Batches already
+-- claimed p_max_attempts times are skipped. Returns no row when nothing is claimable.
+CREATE OR REPLACE FUNCTION claim_tracker_batch(
+    p_sweep_id TEXT, p_worker TEXT, p_lease_seconds INTEGER, p_max_attempts INTEGER
+)
+RETURNS TABLE (batch_no INTEGER, uuids TEXT[], attempts INTEGER, lease_expires_at TIMESTAMPTZ)
+LANGUAGE plpgsql SECURITY DEFINER AS $$
+BEGIN
+    RETURN QUERY
+    UPDATE tracker_leases AS l
+    SET status = 'leased',
+        worker = p_worker,
+        lease_expires_at = NOW() + make_interval(secs => p_lease_seconds),
+        attempts = l.attempts + 1,
+        updated_at = NOW()
+    WHERE (l.sweep_id, l.batch_no) = (
+        SELECT c.sweep_id, c.batch_no
+        FROM tracker_leases AS c
+        WHERE c.sweep_id = p_sweep_id
+          AND c.attempts < p_max_attempts
+          AND (c.status = 'pending' OR (c.status = 'leased' AND c.lease_expires_at < NOW()))
+        ORDER BY c.batch_no
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING l.batch_no, l.uuids, l.attempts, l.lease_expires_at;
+END;
+$$;
+
+-- Extends a lease still held by p_worker. Returns false if the lease was lost (expired and reclaimed).
+CREATE OR REPLACE FUNCTION renew_tracker_lease(
+    p_sweep_id TEXT, p_batch_no INTEGER, p_worker TEXT, p_lease_seconds INTEGER
+)
+RETURNS BOOLEAN
+LANGUAGE plpgsql SECURITY DEFINER AS $$
+BEGIN
+    UPDATE tracker_leases
+    SET lease_expires_at = NOW() + make_interval(secs => p_lease_seconds), updated_at = NOW()
+    WHERE sweep_id = p_sweep_id AND batch_no = p_batch_no AND worker = p_worker
+      AND status = 'leased' AND lease_expires_at > NOW();
+    RETURN FOUND;
+END;
+$$;
+
+-- Marks a batch done with its counts, if p_worker still holds it. Returns false otherwise.
+CREATE OR REPLACE FUNCTION complete_tracker_batch(
+    p_sweep_id TEXT, p_batch_no INTEGER, p_worker TEXT, p_tracked INTEGER, p_failed INTEGER
+)
+RETURNS BOOLEAN
+LANGUAGE plpgsql SECURITY DEFINER AS $$
+BEGIN
+    UPDATE tracker_leases
+    SET status = 'done', tracked = p_tracked, failed = p_failed, lease_expires_at = NULL, updated_at = NOW()
+    WHERE sweep_id = p_sweep_id AND batch_no = p_batch_no AND worker = p_worker AND status = 'leased';
+    RETURN FOUND;
+END;
+$$;
+
+-- Progress of a sweep, for monitoring
+CREATE OR REPLACE FUNCTION tracker_sweep_progress(p_sweep_id TEXT)
+RETURNS TABLE (status TEXT, batches BIGINT, players BIGINT, tracked BIGINT, failed BIGINT)
+LANGUAGE sql SECURITY DEFINER AS $$
+    SELECT
+        CASE WHEN l.status = 'leased' AND l.lease_expires_at < NOW() THEN 'expired' ELSE l.status END,
+        count(*), sum(cardinality(l.uuids)), sum(l.tracked), sum(l.failed)
+    FROM tracker_leases AS l
+    WHERE l.sweep_id = p_sweep_id
+    GROUP BY 1;
+$$;
+
+GRANT EXECUTE ON FUNCTION create_tracker_sweep(TEXT, INTEGER) TO anon, authenticated;
+GRANT EXECUTE ON FUNCTION join_tracker_sweep(TEXT, INTEGER, INTEGER) TO anon, authenticated;
+GRANT EXECUTE ON FUNCTION claim_tracker_batch(TEXT, TEXT, INTEGER, INTEGER) TO anon, authenticated;
+GRANT EXECUTE ON FUNCTION renew_tracker_lease(TEXT, INTEGER, TEXT, INTEGER) TO anon, authenticated;
+GRANT EXECUTE ON FUNCTION complete_tracker_batch(TEXT, INTEGER, TEXT, INTEGER, INTEGER) TO anon, authenticated;
+GRANT EXECUTE ON FUNCTION tracker_sweep_progress(TEXT) TO anon, authenticated;
@@ -0,0 +1,121 @@
+"""
+Per-request deadlines propagated through the fetch chain.
+
+A route sets one deadline for the whole request (`with deadline(3.0):`);
+every outbound call, retry loop and wait below it asks how much of that
+budget is left instead of using its own fixed timeout. The deadline lives in
+a context variable like the request trace, so it follows the request without
+being passed around, and nested deadlines can only shorten it. A deadline
+can also be cancelled from outside (see hedging.py), which stops the work
+running under it at its next step.
+"""
+
+import contextvars
+import math
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+import requests
+
+
+class DeadlineExceeded(requests.exceptions.Timeout):
+    """The request's deadline passed (or was cancelled) before the next step could start."""
+
+
+class Deadline:
+    """A point in time (monotonic) that also honours every enclosing deadline."""
+
+    __slots__ = ('at', 'parent')
+
+    def __init__(self, at: float, parent: Optional['Deadline'] = None):
+        self.at = at
+        self.parent = parent
+
+    @property
+    def expires_at(self) -> float:
+        at = self.at
+        parent = self.parent
+        while parent is not None:
+            at = min(at, parent.at)
+            parent = parent.parent
+        return at
+
+    def cancel(self):
+        """Expires this deadline now, for whatever is running under it."""
+        self.at = -math.inf
+
+    @property
+    def cancelled(self) -> bool:
+        return self.expires_at == -math.inf
+
+
+_deadline = contextvars.ContextVar('lava_deadline', default=None)
+
+
+@contextmanager
+def deadline(seconds: Optional[float]):
+    """Bounds the enclosed work to `seconds` from now (None or <= 0 leaves it unbounded)."""
+    if seconds is None or seconds <= 0:
+        yield
+        return
+    with use(Deadline(time.monotonic() + seconds, _deadline.get())) as current:
+        yield current
+
+
+@contextmanager
+def fresh(seconds: float):
+    """
+    A new deadline `seconds` from now that ignores the enclosing one, for last-resort work that runs
+    because the request's deadline has passed (serving the stale cache).
+    """
+    with use(Deadline(time.monotonic() + seconds)) as current:
+        yield current
+
+
+def cancellable() -> Deadline:
+    """A handle that expires only when cancelled (or with the current deadline); run work under it with `use()`."""
+    return Deadline(math.inf, _deadline.get())
+
+
+@contextmanager
+def use(handle: Deadline):
+    """Makes `handle` the deadline of the enclosed work, e.g. in a thread started for this request."""
+    token = _deadline.set(handle)
+    try:
+        yield handle
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current deadline, or None without one."""
+    current = _deadline.get()
+    if current is None:
+        return None
+    at = current.expires_at
+    return None if at == math.inf else max(at - time.monotonic(), 0.0)
+
+
+def expired() -> bool:
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def cancelled() -> bool:
+    """True if the current deadline (or an enclosing one) was cancelled: nobody is waiting for the result."""
+    current = _deadline.get()
+    return current is not None and current.cancelled
+
+
+def clamp(timeout: Optional[float]) -> Optional[float]:
+    """
+    A timeout or wait shortened to what is left of the deadline.
+    Raises DeadlineExceeded when nothing is left, so no new call is started.
+    """
+    left = remaining()
+    if left is None:
+        return timeout
+    if left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+    return left if timeout is None else min(timeout, left)
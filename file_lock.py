@@ -0,0 +1,39 @@
+"""
+Advisory file locks shared by the processes of one host.
+
+Gunicorn workers each run the same background jobs; where a job loads data
+from Supabase into a file every worker reads (the name index seed, the
+suggest snapshot), the lock lets one worker do the loading while the others
+wait for or skip it. Without fcntl (Windows) every caller gets the lock, so
+each process does the work itself as before.
+"""
+
+import os
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+@contextmanager
+def exclusive(path: str, blocking: bool = True):
+    """
+    Holds an exclusive lock on `path` (created if needed) for the enclosed block and yields True,
+    or yields False right away when `blocking` is False and another process holds it.
+    """
+    if fcntl is None:
+        yield True
+        return
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'a') as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
@@ -0,0 +1,35 @@
+# Lava_Stat_Checker/gunicorn.conf.py
+# Loaded automatically by `gunicorn app:app` (see Procfile).
+import os
+import shutil
+import tempfile
+
+# Serving mode. Sync workers (the default) are busy for a request's whole chain of Mojang, Hypixel,
+# scraper and Supabase calls. GUNICORN_WORKER_CLASS=gevent lets each worker keep up to
+# GUNICORN_WORKER_CONNECTIONS lookups in flight while they wait on upstreams (see README, Serving).
+# Command-line flags still win, e.g. `gunicorn app:app -k gevent`.
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'sync')
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', '1000'))
+threads = int(os.getenv('GUNICORN_THREADS', '1'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '30'))
+
+# Aggregate Prometheus metrics across workers; must be set before workers import app
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'lava_prometheus'))
+
+
+def on_starting(server):
+    """Start every master with an empty metrics directory."""
+    metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def post_worker_init(worker):
+    """Start the worker's background loaders once it is ready, rather than at import (see app.start_background_tasks)."""
+    import app
+    app.start_background_tasks()
+
+
+def child_exit(server, worker):
+    import metrics
+    metrics.mark_process_dead(worker.pid)
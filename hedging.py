@@ -0,0 +1,148 @@
+"""
+Hedged requests: start a backup path when the primary one is slow.
+
+The primary call runs right away; if it has not finished after `hedge_after`
+seconds (set near its p95 latency), the backup call is started alongside it
+and whichever valid result arrives first is returned. The loser is cancelled
+through its own deadline (see deadlines.py), so it stops at its next step and
+spends no further upstream budget; an HTTP call already in flight finishes on
+its own and is discarded.
+
+Hedges are capped by a token bucket: every request earns `max_ratio` of a
+token (up to `burst`) and every hedge spends one, so over time at most that
+fraction of requests sends the extra upstream call, even when the primary
+upstream is slow for everyone.
+"""
+
+import contextvars
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Any, Callable
+
+import deadlines
+import metrics
+import tracing
+
+logger = logging.getLogger(__name__)
+
+
+class HedgeBudget:
+    """Token bucket limiting hedges to a fraction of requests."""
+
+    def __init__(self, max_ratio: float, burst: float):
+        self.max_ratio = max_ratio
+        self.burst = burst
+        self._tokens = burst
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + self.max_ratio)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class Once:
+    """Runs `fn` at most once; later callers wait for and share the first call's result."""
+
+    def __init__(self, fn: Callable[[], Any]):
+        self._fn = fn
+        self._lock = threading.Lock()
+        self._future = None
+
+    @property
+    def started(self) -> bool:
+        return self._future is not None
+
+    def __call__(self):
+        with self._lock:
+            owner = self._future is None
+            if owner:
+                self._future = Future()
+        if owner:
+            try:
+                self._future.set_result(self._fn())
+            except BaseException as e:
+                self._future.set_exception(e)
+        return self._future.result()
+
+
+def _start(name: str, fn: Callable[[], Any]):
+    """Runs `fn` in a thread with the caller's context under a fresh cancel handle; returns (future, handle)."""
+    future = Future()
+    handle = deadlines.cancellable()
+    context = contextvars.copy_context()
+
+    def run():
+        with deadlines.use(handle), tracing.span(name):
+            try:
+                future.set_result(fn())
+            except BaseException as e:
+                future.set_exception(e)
+
+    threading.Thread(target=lambda: context.run(run), name=name, daemon=True).start()
+    return future, handle
+
+
+class Hedger:
+    """Races a backup call against a primary call that is slower than `hedge_after`."""
+
+    def __init__(self, name: str, hedge_after: float, max_ratio: float, burst: float):
+        self.name = name
+        self.hedge_after = hedge_after
+        self.budget = HedgeBudget(max_ratio, burst)
+
+    def run(self, primary: Callable[[], Any], backup: Callable[[], Any], accept_backup: Callable[[Any], bool],
+            skip_hedge: Callable[[], bool] = lambda: False):
+        """
+        Returns (result, winner) with winner 'primary' or 'backup'. The primary result is always final;
+        a backup result only wins if `accept_backup` approves it, otherwise the primary is awaited.
+        `skip_hedge` is checked when the hedge is due, e.g. when the primary already moved on to the backup path.
+        """
+        self.budget.deposit()
+        start = time.monotonic()
+        primary_future, primary_handle = _start(f'{self.name}_primary', primary)
+        # The primary runs under the request's deadline, so this never outlives it
+        done, _ = wait([primary_future], timeout=self.hedge_after)
+        if done:
+            metrics.HEDGED_REQUESTS.labels(hedge=self.name, outcome='not_needed').inc()
+            return primary_future.result(), 'primary'
+        if skip_hedge():
+            metrics.HEDGED_REQUESTS.labels(hedge=self.name, outcome='skipped').inc()
+            return primary_future.result(), 'primary'
+        if not self.budget.try_spend():
+            metrics.HEDGED_REQUESTS.labels(hedge=self.name, outcome='capped').inc()
+            return primary_future.result(), 'primary'
+
+        logger.info(f"{self.name}: primary slower than {self.hedge_after}s, starting backup")
+        backup_future, backup_handle = _start(f'{self.name}_backup', backup)
+        pending = {primary_future, backup_future}
+        try:
+            while True:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                if primary_future in done:
+                    winner, result = 'primary', primary_future.result()
+                    break
+                try:
+                    result = backup_future.result()
+                except Exception as e:
+                    logger.warning(f"{self.name}: backup failed: {e}")
+                    continue
+                if accept_backup(result):
+                    winner = 'backup'
+                    break
+        finally:
+            # Cancel whichever leg is still running; it stops at its next step
+            for future, handle in ((primary_future, primary_handle), (backup_future, backup_handle)):
+                if not future.done():
+                    handle.cancel()
+        metrics.HEDGED_REQUESTS.labels(hedge=self.name, outcome=f'{winner}_won').inc()
+        metrics.HEDGE_LATENCY.labels(hedge=self.name, winner=winner).observe(time.monotonic() - start)
+        return result, winner
@@ -0,0 +1,113 @@
+"""
+HTTP response caching for player pages and API responses.
+
+Keeps recently built responses in memory keyed by player, attaches
+ETag / Last-Modified / Cache-Control validators derived from the age of the
+underlying stats, and answers conditional GETs with 304 so browsers and CDNs
+can absorb repeat traffic.
+"""
+
+import datetime
+import hashlib
+import json
+import time
+from typing import Any, Callable, Dict, Optional
+
+from flask import Response, request
+
+from config import RESPONSE_CACHE_TTL, RESPONSE_CACHE_MAX_ENTRIES
+from models import PlayerStats
+from scrapper import CACHE_DURATION
+from ttl_cache import TTLCache
+
+
+class CachedResponse:
+    """A response body plus the validators it was served with."""
+
+    __slots__ = ('body', 'status', 'mimetype', 'etag', 'last_modified', 'expires_at')
+
+    def __init__(self, body, status, mimetype, etag, last_modified, expires_at):
+        self.body = body
+        self.status = status
+        self.mimetype = mimetype
+        self.etag = etag
+        self.last_modified = last_modified
+        self.expires_at = expires_at
+
+
+# Whole responses keyed by (route, player); rendered stats.html keyed by data version
+response_cache = TTLCache(RESPONSE_CACHE_MAX_ENTRIES)
+fragment_cache = TTLCache(RESPONSE_CACHE_MAX_ENTRIES)
+
+
+def data_version(stats: Dict[str, Any]) -> str:
+    """Stable hash of the stats payload, used as the strong ETag."""
+    if isinstance(stats, PlayerStats):
+        stats = stats.to_dict()
+    payload = json.dumps(stats, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def data_timestamp(stats: Dict[str, Any]) -> datetime.datetime:
+    """When the underlying stats were fetched (UTC), falling back to now for results that carry no time."""
+    raw = stats.get('last_updated') or stats.get('cache_time')
+    if raw:
+        try:
+            parsed = datetime.datetime.fromisoformat(str(raw).replace('Z', '+00:00'))
+            if parsed.tzinfo is None:
+                parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+            return parsed
+        except ValueError:
+            pass
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def cache_ttl_for(stats: Dict[str, Any]) -> int:
+    """Seconds the response may be reused: whatever is left of the stats cache window, capped; never for stale data."""
+    if stats.get('stale'):
+        return 0
+    age = (datetime.datetime.now(datetime.timezone.utc) - data_timestamp(stats)).total_seconds()
+    return max(0, min(RESPONSE_CACHE_TTL, int(CACHE_DURATION - age)))
+
+
+def _apply_validators(response: Response, etag: str, last_modified: datetime.datetime, max_age: int) -> Response:
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    if max_age > 0:
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+    else:
+        response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+def serve_cached(cache_key) -> Optional[Response]:
+    """Answer from the response cache (304 when the client already has it), or None on a miss."""
+    entry = response_cache.get(cache_key)
+    if entry is None:
+        return None
+    response = Response(entry.body, status=entry.status, mimetype=entry.mimetype)
+    max_age = max(0, int(entry.expires_at - time.time()))
+    return _apply_validators(response, entry.etag, entry.last_modified, max_age)
+
+
+def finalize(cache_key, response: Response, stats: Dict[str, Any], etag: Optional[str] = None) -> Response:
+    """Attach validators to a freshly built response, remember it and answer conditionally."""
+    etag = etag or data_version(stats)
+    last_modified = data_timestamp(stats)
+    max_age = cache_ttl_for(stats)
+    if response.status_code == 200 and max_age > 0:
+        response_cache.set(cache_key, CachedResponse(
+            response.get_data(), response.status_code, response.mimetype,
+            etag, last_modified, time.time() + max_age
+        ), max_age)
+    return _apply_validators(response, etag, last_modified, max_age)
+
+
+def render_fragment(version: str, stats: Dict[str, Any], render: Callable[[], str]) -> str:
+    """Reuse rendered stats.html for a data version seen recently, rendering only on a miss."""
+    html = fragment_cache.get(version)
+    if html is None:
+        html = render()
+        fragment_cache.set(version, html, cache_ttl_for(stats))
+    return html
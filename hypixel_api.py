@@ -1,31 +1,56 @@
 import requests
-import math
 import scrapper
 import re
-import traceback
+import logging
 import datetime
-from config import API_KEY
-from supabase_handler import supabase_handler
-
-BASE_URL = "https://api.hypixel.net/v2"
+import metrics
+import hypixel_budget
+import deadlines
+import negative_cache
+from hedging import Hedger, Once
+from hypixel_keys import NoHealthyKey, key_id, key_pool
+from name_index import name_index
+from config import (
+    API_KEY, HYPIXEL_API_BASE, HYPIXEL_HEDGE_AFTER, HYPIXEL_HEDGE_BURST, HYPIXEL_HEDGE_MAX_RATIO,
+    MOJANG_PROFILE_URL,
+)
+from models import PlayerStats, modes_from_bedwars
+from hypixel_json import decode_player_response
+from bedwars_level import level_from_exp
+
+BASE_URL = HYPIXEL_API_BASE
 PLAYER_URL = f"{BASE_URL}/player"
-UUID_URL = "https://api.mojang.com/users/profiles/minecraft/"
-
-def get_bedwars_level(exp: int):
-    if not isinstance(exp, int) or exp < 0:
-        return 0.0
-    level = 100 * (exp // 487000)
-    exp = exp % 487000
-    if exp < 500: return level + exp / 500
-    level += 1
-    if exp < 1500: return level + (exp - 500) / 1000
-    level += 1
-    if exp < 3500: return level + (exp - 3500) / 2000
-    level += 1
-    if exp < 7000: return level + (exp - 3500) / 3500
-    level += 1
-    exp -= 7000
-    return level + exp / 5000
+UUID_URL = MOJANG_PROFILE_URL
+
+logger = logging.getLogger(__name__)
+
+hedger = Hedger('hypixel', HYPIXEL_HEDGE_AFTER, HYPIXEL_HEDGE_MAX_RATIO, HYPIXEL_HEDGE_BURST)
+
+def hypixel_get(params: dict, stage: str):
+    """
+    GET /player once the shared budget admits the current priority class, using the least-loaded key.
+    A key rejected with 403/429 is quarantined and the request retried with the next healthy key.
+    Raises BudgetExhausted or NoHealthyKey (both RequestExceptions) when no request can be sent; neither
+    uses up budget, so requests made while every key is quarantined don't hold back traffic after recovery.
+    """
+    for attempt in range(max(len(key_pool), 1)):
+        key_pool.require_healthy()
+        hypixel_budget.acquire()
+        try:
+            key = key_pool.acquire()
+        except NoHealthyKey:
+            # Every key was quarantined while this request waited for the budget
+            hypixel_budget.release()
+            raise
+        with metrics.timed(stage):
+            response = requests.get(PLAYER_URL, params={**params, "key": key}, timeout=deadlines.clamp(10))
+        metrics.record_upstream('hypixel', response.status_code)
+        key_pool.record(key, response.status_code, response.headers)
+        if response.status_code not in (403, 429) or key_pool.healthy_count() == 0:
+            return response
+        metrics.UPSTREAM_RETRIES.labels(upstream='hypixel').inc()
+        logger.info(f"Hypixel API key {key_id(key)} rejected with {response.status_code}, retrying with another key")
+    return response
 
 def get_player_uuid_by_current_name(username: str):
     """
@@ -36,51 +61,62 @@ def get_player_uuid_by_current_name(username: str):
     if API_KEY.lower() == "off":
         return None
     
-    try:
-        response_mojang = requests.get(f"{UUID_URL}{username}", timeout=5)
-        if response_mojang.status_code == 200:
-            data_mojang = response_mojang.json()
-            if data_mojang and 'id' in data_mojang and data_mojang.get('name', '').lower() == username.lower():
-                 print(f"UUID found via Mojang for {username}")
-                 return data_mojang.get("id")
-        elif response_mojang.status_code == 204 or response_mojang.status_code == 404:
-             print(f"Mojang API did not find user {username} or name history.")
-             pass
-        else:
-            print(f"Mojang API returned unexpected status code {response_mojang.status_code} for {username}.")
+    if negative_cache.known_missing('mojang', username):
+        logger.debug(f"Mojang recently found no user {username}, skipping it.")
+    else:
+        try:
+            with metrics.timed('mojang_lookup'):
+                response_mojang = requests.get(f"{UUID_URL}{username}", timeout=deadlines.clamp(5))
+            metrics.record_upstream('mojang', response_mojang.status_code)
+            if response_mojang.status_code == 200:
+                data_mojang = response_mojang.json()
+                if data_mojang and 'id' in data_mojang and data_mojang.get('name', '').lower() == username.lower():
+                     logger.debug(f"UUID found via Mojang for {username}")
+                     return data_mojang.get("id")
+            elif response_mojang.status_code == 204 or response_mojang.status_code == 404:
+                 logger.info(f"Mojang API did not find user {username} or name history.")
+                 negative_cache.record('mojang', username)
+            else:
+                logger.warning(f"Mojang API returned unexpected status code {response_mojang.status_code} for {username}.")
 
-    except requests.exceptions.RequestException as e:
-        print(f"Mojang API request error for {username}: {e}. Trying Hypixel.")
-    except Exception as e:
-        print(f"Error processing Mojang response for {username}: {e}. Trying Hypixel.")
+        except requests.exceptions.RequestException as e:
+            metrics.record_upstream('mojang', 'error')
+            logger.warning(f"Mojang API request error for {username}: {e}. Trying Hypixel.")
+        except Exception as e:
+            logger.warning(f"Error processing Mojang response for {username}: {e}. Trying Hypixel.")
+
+    if negative_cache.known_missing('hypixel', username):
+        logger.debug(f"Hypixel recently found no player named {username}, skipping lookup.")
+        return None
 
     try:
-        params = {"key": API_KEY, "name": username}
-        response_hypixel = requests.get(PLAYER_URL, params=params, timeout=10)
+        params = {"name": username}
+        response_hypixel = hypixel_get(params, 'hypixel_name_lookup')
         response_hypixel.raise_for_status()
-        data_hypixel = response_hypixel.json()
+        data_hypixel = decode_player_response(response_hypixel.content)
 
         if data_hypixel.get("success"):
             player_data = data_hypixel.get("player")
             if player_data:
                  if player_data.get("displayname", "").lower() == username.lower():
-                     print(f"UUID found via Hypixel for {username}")
+                     logger.debug(f"UUID found via Hypixel for {username}")
                      return player_data.get("uuid")
                  else:
-                     print(f"Hypixel API found UUID but displayname '{player_data.get('displayname')}' does not match '{username}'.")
+                     logger.info(f"Hypixel API found UUID but displayname '{player_data.get('displayname')}' does not match '{username}'.")
                      return None
             else:
-                 print(f"Hypixel API found no player data for name {username}.")
+                 logger.info(f"Hypixel API found no player data for name {username}.")
+                 negative_cache.record('hypixel', username)
                  return None
         else:
              cause = data_hypixel.get("cause", "Unknown reason")
-             print(f"Hypixel API success=false for name {username}. Cause: {cause}")
+             logger.warning(f"Hypixel API success=false for name {username}. Cause: {cause}")
              return None
     except requests.exceptions.RequestException as e:
-        print(f"Hypixel API name lookup error for {username}: {e}")
+        logger.warning(f"Hypixel API name lookup error for {username}: {e}")
         return None
     except Exception as e:
-        print(f"Error processing Hypixel name lookup for {username}: {e}")
+        logger.error(f"Error processing Hypixel name lookup for {username}: {e}")
         return None
 
 def get_uuid_by_historical_name(username: str):
@@ -93,61 +129,36 @@ def get_uuid_by_historical_name(username: str):
     if API_KEY.lower() == "off":
         return None, None
     
+    if negative_cache.known_missing('hypixel', username):
+        logger.debug(f"Hypixel recently found no player named {username}, skipping historical lookup.")
+        return None, None
+
     try:
-        params = {"key": API_KEY, "name": username}
-        response_hypixel = requests.get(PLAYER_URL, params=params, timeout=10)
+        params = {"name": username}
+        response_hypixel = hypixel_get(params, 'hypixel_history_lookup')
         response_hypixel.raise_for_status()
-        data_hypixel = response_hypixel.json()
+        data_hypixel = decode_player_response(response_hypixel.content)
         if data_hypixel.get("success") and data_hypixel.get("player"):
             uuid = data_hypixel["player"].get("uuid")
             current_name = data_hypixel["player"].get("displayname", "")
             if uuid and current_name and current_name.lower() != username.lower():
-                print(f"Hypixel API found historical name '{username}', current name is '{current_name}'.")
+                logger.info(f"Hypixel API found historical name '{username}', current name is '{current_name}'.")
                 return uuid, current_name
             else:
-                 print(f"Hypixel API found player for historical lookup, but name does not seem changed for '{username}'.")
+                 logger.debug(f"Hypixel API found player for historical lookup, but name does not seem changed for '{username}'.")
                  return None, None
         else:
-             print(f"Hypixel API found no player for historical name lookup '{username}'.")
+             logger.info(f"Hypixel API found no player for historical name lookup '{username}'.")
+             if data_hypixel.get("success"):
+                 negative_cache.record('hypixel', username)
              return None, None
     except requests.exceptions.RequestException as e:
-        print(f"Hypixel API historical lookup request error for {username}: {e}")
+        logger.warning(f"Hypixel API historical lookup request error for {username}: {e}")
         return None, None
     except Exception as e:
-        print(f"Error processing Hypixel historical lookup response for {username}: {e}")
+        logger.error(f"Error processing Hypixel historical lookup response for {username}: {e}")
         return None, None
 
-def calculate_ratio(numerator, denominator):
-    if denominator == 0:
-        return float(numerator) if numerator != 0 else 0.0
-    return round(numerator / denominator, 2)
-
-def calculate_mode_stats(bw_stats, prefix):
-    wins = bw_stats.get(f"{prefix}wins_bedwars", 0)
-    losses = bw_stats.get(f"{prefix}losses_bedwars", 0)
-    final_kills = bw_stats.get(f"{prefix}final_kills_bedwars", 0)
-    final_deaths = bw_stats.get(f"{prefix}final_deaths_bedwars", 0)
-    beds_broken = bw_stats.get(f"{prefix}beds_broken_bedwars", 0)
-    beds_lost = bw_stats.get(f"{prefix}beds_lost_bedwars", 0)
-    kills = bw_stats.get(f"{prefix}kills_bedwars", 0)
-    deaths = bw_stats.get(f"{prefix}deaths_bedwars", 0)
-
-    games_played = wins + losses
-    wlr = calculate_ratio(wins, losses)
-    fkdr = calculate_ratio(final_kills, final_deaths)
-    bblr = calculate_ratio(beds_broken, beds_lost)
-    kdr = calculate_ratio(kills, deaths)
-
-    win_rate = round((wins / games_played) * 100, 2) if games_played > 0 else 0.0
-    finals_per_game = round(final_kills / games_played, 2) if games_played > 0 else 0.0
-
-    return {
-        "wins": wins, "losses": losses, "wlr": wlr, "win_rate": win_rate, "games_played": games_played,
-        "final_kills": final_kills, "final_deaths": final_deaths, "fkdr": fkdr, "finals_per_game": finals_per_game,
-        "beds_broken": beds_broken, "beds_lost": beds_lost, "bblr": bblr,
-        "kills": kills, "deaths": deaths, "kdr": kdr,
-    }
-
 def _get_rank_info(player_data):
     prefix = player_data.get("prefix")
     if prefix:
@@ -177,7 +188,7 @@ def _get_rank_info(player_data):
 def get_player_stats_by_uuid(uuid: str):
     """
     Fetches player stats using Hypixel API by UUID.
-    Returns a dictionary of stats or an error dictionary.
+    Returns a PlayerStats model or an error dictionary.
     """
     # Skip if API is disabled
     if API_KEY.lower() == "off":
@@ -186,15 +197,15 @@ def get_player_stats_by_uuid(uuid: str):
     if not uuid:
         return {"error": "Invalid UUID provided."}
 
-    params = {"key": API_KEY, "uuid": uuid}
+    params = {"uuid": uuid}
     try:
-        response = requests.get(PLAYER_URL, params=params, timeout=10)
+        response = hypixel_get(params, 'hypixel_fetch')
         response.raise_for_status()
-        data = response.json()
+        data = decode_player_response(response.content)
 
         if not data.get("success") or not data.get("player"):
             error_cause = "Player not found." if not data.get("player") else data.get("cause", "API error.")
-            print(f"Hypixel API success=false or no player data for UUID {uuid}. Cause: {error_cause}")
+            logger.warning(f"Hypixel API success=false or no player data for UUID {uuid}. Cause: {error_cause}")
             return {"error": error_cause, "uuid": uuid}
 
         player_data = data["player"]
@@ -205,236 +216,233 @@ def get_player_stats_by_uuid(uuid: str):
         achievements = player_data.get("achievements", {})
 
         exp = bw_stats.get("Experience", 0)
-        level = math.floor(get_bedwars_level(exp))
-
-        overall_wins = bw_stats.get("wins_bedwars", 0)
-        overall_losses = bw_stats.get("losses_bedwars", 0)
-        overall_final_kills = bw_stats.get("final_kills_bedwars", 0)
-        overall_final_deaths = bw_stats.get("final_deaths_bedwars", 0)
-        overall_beds_broken = bw_stats.get("beds_broken_bedwars", 0)
-        overall_beds_lost = bw_stats.get("beds_lost_bedwars", 0)
-        overall_kills = bw_stats.get("kills_bedwars", 0)
-        overall_deaths = bw_stats.get("deaths_bedwars", 0)
-        coins = bw_stats.get("coins", 0)
-        slumber_tickets = achievements.get("bedwars_slumber_ticket_master") # Example achievement
-
-        overall_games_played = overall_wins + overall_losses
-
-        overall_wlr = calculate_ratio(overall_wins, overall_losses)
-        overall_fkdr = calculate_ratio(overall_final_kills, overall_final_deaths)
-        overall_bblr = calculate_ratio(overall_beds_broken, overall_beds_lost)
-        overall_kdr = calculate_ratio(overall_kills, overall_deaths)
-
-        overall_win_rate = round((overall_wins / overall_games_played) * 100, 2) if overall_games_played > 0 else 0.0
-        overall_finals_per_star = round(overall_final_kills / level, 2) if level > 0 else float(overall_final_kills) if overall_final_kills > 0 else 0.0
-        overall_finals_per_game = round(overall_final_kills / overall_games_played, 2) if overall_games_played > 0 else float(overall_final_kills) if overall_final_kills > 0 else 0.0
-
-
-        modes_data = {
-            "solos": calculate_mode_stats(bw_stats, "eight_one_"),
-            "doubles": calculate_mode_stats(bw_stats, "eight_two_"),
-            "threes": calculate_mode_stats(bw_stats, "four_three_"),
-            "fours": calculate_mode_stats(bw_stats, "four_four_"),
-            "4v4": calculate_mode_stats(bw_stats, "two_four_")
-        }
-
-        core_modes = ["solos", "doubles", "threes", "fours"]
-        core_stats_agg = {
-            "wins": 0, "losses": 0, "final_kills": 0, "final_deaths": 0,
-            "beds_broken": 0, "beds_lost": 0, "kills": 0, "deaths": 0,
-            "games_played": 0
-        }
-        for mode in core_modes:
-            if mode_data := modes_data.get(mode):
-                 for key in core_stats_agg:
-                    core_stats_agg[key] += mode_data.get(key, 0)
-
-        core_wlr = calculate_ratio(core_stats_agg["wins"], core_stats_agg["losses"])
-        core_fkdr = calculate_ratio(core_stats_agg["final_kills"], core_stats_agg["final_deaths"])
-        core_bblr = calculate_ratio(core_stats_agg["beds_broken"], core_stats_agg["beds_lost"])
-        core_kdr = calculate_ratio(core_stats_agg["kills"], core_stats_agg["deaths"])
-        core_win_rate = round((core_stats_agg["wins"] / core_stats_agg["games_played"]) * 100, 2) if core_stats_agg["games_played"] > 0 else 0.0
-        core_finals_per_game = round(core_stats_agg["final_kills"] / core_stats_agg["games_played"], 2) if core_stats_agg["games_played"] > 0 else float(core_stats_agg["final_kills"]) if core_stats_agg["final_kills"] > 0 else 0.0
-
-        modes_data['core'] = {
-            "wins": core_stats_agg["wins"], "losses": core_stats_agg["losses"], "wlr": core_wlr,
-            "win_rate": core_win_rate, "games_played": core_stats_agg["games_played"],
-            "final_kills": core_stats_agg["final_kills"], "final_deaths": core_stats_agg["final_deaths"],
-            "fkdr": core_fkdr, "finals_per_game": core_finals_per_game,
-            "beds_broken": core_stats_agg["beds_broken"], "beds_lost": core_stats_agg["beds_lost"], "bblr": core_bblr,
-            "kills": core_stats_agg["kills"], "deaths": core_stats_agg["deaths"], "kdr": core_kdr,
-        }
-
-        most_played_gamemode = "N/A"
-        max_games = -1
-        all_mode_titles = {'solos': 'Solos', 'doubles': 'Doubles', 'threes': 'Threes', 'fours': 'Fours', '4v4': '4v4'}
-        for mode_key, mode_title in all_mode_titles.items():
-            if mode_data := modes_data.get(mode_key):
-                if games := mode_data.get("games_played", 0):
-                    if games > max_games:
-                        max_games = games
-                        most_played_gamemode = mode_title
-
-        return {
-            "username": player_data.get("displayname", "N/A"),
-            "uuid": uuid,
-            "rank_info": rank_info,
-            "level": level,
-            "most_played_gamemode": most_played_gamemode if max_games > 0 else "N/A",
-            "overall": {
-                "wins": overall_wins, "losses": overall_losses, "wlr": overall_wlr,
-                "final_kills": overall_final_kills, "final_deaths": overall_final_deaths, "fkdr": overall_fkdr,
-                "beds_broken": overall_beds_broken, "beds_lost": overall_beds_lost, "bblr": overall_bblr,
-                "kills": overall_kills, "deaths": overall_deaths, "kdr": overall_kdr,
-                "coins": coins,
-                "bedwars_slumber_ticket_master": slumber_tickets,
-                "games_played": overall_games_played,
-                "win_rate": overall_win_rate,
-                "finals_per_star": overall_finals_per_star,
-                "finals_per_game": overall_finals_per_game,
-            },
-            "modes": modes_data,
-            "fetched_by": "api"
-        }
+        overall, modes = modes_from_bedwars(bw_stats)
+
+        player_stats = PlayerStats(
+            username=player_data.get("displayname", "N/A"),
+            uuid=uuid,
+            display_rank=rank_info["display_rank"],
+            level=int(level_from_exp(exp)),
+            coins=bw_stats.get("coins", 0),
+            slumber_tickets=achievements.get("bedwars_slumber_ticket_master"), # Example achievement
+            overall=overall,
+            modes=modes,
+            fetched_by="api",
+            last_updated=datetime.datetime.utcnow().isoformat(),
+        )
+        return player_stats.add_aggregates()
 
     except requests.exceptions.RequestException as e:
-        print(f"API request error fetching stats for UUID {uuid}: {e}")
+        logger.error(f"API request error fetching stats for UUID {uuid}: {e}")
         return {"error": f"API request error: {e}", "uuid": uuid, "fetched_by": "api_error"}
     except Exception as e:
-        print(f"Error processing stats for UUID {uuid}: {e}")
-        traceback.print_exc()
+        logger.exception(f"Error processing stats for UUID {uuid}: {e}")
         return {"error": f"Internal server error processing API stats: {e}", "uuid": uuid, "fetched_by": "api_error"}
 
 
+def _tag_scraped(scraped_data, username: str, api_error_details=None):
+    """Marks a scrapper result (PlayerStats or error dict) with the name searched for and its source."""
+    if isinstance(scraped_data, PlayerStats):
+        scraped_data.original_search = username
+        scraped_data.fetched_by = 'scrapper'
+        scraped_data.api_error_details = api_error_details
+    else:
+        scraped_data['original_search'] = username
+        scraped_data['fetched_by'] = 'scrapper'
+        if api_error_details:
+            scraped_data['api_error_details'] = api_error_details
+    return scraped_data
+
+
+def _name_changed(username: str, current_name: str, uuid: str, fetched_by: str):
+    """The redirect answer for a name that now belongs to `current_name`."""
+    return {
+        "error": "name_changed",
+        "original_search": username,
+        "current_name": current_name,
+        "uuid": uuid,
+        "fetched_by": fetched_by
+    }
+
+
+def _stale_if_out_of_time(result, username: str):
+    """When the request's deadline ran out before a live answer, serves the newest cached stats marked stale."""
+    if isinstance(result, PlayerStats) or not deadlines.expired():
+        return result
+    if (result and result.get('error') == 'name_changed') or deadlines.cancelled():
+        return result
+    stale = scrapper.check_stale_cache(username)
+    if stale is None:
+        metrics.DEADLINE_EXCEEDED.labels(outcome='error').inc()
+        return result
+    metrics.DEADLINE_EXCEEDED.labels(outcome='stale').inc()
+    logger.warning(f"Deadline exceeded for {username}; serving stale cached stats from {stale.last_updated}")
+    stale.original_search = username
+    return stale
+
+
 def fetch_player_data(username: str):
     """
     Fetches player data, attempting API first if enabled, then falling back to scrapper.
+    Every step only uses what is left of the request's deadline (see deadlines.py); if it runs out,
+    the newest cached stats are returned with stale=True. An API path slower than HYPIXEL_HEDGE_AFTER
+    is hedged with the cache/scraper path (see hedging.py).
     """
+    return _stale_if_out_of_time(_fetch_player_data(username), username)
+
+
+def _fetch_player_data(username: str):
+    # A rename we have already seen needs no upstream call at all
+    known = name_index.resolve(username)
+    if known and known['renamed']:
+        logger.info(f"'{username}' is a known former name of '{known['current_name']}' ({known['uuid']}).")
+        return _name_changed(username, known['current_name'], known['uuid'], 'name_index')
+    known_uuid = known['uuid'] if known else None
+
     # Check if API is disabled
     if API_KEY.lower() == "off":
-        print(f"[SCRAPER MODE] Fetching data for {username} (API disabled)...")
-        scraped_data = scrapper.scrape_bwstats(username)
-        scraped_data['original_search'] = username
-        scraped_data['fetched_by'] = 'scrapper'
-        print(f"Returning scrapper data for {username}.")
+        logger.info(f"[SCRAPER MODE] Fetching data for {username} (API disabled)...")
+        scraped_data = _tag_scraped(scrapper.scrape_bwstats(username), username)
+        logger.debug(f"Returning scrapper data for {username}.")
         return scraped_data
-    
-    print(f"Attempting to fetch data for {username}...")
-    uuid = get_player_uuid_by_current_name(username)
+
+    if HYPIXEL_HEDGE_AFTER <= 0:
+        return _fetch_via_api(username, lambda: scrapper.scrape_bwstats(username), known_uuid)
+
+    # The API path's own fallback and the hedge share one scrape, so a slow API that then fails never scrapes twice
+    scrape = Once(lambda: scrapper.scrape_bwstats(username))
+    result, winner = hedger.run(
+        lambda: _fetch_via_api(username, scrape, known_uuid),
+        scrape,
+        accept_backup=lambda data: isinstance(data, PlayerStats),
+        skip_hedge=lambda: scrape.started,
+    )
+    if winner == 'backup':
+        logger.info(f"Hedged cache/scrapper lookup answered first for {username}.")
+        _tag_scraped(result, username)
+    return result
+
+
+def _fetch_via_api(username: str, scrape, known_uuid=None):
+    """
+    The API path; `scrape()` is the cache/scrapper fallback for this username.
+    `known_uuid` comes from the name index and skips the name lookups.
+    """
+    logger.debug(f"Attempting to fetch data for {username}...")
+    uuid = known_uuid or get_player_uuid_by_current_name(username)
 
     if uuid:
-        print(f"UUID found for {username}: {uuid}. Attempting API fetch by UUID.")
+        logger.debug(f"UUID found for {username}: {uuid}. Attempting API fetch by UUID.")
         try:
             stats = get_player_stats_by_uuid(uuid)
-            if stats and stats.get('fetched_by') == 'api' and 'error' not in stats:
-                 stats['original_search'] = username
-                 stats['name_match'] = True
+            if isinstance(stats, PlayerStats):
+                 name_index.observe(uuid, stats.username if stats.username != "N/A" else None)
+                 if known_uuid and stats.username != "N/A" and stats.username.lower() != username.lower():
+                     logger.info(f"'{username}' was renamed to '{stats.username}' since the name index last saw it.")
+                     return _name_changed(username, stats.username, uuid, 'api_name_history')
+                 stats.original_search = username
+                 stats.name_match = True
                  
-                 # Save to Supabase cache
-                 supabase_handler.save_stats(username, stats, fetched_from='api')
+                 # Save to Supabase cache in the background, outside the request's deadline
+                 scrapper.save_to_supabase_async(username, stats, fetched_from='api')
                  
-                 print(f"Successfully fetched API data for {username} ({uuid}).")
+                 logger.info(f"Successfully fetched API data for {username} ({uuid}).")
                  return stats
             else:
-                 print(f"API fetch by UUID failed for {username} ({uuid}). Details: {stats.get('error')}. Falling back to scrapper.")
-                 scraped_data = scrapper.scrape_bwstats(username)
-                 scraped_data['original_search'] = username
-                 scraped_data['fetched_by'] = 'scrapper'
-                 if stats and stats.get('fetched_by') == 'api_error':
-                     scraped_data['api_error_details'] = stats.get('error')
-                 
-                 # Save to Supabase cache if successful
-                 if not scraped_data.get('error'):
-                     supabase_handler.save_stats(username, scraped_data, fetched_from='scraper')
-                 
-                 print(f"Returning scrapper data for {username}.")
+                 logger.warning(f"API fetch by UUID failed for {username} ({uuid}). Details: {stats.get('error')}. Falling back to scrapper.")
+                 metrics.FALLBACKS.labels(reason='api_error').inc()
+                 api_error_details = stats.get('error') if stats and stats.get('fetched_by') == 'api_error' else None
+                 # Fresh scrapes are persisted by the scrapper itself
+                 scraped_data = _tag_scraped(scrape(), username, api_error_details)
+                 logger.debug(f"Returning scrapper data for {username}.")
                  return scraped_data
 
         except Exception as e:
-            print(f"An unexpected error occurred during API fetch for {username} ({uuid}): {e}. Falling back to scrapper.")
-            traceback.print_exc()
-            scraped_data = scrapper.scrape_bwstats(username)
-            scraped_data['original_search'] = username
-            scraped_data['fetched_by'] = 'scrapper'
-            scraped_data['api_error_details'] = str(e)
-            
-            # Save to Supabase cache if successful
-            if not scraped_data.get('error'):
-                supabase_handler.save_stats(username, scraped_data, fetched_from='scraper')
-            
-            print(f"Returning scrapper data for {username} after API exception.")
+            logger.exception(f"An unexpected error occurred during API fetch for {username} ({uuid}): {e}. Falling back to scrapper.")
+            metrics.FALLBACKS.labels(reason='api_exception').inc()
+            scraped_data = _tag_scraped(scrape(), username, str(e))
+            logger.debug(f"Returning scrapper data for {username} after API exception.")
             return scraped_data
 
     else:
-        print(f"UUID not found for current name '{username}'. Checking for historical name...")
+        logger.debug(f"UUID not found for current name '{username}'. Checking for historical name...")
         historical_uuid, current_name_from_history = get_uuid_by_historical_name(username)
 
         if historical_uuid and current_name_from_history:
-            print(f"Identified '{username}' as a historical name for '{current_name_from_history}' (UUID: {historical_uuid}).")
-            return {
-                "error": "name_changed",
-                "original_search": username,
-                "current_name": current_name_from_history,
-                "uuid": historical_uuid,
-                "fetched_by": "api_name_history"
-            }
+            logger.info(f"Identified '{username}' as a historical name for '{current_name_from_history}' (UUID: {historical_uuid}).")
+            name_index.observe_rename(historical_uuid, username, current_name_from_history)
+            return _name_changed(username, current_name_from_history, historical_uuid, 'api_name_history')
         else:
-            print(f"Player '{username}' not found via API (current or historical lookup). Falling back to scrapper.")
-            scraped_data = scrapper.scrape_bwstats(username)
-            scraped_data['original_search'] = username
-            scraped_data['fetched_by'] = 'scrapper'
-            if 'error' not in scraped_data:
-                 scraped_data['api_error_details'] = f"Player '{username}' not found via Hypixel API lookup."
-                 # Save to Supabase cache
-                 supabase_handler.save_stats(username, scraped_data, fetched_from='scraper')
-            print(f"Returning scrapper data for {username} after API lookup failure.")
+            logger.info(f"Player '{username}' not found via API (current or historical lookup). Falling back to scrapper.")
+            metrics.FALLBACKS.labels(reason='not_found').inc()
+            scraped_data = scrape()
+            details = f"Player '{username}' not found via Hypixel API lookup." if isinstance(scraped_data, PlayerStats) else None
+            _tag_scraped(scraped_data, username, details)
+            logger.debug(f"Returning scrapper data for {username} after API lookup failure.")
             return scraped_data
 
 def fetch_multiple_player_data(usernames: list):
     """
     Fetches data for multiple players, handling potential API/scrapper fallbacks for each.
+    Players not answered before the request's deadline get their newest cached stats, marked stale.
     """
+    results = _fetch_multiple_player_data(usernames)
+    for username in usernames:
+        key = username.lower()
+        if key in results:
+            results[key] = _stale_if_out_of_time(results[key], username)
+    return results
+
+
+def _fetch_multiple_player_data(usernames: list):
     # Check if API is disabled
     if API_KEY.lower() == "off":
-        print(f"[SCRAPER MODE] Batch fetching {len(usernames)} users (API disabled)...")
+        logger.info(f"[SCRAPER MODE] Batch fetching {len(usernames)} users (API disabled)...")
         scraped_results = scrapper.scrape_multiple_bwstats(usernames)
         results = {}
         for username in usernames:
-            scraped_data = scraped_results.get(username, scrapper.scrape_bwstats(username))
-            scraped_data['original_search'] = username
-            scraped_data['fetched_by'] = 'scrapper'
-            results[username.lower()] = scraped_data
-        print(f"Returning scrapper data for {len(usernames)} users.")
+            scraped_data = scraped_results.get(username) or scrapper.scrape_bwstats(username)
+            results[username.lower()] = _tag_scraped(scraped_data, username)
+        logger.debug(f"Returning scrapper data for {len(usernames)} users.")
         return results
     
     results = {}
-    api_batch = []
     scraper_batch = []
     
     # First pass: try API for all users
     for username in usernames:
-        uuid = get_player_uuid_by_current_name(username)
+        known = name_index.resolve(username)
+        if known and known['renamed']:
+            results[username.lower()] = _name_changed(username, known['current_name'], known['uuid'], 'name_index')
+            continue
+        uuid = known['uuid'] if known else get_player_uuid_by_current_name(username)
         if uuid:
             try:
                 stats = get_player_stats_by_uuid(uuid)
-                if stats and stats.get('fetched_by') == 'api' and 'error' not in stats:
-                    stats['original_search'] = username
-                    stats['name_match'] = True
+                if isinstance(stats, PlayerStats):
+                    name_index.observe(uuid, stats.username if stats.username != "N/A" else None)
+                    if known and stats.username != "N/A" and stats.username.lower() != username.lower():
+                        logger.info(f"'{username}' was renamed to '{stats.username}' since the name index last saw it.")
+                        results[username.lower()] = _name_changed(username, stats.username, uuid, 'api_name_history')
+                        continue
+                    stats.original_search = username
+                    stats.name_match = True
                     results[username.lower()] = stats
                 else:
+                    metrics.FALLBACKS.labels(reason='api_error').inc()
                     scraper_batch.append(username)
             except:
+                metrics.FALLBACKS.labels(reason='api_exception').inc()
                 scraper_batch.append(username)
         else:
+            metrics.FALLBACKS.labels(reason='not_found').inc()
             scraper_batch.append(username)
     
     # Batch scrape remaining users
     if scraper_batch:
         scraped_results = scrapper.scrape_multiple_bwstats(scraper_batch)
         for username in scraper_batch:
-            scraped_data = scraped_results.get(username, scrapper.scrape_bwstats(username))
-            scraped_data['original_search'] = username
-            scraped_data['fetched_by'] = 'scrapper'
-            results[username.lower()] = scraped_data
+            scraped_data = scraped_results.get(username) or scrapper.scrape_bwstats(username)
+            results[username.lower()] = _tag_scraped(scraped_data, username)
     
     return results
@@ -0,0 +1,187 @@
+"""
+Shared per-minute budget for Hypixel API requests, split between priority classes.
+
+Every Hypixel call asks the scheduler for a slot first. The budget is a
+sliding 60 second window of dispatches:
+
+    interactive   /player, /compare and /api lookups; may use the whole budget
+    prefetch      bulk and speculative lookups; only the budget minus the interactive reserve
+    batch         LavaTracker sweeps and other background jobs; same limit as prefetch,
+                  and only while no interactive or prefetch request is waiting
+
+The class of the current call comes from a context variable, so code that
+runs background work wraps it in `with priority('batch'):` and the API client
+stays unchanged.
+
+The window is per process and per API key, a static split: size
+HYPIXEL_BUDGET_PER_MINUTE so that the gunicorn workers and the tracker
+together stay within a key's quota. A process cannot see the others'
+traffic, with one exception: Hypixel reports each key's remaining quota
+(RateLimit-Remaining) on every response, counting every process using the
+key. Batch work also holds back while that reported quota is below the
+interactive reserve, so a sweep leaves the reserve to the web app even when
+the static split is oversized.
+"""
+
+import contextvars
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Optional
+
+import requests
+
+import deadlines
+import metrics
+from hypixel_keys import key_pool
+from config import (
+    API_KEYS, HYPIXEL_BUDGET_PER_MINUTE, HYPIXEL_INTERACTIVE_MAX_WAIT, HYPIXEL_INTERACTIVE_RESERVE,
+    HYPIXEL_PREFETCH_MAX_WAIT,
+)
+
+logger = logging.getLogger(__name__)
+
+# Highest priority first
+PRIORITIES = ('interactive', 'prefetch', 'batch')
+WINDOW_SECONDS = 60.0
+# Seconds each class waits for a slot before giving up; None waits as long as it takes
+MAX_WAIT = {'interactive': HYPIXEL_INTERACTIVE_MAX_WAIT, 'prefetch': HYPIXEL_PREFETCH_MAX_WAIT, 'batch': None}
+
+_current_priority = contextvars.ContextVar('lava_hypixel_priority', default='interactive')
+
+
+class BudgetExhausted(requests.exceptions.RequestException):
+    """No Hypixel budget became free within the caller's wait limit."""
+
+
+def current_priority() -> str:
+    return _current_priority.get()
+
+
+@contextmanager
+def priority(name: str):
+    """Runs the enclosed Hypixel calls under the given priority class."""
+    if name not in PRIORITIES:
+        raise ValueError(f"Unknown priority class: {name}")
+    token = _current_priority.set(name)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+class BudgetScheduler:
+    """Admits requests against a sliding-window budget, higher priority classes first."""
+
+    def __init__(self, per_minute: int, interactive_reserve: int, window: float = WINDOW_SECONDS):
+        self.per_minute = per_minute
+        self.interactive_reserve = max(0, min(interactive_reserve, per_minute))
+        self.window = window
+        self._dispatched = deque()
+        self._waiting = dict.fromkeys(PRIORITIES, 0)
+        self._cond = threading.Condition()
+
+    def _limit(self, name: str) -> int:
+        if name == 'interactive':
+            return self.per_minute
+        return self.per_minute - self.interactive_reserve
+
+    def _yields_to_waiters(self, name: str) -> bool:
+        """Prefetch waits behind interactive requests; batch waits behind everything."""
+        higher = PRIORITIES[:PRIORITIES.index(name)]
+        return name != 'interactive' and any(self._waiting[other] for other in higher)
+
+    def _expire(self, now: float):
+        while self._dispatched and self._dispatched[0] <= now - self.window:
+            self._dispatched.popleft()
+
+    def usage(self) -> int:
+        """Dispatches in the current window."""
+        with self._cond:
+            self._expire(time.monotonic())
+            return len(self._dispatched)
+
+    def acquire(self, name: Optional[str] = None, timeout: Optional[float] = None) -> bool:
+        """
+        Blocks until the class may send one request and records the dispatch.
+        Returns False if no slot freed up within `timeout` seconds (None waits indefinitely).
+        """
+        name = name or current_priority()
+        if self.per_minute <= 0:
+            metrics.HYPIXEL_BUDGET_DISPATCHED.labels(priority=name).inc()
+            return True
+
+        start = time.monotonic()
+        deadline = None if timeout is None else start + timeout
+        limit = self._limit(name)
+        with self._cond:
+            self._waiting[name] += 1
+            metrics.HYPIXEL_BUDGET_WAITING.labels(priority=name).inc()
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._expire(now)
+                    if len(self._dispatched) < limit and not self._yields_to_waiters(name):
+                        self._dispatched.append(now)
+                        metrics.HYPIXEL_BUDGET_WAIT.labels(priority=name).observe(now - start)
+                        metrics.HYPIXEL_BUDGET_DISPATCHED.labels(priority=name).inc()
+                        return True
+
+                    # Wake when the oldest dispatch leaves the window, or earlier when another waiter finishes
+                    wake = self._dispatched[0] + self.window - now if len(self._dispatched) >= limit and self._dispatched else None
+                    if deadline is not None:
+                        remaining = deadline - now
+                        if remaining <= 0:
+                            metrics.HYPIXEL_BUDGET_WAIT.labels(priority=name).observe(now - start)
+                            metrics.HYPIXEL_BUDGET_REJECTED.labels(priority=name).inc()
+                            logger.warning(f"Hypixel budget exhausted for {name} request after {now - start:.2f}s")
+                            return False
+                        wake = remaining if wake is None else min(wake, remaining)
+                    self._cond.wait(wake)
+            finally:
+                self._waiting[name] -= 1
+                metrics.HYPIXEL_BUDGET_WAITING.labels(priority=name).dec()
+                self._cond.notify_all()
+
+    def release(self):
+        """Gives back a slot taken by acquire() for a request that was never sent."""
+        with self._cond:
+            if self._dispatched:
+                # Dispatches are interchangeable timestamps; dropping the newest frees one slot in the window
+                self._dispatched.pop()
+                self._cond.notify_all()
+
+
+# Both settings are per key, so capacity grows with the key pool
+scheduler = BudgetScheduler(HYPIXEL_BUDGET_PER_MINUTE * max(len(API_KEYS), 1), HYPIXEL_INTERACTIVE_RESERVE * max(len(API_KEYS), 1))
+
+
+def _hold_for_reported_quota():
+    """Waits while Hypixel reports less quota left on the keys than the interactive reserve (see module docstring)."""
+    reserve = HYPIXEL_INTERACTIVE_RESERVE * max(len(API_KEYS), 1)
+    while reserve > 0:
+        reported = key_pool.reported_remaining()
+        if reported is None or reported[0] >= reserve:
+            return
+        remaining, resets_in = reported
+        logger.info(f"Holding batch Hypixel requests for {resets_in:.0f}s: keys report {remaining:.0f} requests left, "
+                    f"below the interactive reserve of {reserve}")
+        metrics.HYPIXEL_BUDGET_HELD.inc()
+        time.sleep(max(resets_in, 1.0))
+
+
+def acquire(name: Optional[str] = None):
+    """Waits for a slot for the current (or given) priority class; raises BudgetExhausted after its max wait."""
+    name = name or current_priority()
+    if name == 'batch':
+        _hold_for_reported_quota()
+    # Never wait past the request's deadline
+    if not scheduler.acquire(name, deadlines.clamp(MAX_WAIT[name])):
+        raise BudgetExhausted(f"Hypixel API budget exhausted for {name} requests")
+
+
+def release():
+    """Returns the slot of the last acquire() when its request could not be sent after all."""
+    scheduler.release()
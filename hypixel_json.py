@@ -0,0 +1,96 @@
+"""
+Selective decoding of Hypixel /player responses.
+
+A player object carries achievements, quests and every other game's stats,
+often hundreds of KB, but only `stats.Bedwars`, the rank fields and a couple
+of achievements are ever read. With msgspec installed the body is decoded
+against structs that declare just those fields, so the parser skips the rest
+without building Python objects for it. Without msgspec the json module
+decodes everything and the player object is pruned right away, so at least
+nothing beyond the needed subtrees outlives the call.
+"""
+
+import json
+import logging
+from typing import Any, Dict, Optional
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+logger = logging.getLogger(__name__)
+
+PLAYER_FIELDS = ('uuid', 'displayname', 'prefix', 'rank', 'monthlyPackageRank', 'newPackageRank', 'packageRank')
+ACHIEVEMENT_FIELDS = ('bedwars_slumber_ticket_master',)
+
+
+def prune_player(player: Dict[str, Any]) -> Dict[str, Any]:
+    """Keeps only the player fields the app reads: identity, rank, a few achievements and stats.Bedwars."""
+    pruned = {key: player[key] for key in PLAYER_FIELDS if player.get(key) is not None}
+    achievements = player.get('achievements') or {}
+    pruned['achievements'] = {key: achievements[key] for key in ACHIEVEMENT_FIELDS if key in achievements}
+    pruned['stats'] = {'Bedwars': (player.get('stats') or {}).get('Bedwars') or {}}
+    return pruned
+
+
+if msgspec is not None:
+    class _Achievements(msgspec.Struct):
+        bedwars_slumber_ticket_master: Any = None
+
+    class _Stats(msgspec.Struct):
+        Bedwars: Optional[Dict[str, Any]] = None
+
+    class _Player(msgspec.Struct):
+        uuid: Any = None
+        displayname: Any = None
+        prefix: Any = None
+        rank: Any = None
+        monthlyPackageRank: Any = None
+        newPackageRank: Any = None
+        packageRank: Any = None
+        achievements: Optional[_Achievements] = None
+        stats: Optional[_Stats] = None
+
+    class _PlayerResponse(msgspec.Struct):
+        success: Any = False
+        cause: Any = None
+        player: Optional[_Player] = None
+
+    _decoder = msgspec.json.Decoder(_PlayerResponse)
+
+    def _decode_selective(body: bytes) -> Dict[str, Any]:
+        decoded = _decoder.decode(body)
+        data = {'success': decoded.success}
+        if decoded.cause is not None:
+            data['cause'] = decoded.cause
+        player = decoded.player
+        if player is None:
+            data['player'] = None
+            return data
+        pruned = {key: getattr(player, key) for key in PLAYER_FIELDS if getattr(player, key) is not None}
+        achievements = player.achievements
+        pruned['achievements'] = {key: getattr(achievements, key) for key in ACHIEVEMENT_FIELDS
+                                  if achievements is not None and getattr(achievements, key) is not None}
+        pruned['stats'] = {'Bedwars': (player.stats.Bedwars if player.stats else None) or {}}
+        data['player'] = pruned
+        return data
+else:
+    _decode_selective = None
+
+
+def decode_player_response(body: bytes) -> Dict[str, Any]:
+    """
+    Decodes a /player response body into {'success', 'cause', 'player'}, where
+    player holds only the pruned fields (or None when Hypixel returned none).
+    """
+    if _decode_selective is not None:
+        try:
+            return _decode_selective(body)
+        except msgspec.ValidationError as e:
+            # Unexpected shape (e.g. a field of the wrong type); the generic path below copes with anything
+            logger.debug(f"Selective decode failed, falling back to json: {e}")
+    data = json.loads(body)
+    if data.get('player'):
+        data['player'] = prune_player(data['player'])
+    return data
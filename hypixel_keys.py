@@ -0,0 +1,155 @@
+"""
+Pool of Hypixel API keys with per-key accounting and automatic quarantine.
+
+Each request takes the healthy key that sent the fewest requests in the last
+minute, so load spreads evenly and total capacity grows with the number of
+keys (HYPIXEL_API_KEYS, or just HYPIXEL_API_KEY). A key that answers 403
+(revoked or invalid) or 429 (throttled) is taken out of rotation for a while
+instead of pushing every following request into the scraper. Keys are only
+ever logged and labelled by their position in the pool (key#0, key#1, ...),
+never by any part of the key itself.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+
+import metrics
+from config import API_KEYS, HYPIXEL_KEY_FORBIDDEN_QUARANTINE, HYPIXEL_KEY_THROTTLED_QUARANTINE
+
+logger = logging.getLogger(__name__)
+
+WINDOW_SECONDS = 60.0
+
+
+class NoHealthyKey(requests.exceptions.RequestException):
+    """Every key in the pool is quarantined (or the pool is empty)."""
+
+
+def key_id(key: str) -> str:
+    """Loggable identifier of a key: its position in the pool, which reveals nothing of the key."""
+    try:
+        return f"key#{key_pool.keys.index(key)}"
+    except ValueError:
+        return "key#?"
+
+
+def _retry_after(headers) -> Optional[float]:
+    """Seconds until Hypixel accepts the key again, from Retry-After or RateLimit-Reset."""
+    for name in ('Retry-After', 'RateLimit-Reset'):
+        value = (headers or {}).get(name)
+        try:
+            return max(float(value), 1.0)
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+class KeyPool:
+    """Least-loaded key selection over a sliding window, skipping quarantined keys."""
+
+    def __init__(self, keys: List[str], window: float = WINDOW_SECONDS):
+        self.keys = list(dict.fromkeys(keys))
+        self.window = window
+        self._sent = {key: deque() for key in self.keys}
+        self._quarantined_until = dict.fromkeys(self.keys, 0.0)
+        # Last RateLimit-Remaining Hypixel reported per key, and until when (monotonic) that report holds
+        self._reported = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _expire(self, key: str, now: float):
+        sent = self._sent[key]
+        while sent and sent[0] <= now - self.window:
+            sent.popleft()
+
+    def healthy_count(self) -> int:
+        now = time.monotonic()
+        with self._lock:
+            return sum(1 for key in self.keys if self._quarantined_until[key] <= now)
+
+    def _no_healthy_key(self) -> NoHealthyKey:
+        return NoHealthyKey(f"All {len(self.keys)} Hypixel API keys are quarantined" if self.keys else "No Hypixel API key configured")
+
+    def require_healthy(self):
+        """Raises NoHealthyKey unless some key is out of quarantine, without counting a request."""
+        if self.healthy_count() == 0:
+            raise self._no_healthy_key()
+
+    def acquire(self) -> str:
+        """Returns the healthy key with the fewest requests in the window and counts one request against it."""
+        now = time.monotonic()
+        with self._lock:
+            best = None
+            for key in self.keys:
+                if self._quarantined_until[key] > now:
+                    continue
+                self._expire(key, now)
+                if best is None or len(self._sent[key]) < len(self._sent[best]):
+                    best = key
+            if best is None:
+                raise self._no_healthy_key()
+            self._sent[best].append(now)
+            return best
+
+    def record(self, key: str, status, headers=None):
+        """Accounts a finished request; 403 and 429 quarantine the key."""
+        metrics.HYPIXEL_KEY_REQUESTS.labels(key=key_id(key), status=str(status)).inc()
+        remaining = (headers or {}).get('RateLimit-Remaining')
+        if remaining is not None:
+            try:
+                remaining = float(remaining)
+            except (TypeError, ValueError):
+                remaining = None
+        if remaining is not None:
+            metrics.HYPIXEL_KEY_REMAINING.labels(key=key_id(key)).set(remaining)
+            with self._lock:
+                self._reported[key] = (remaining, time.monotonic() + (_retry_after(headers) or self.window))
+        if status == 403:
+            self.quarantine(key, HYPIXEL_KEY_FORBIDDEN_QUARANTINE, 'forbidden')
+        elif status == 429:
+            self.quarantine(key, _retry_after(headers) or HYPIXEL_KEY_THROTTLED_QUARANTINE, 'throttled')
+
+    def quarantine(self, key: str, seconds: float, reason: str):
+        with self._lock:
+            self._quarantined_until[key] = max(self._quarantined_until[key], time.monotonic() + seconds)
+        metrics.HYPIXEL_KEY_QUARANTINES.labels(key=key_id(key), reason=reason).inc()
+        logger.warning(f"Hypixel API key {key_id(key)} quarantined for {seconds:.0f}s ({reason})")
+
+    def reported_remaining(self) -> Optional[Tuple[float, float]]:
+        """
+        Requests Hypixel still allows this window over the healthy keys, counting every process that uses them,
+        and the seconds until the earliest of those reports runs out. None while any healthy key has no current
+        report (it has not been used lately, so its quota is free).
+        """
+        now = time.monotonic()
+        total, expires = 0.0, None
+        with self._lock:
+            for key in self.keys:
+                if self._quarantined_until[key] > now:
+                    continue
+                reported = self._reported.get(key)
+                if reported is None or reported[1] <= now:
+                    return None
+                total += reported[0]
+                expires = reported[1] if expires is None else min(expires, reported[1])
+        return None if expires is None else (total, expires - now)
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Per-key usage in the current window and remaining quarantine, for logs and debugging."""
+        now = time.monotonic()
+        with self._lock:
+            for key in self.keys:
+                self._expire(key, now)
+            return [{'key': key_id(key), 'requests_last_window': len(self._sent[key]),
+                     'quarantined_for': round(max(self._quarantined_until[key] - now, 0.0), 1)}
+                    for key in self.keys]
+
+
+key_pool = KeyPool(API_KEYS)
@@ -5,58 +5,52 @@ Fetches and stores detailed player statistics from Hypixel API
 
 import os
 import json
+import argparse
+import time
 import logging
 import requests
 from datetime import datetime, timezone
-from typing import Dict, List, Optional, Any
-from supabase import create_client, Client
+from typing import Callable, Dict, List, Optional, Any
 from dotenv import load_dotenv
+from logging_setup import configure_logging
+from supabase_handler import get_client
+from models import ModeStats, modes_from_bedwars
+from bedwars_schema import MODES
+from hypixel_json import decode_player_response
+import hypixel_budget
+from hypixel_api import hypixel_get
+from hypixel_keys import key_pool
+from bedwars_level import level_from_exp, levels_from_exp
+from config import TRACKER_CHECKPOINT_PATH, TRACKER_SWEEP_ID
+from name_index import name_index
+from tracker_checkpoint import SweepCheckpoint
+from tracker_leases import SweepLeases, default_worker_id
 
 # Load environment variables
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger('LavaTracker')
 
+# Players fetched before their levels are converted and rows saved
+TRACK_BATCH_SIZE = 50
+
 class LavaTracker:
     def __init__(self):
         # Initialize Supabase client
         self.supabase_url = os.getenv('SUPABASE_URL')
         self.supabase_key = os.getenv('SUPABASE_ANON_KEY')
-        self.hypixel_api_key = os.getenv('HYPIXEL_API_KEY')
         
         if not self.supabase_url or not self.supabase_key:
             raise ValueError("Supabase credentials not found in environment variables")
         
-        if not self.hypixel_api_key or self.hypixel_api_key.lower() == 'off':
-            raise ValueError("Valid Hypixel API key required for LavaTracker")
+        if not len(key_pool):
+            raise ValueError("Valid Hypixel API key (HYPIXEL_API_KEY or HYPIXEL_API_KEYS) required for LavaTracker")
         
-        self.supabase: Client = create_client(self.supabase_url, self.supabase_key)
+        self.supabase = get_client()
+        if self.supabase is None:
+            raise ValueError("Supabase client could not be initialized")
         logger.info("LavaTracker initialized successfully")
     
-    def get_bedwars_level(self, exp: int) -> float:
-        """Calculate Bedwars level from experience"""
-        if not isinstance(exp, int) or exp < 0:
-            return 0.0
-        
-        level = 100 * (exp // 487000)
-        exp = exp % 487000
-        
-        if exp < 500: return level + exp / 500
-        level += 1
-        if exp < 1500: return level + (exp - 500) / 1000
-        level += 1
-        if exp < 3500: return level + (exp - 1500) / 2000
-        level += 1
-        if exp < 7000: return level + (exp - 3500) / 3500
-        level += 1
-        exp -= 7000
-        return level + exp / 5000
-    
     def calculate_ratio(self, numerator: int, denominator: int) -> float:
         """Calculate ratio safely"""
         if denominator == 0:
@@ -66,18 +60,20 @@ class LavaTracker:
     def fetch_player_stats(self, uuid: str) -> Optional[Dict[str, Any]]:
         """Fetch player stats from Hypixel API"""
         try:
-            url = f"https://api.hypixel.net/v2/player"
-            params = {"key": self.hypixel_api_key, "uuid": uuid}
-            
-            response = requests.get(url, params=params, timeout=10)
+            # Sweeps only use Hypixel budget the web app's interactive lookups leave idle;
+            # requests rotate over the key pool like the web app's
+            with hypixel_budget.priority('batch'):
+                response = hypixel_get({"uuid": uuid}, 'hypixel_fetch')
             response.raise_for_status()
             
-            data = response.json()
+            data = decode_player_response(response.content)
             
             if not data.get("success") or not data.get("player"):
                 logger.error(f"Failed to fetch stats for UUID {uuid}")
                 return None
             
+            # Every sweep refreshes the name index with the player's current name
+            name_index.observe(uuid, data["player"].get("displayname"))
             return data["player"]
             
         except requests.exceptions.RequestException as e:
@@ -87,29 +83,23 @@ class LavaTracker:
             logger.error(f"Unexpected error fetching stats for UUID {uuid}: {e}")
             return None
     
-    def parse_bedwars_stats(self, player_data: Dict) -> Dict[str, Any]:
-        """Parse Bedwars stats from player data"""
+    def parse_bedwars_stats(self, player_data: Dict, level: Optional[float] = None) -> Dict[str, Any]:
+        """Parse Bedwars stats from player data; batch callers pass the level they already computed"""
         stats = player_data.get("stats", {})
         bw_stats = stats.get("Bedwars", {})
         achievements = player_data.get("achievements", {})
         
         # Calculate level
         exp = bw_stats.get("Experience", 0)
-        level = int(self.get_bedwars_level(exp))
+        level = int(level_from_exp(exp) if level is None else level)
         
-        # Overall stats
-        wins = bw_stats.get("wins_bedwars", 0)
-        losses = bw_stats.get("losses_bedwars", 0)
+        # Overall and per-mode counters in one pass over the Bedwars stats
+        overall, modes = modes_from_bedwars(bw_stats)
+        wins, losses = overall.wins, overall.losses
         games_played = wins + losses
-        
-        kills = bw_stats.get("kills_bedwars", 0)
-        deaths = bw_stats.get("deaths_bedwars", 0)
-        
-        final_kills = bw_stats.get("final_kills_bedwars", 0)
-        final_deaths = bw_stats.get("final_deaths_bedwars", 0)
-        
-        beds_broken = bw_stats.get("beds_broken_bedwars", 0)
-        beds_lost = bw_stats.get("beds_lost_bedwars", 0)
+        kills, deaths = overall.kills, overall.deaths
+        final_kills, final_deaths = overall.final_kills, overall.final_deaths
+        beds_broken, beds_lost = overall.beds_broken, overall.beds_lost
         
         # Calculate ratios
         wlr = self.calculate_ratio(wins, losses)
@@ -129,19 +119,19 @@ class LavaTracker:
         emeralds_collected = bw_stats.get("emerald_resources_collected_bedwars", 0)
         
         # Mode-specific stats
-        solo_stats = self.extract_mode_stats(bw_stats, "eight_one_")
-        doubles_stats = self.extract_mode_stats(bw_stats, "eight_two_")
-        threes_stats = self.extract_mode_stats(bw_stats, "four_three_")
-        fours_stats = self.extract_mode_stats(bw_stats, "four_four_")
-        four_v_four_stats = self.extract_mode_stats(bw_stats, "two_four_")
+        solo_stats = self.stored_mode_stats(bw_stats, modes, "solos")
+        doubles_stats = self.stored_mode_stats(bw_stats, modes, "doubles")
+        threes_stats = self.stored_mode_stats(bw_stats, modes, "threes")
+        fours_stats = self.stored_mode_stats(bw_stats, modes, "fours")
+        four_v_four_stats = self.stored_mode_stats(bw_stats, modes, "4v4")
         
         # Calculate most played mode
         mode_games = {
-            "Solo": solo_stats.get("games_played", 0),
-            "Doubles": doubles_stats.get("games_played", 0),
-            "3v3v3v3": threes_stats.get("games_played", 0),
-            "4v4v4v4": fours_stats.get("games_played", 0),
-            "4v4": four_v_four_stats.get("games_played", 0)
+            "Solo": solo_stats["games_played"],
+            "Doubles": doubles_stats["games_played"],
+            "3v3v3v3": threes_stats["games_played"],
+            "4v4v4v4": fours_stats["games_played"],
+            "4v4": four_v_four_stats["games_played"]
         }
         most_played_mode = max(mode_games, key=mode_games.get) if any(mode_games.values()) else "None"
         most_played_games = mode_games[most_played_mode] if most_played_mode != "None" else 0
@@ -183,17 +173,19 @@ class LavaTracker:
             "raw_stats": json.dumps(bw_stats)
         }
     
-    def extract_mode_stats(self, bw_stats: Dict, prefix: str) -> Dict[str, Any]:
-        """Extract stats for a specific game mode"""
+    def stored_mode_stats(self, bw_stats: Dict, modes: Dict[str, ModeStats], mode_key: str) -> Dict[str, Any]:
+        """A mode's counters in the shape tracked rows store: Hypixel's own games played and winstreak, 0 when missing"""
+        prefix = MODES[mode_key][0]
+        mode = modes[mode_key]
         return {
-            "wins": bw_stats.get(f"{prefix}wins_bedwars", 0),
-            "losses": bw_stats.get(f"{prefix}losses_bedwars", 0),
-            "kills": bw_stats.get(f"{prefix}kills_bedwars", 0),
-            "deaths": bw_stats.get(f"{prefix}deaths_bedwars", 0),
-            "final_kills": bw_stats.get(f"{prefix}final_kills_bedwars", 0),
-            "final_deaths": bw_stats.get(f"{prefix}final_deaths_bedwars", 0),
-            "beds_broken": bw_stats.get(f"{prefix}beds_broken_bedwars", 0),
-            "beds_lost": bw_stats.get(f"{prefix}beds_lost_bedwars", 0),
+            "wins": mode.wins,
+            "losses": mode.losses,
+            "kills": mode.kills,
+            "deaths": mode.deaths,
+            "final_kills": mode.final_kills,
+            "final_deaths": mode.final_deaths,
+            "beds_broken": mode.beds_broken,
+            "beds_lost": mode.beds_lost,
             "games_played": bw_stats.get(f"{prefix}games_played_bedwars", 0),
             "winstreak": bw_stats.get(f"{prefix}winstreak", 0)
         }
@@ -237,11 +229,37 @@ class LavaTracker:
         # Save to database
         return self.save_tracked_stats(uuid, stats)
     
+    def track_batch(self, uuids: List[str], keep_going: Optional[Callable[[], bool]] = None) -> Dict[str, bool]:
+        """
+        Fetch a batch of players, convert all their levels in one call, then parse and save each.
+        When `keep_going` returns False the remaining players are not fetched and are left out of the results.
+        """
+        fetched = {}
+        results = {}
+        for uuid in uuids:
+            if keep_going is not None and not keep_going():
+                logger.warning(f"Stopping batch early, {len(uuids) - len(fetched) - len(results)} players left unfetched")
+                break
+            player_data = self.fetch_player_stats(uuid)
+            if player_data:
+                fetched[uuid] = player_data
+            else:
+                logger.error(f"Could not fetch data for UUID: {uuid}")
+                results[uuid] = False
+        
+        levels = levels_from_exp(
+            ((player_data.get("stats") or {}).get("Bedwars") or {}).get("Experience", 0) for player_data in fetched.values()
+        )
+        for (uuid, player_data), level in zip(fetched.items(), levels):
+            stats = self.parse_bedwars_stats(player_data, level)
+            results[uuid] = self.save_tracked_stats(uuid, stats)
+        return {uuid: results[uuid] for uuid in uuids if uuid in results}
+    
     def track_multiple_players(self, uuids: List[str]) -> Dict[str, bool]:
         """Track multiple players"""
         results = {}
-        for uuid in uuids:
-            results[uuid] = self.track_player(uuid)
+        for start in range(0, len(uuids), TRACK_BATCH_SIZE):
+            results.update(self.track_batch(uuids[start:start + TRACK_BATCH_SIZE]))
         return results
     
     def get_all_players_from_db(self) -> List[Dict[str, str]]:
@@ -255,34 +273,101 @@ class LavaTracker:
             logger.error(f"Error fetching players from database: {e}")
             return []
     
-    def track_all_players(self):
-        """Track all players in the database"""
+    def track_all_players(self, fresh: bool = False):
+        """Track all players in the database, resuming the last unfinished sweep unless `fresh`"""
         players = self.get_all_players_from_db()
         
         if not players:
             logger.warning("No players found in database")
             return
         
-        logger.info(f"Tracking {len(players)} players...")
+        if fresh:
+            checkpoint = SweepCheckpoint(TRACKER_CHECKPOINT_PATH, client=self.supabase)
+        else:
+            checkpoint = SweepCheckpoint.resume_or_start(client=self.supabase)
+        pending = [player['uuid'] for player in players if player['uuid'] not in checkpoint.tracked]
+        if checkpoint.resumed:
+            logger.info(f"Resuming sweep {checkpoint.sweep_id}: {len(players) - len(pending)} players "
+                        f"already tracked, {len(pending)} to go ({len(checkpoint.failed)} failed earlier, retried)")
+        else:
+            logger.info(f"Tracking {len(players)} players...")
         
-        success_count = 0
-        for player in players:
-            uuid = player['uuid']
-            name = player['player_name']
-            
-            logger.info(f"Tracking {name} ({uuid})...")
-            if self.track_player(uuid):
-                success_count += 1
-            
-        logger.info(f"Tracking complete: {success_count}/{len(players)} players tracked successfully")
+        done = 0
+        try:
+            for start in range(0, len(pending), TRACK_BATCH_SIZE):
+                batch = pending[start:start + TRACK_BATCH_SIZE]
+                logger.info(f"Tracking players {start + 1}-{start + len(batch)} of {len(pending)}...")
+                results = self.track_batch(batch)
+                checkpoint.record(results)
+                checkpoint.save()
+                done = start + len(batch)
+            checkpoint.finish()
+        finally:
+            # Also reported when the sweep is interrupted, with what the next run will pick up
+            summary = checkpoint.summary(remaining=len(pending) - done)
+            logger.info(f"Tracking {'complete' if checkpoint.finished_at else 'interrupted'}: "
+                        f"{summary['tracked']}/{len(players)} players tracked, {summary['failed']} failed, "
+                        f"{summary['remaining']} remaining; this run tracked {summary['run_tracked']} "
+                        f"({summary['run_failed']} failed) in {summary['run_seconds']:.0f}s, "
+                        f"{summary['players_per_minute']} players/min")
+    
+    def track_sharded(self, sweep_id: Optional[str] = None, worker_id: Optional[str] = None):
+        """Track players in leased batches of a sweep shared with every other worker, until none is left"""
+        leases = SweepLeases(self.supabase, sweep_id or TRACKER_SWEEP_ID or None, worker_id or default_worker_id())
+        leases.join(TRACK_BATCH_SIZE)
+        logger.info(f"Worker {leases.worker_id} joined sweep {leases.sweep_id}")
+        
+        started = time.monotonic()
+        completed = success_count = failure_count = 0
+        while True:
+            batch = leases.claim()
+            if batch is None:
+                break
+            batch_no, uuids = batch['batch_no'], batch['uuids']
+            logger.info(f"Tracking batch {batch_no} ({len(uuids)} players, attempt {batch['attempts']})...")
+            with leases.hold(batch) as lease:
+                results = self.track_batch(uuids, keep_going=lambda: not lease.lost)
+            tracked = sum(1 for ok in results.values() if ok)
+            success_count += tracked
+            failure_count += len(results) - tracked
+            # A lost batch belongs to whichever worker claimed it next; what was saved here stays saved
+            if lease.lost or not leases.complete(batch_no, tracked, len(results) - tracked):
+                logger.warning(f"Batch {batch_no} was taken over by another worker after {len(results)} players")
+                continue
+            completed += 1
+        
+        seconds = time.monotonic() - started
+        logger.info(f"Worker {leases.worker_id} finished: {completed} batches, "
+                    f"{success_count} players tracked, {failure_count} failed in {seconds:.0f}s, "
+                    f"{(success_count + failure_count) / seconds * 60 if seconds else 0:.1f} players/min")
+        for row in leases.progress():
+            logger.info(f"Sweep {leases.sweep_id} {row['status']}: {row['batches']} batches, {row['players']} players")
 
 def main():
     """Main function to run the tracker"""
+    parser = argparse.ArgumentParser(description="Track the Bedwars stats of every player in the players table")
+    parser.add_argument('--sharded', action='store_true',
+                        help="share the sweep with other workers through leased batches (see tracker_leases.py)")
+    parser.add_argument('--fresh', action='store_true',
+                        help="start a new sweep instead of resuming the last unfinished one (see tracker_checkpoint.py)")
+    parser.add_argument('--sweep-id', help="sweep to join with --sharded (default: TRACKER_SWEEP_ID, "
+                                             "otherwise the unfinished sweep or a new one)")
+    parser.add_argument('--worker-id', help="this worker's name with --sharded (default: TRACKER_WORKER_ID or host:pid)")
+    args = parser.parse_args()
+    
+    configure_logging()
     try:
         tracker = LavaTracker()
-        
-        # Example: Track all players
-        tracker.track_all_players()
+    except Exception as e:
+        logger.error(f"Failed to initialize LavaTracker: {e}")
+        return
+    
+    try:
+        if args.sharded:
+            tracker.track_sharded(args.sweep_id, args.worker_id)
+        else:
+            # Example: Track all players
+            tracker.track_all_players(fresh=args.fresh)
         
         # Example: Track specific player
         # tracker.track_player("uuid-here")
@@ -293,7 +378,7 @@ def main():
         # print(f"Tracking results: {results}")
         
     except Exception as e:
-        logger.error(f"Failed to initialize LavaTracker: {e}")
+        logger.error(f"Tracking failed: {e}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
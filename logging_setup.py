@@ -0,0 +1,109 @@
+"""
+Logging configuration shared by the web app and the tracker.
+
+Records are handed to a QueueHandler and written by a background
+QueueListener, so request threads never block on stdout. Levels, format and
+debug sampling come from the environment:
+
+    LOG_LEVEL=INFO                              root level
+    LOG_LEVELS=hypixel_api=DEBUG,scrapper=WARNING   per-module overrides
+    LOG_FORMAT=text|json                        output format
+    LOG_DEBUG_SAMPLE_RATE=1.0                   fraction of DEBUG records kept
+    LOG_STREAM=stdout|stderr                    where records are written
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+
+_listener = None
+
+# Attributes every LogRecord has; anything else came in through `extra=` and is structured data
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+
+
+class DebugSampler(logging.Filter):
+    """Keeps only a fraction of DEBUG records; other levels always pass."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or self.rate >= 1.0:
+            return True
+        return random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, including any `extra=` fields."""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Plain text with `extra=` fields appended as key=value pairs."""
+
+    def format(self, record):
+        line = super().format(record)
+        extras = " ".join(f"{key}={value}" for key, value in record.__dict__.items() if key not in _RECORD_ATTRS)
+        return f"{line} {extras}" if extras else line
+
+
+def parse_levels(spec: str):
+    """Parses 'module=LEVEL,other=LEVEL' into a dict, ignoring malformed entries."""
+    levels = {}
+    for item in (spec or '').split(','):
+        name, _, level = item.partition('=')
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging():
+    """Installs the queue-based root handler once per process; later calls are no-ops."""
+    global _listener
+    if _listener is not None:
+        return
+
+    if os.getenv('LOG_FORMAT', 'text').lower() == 'json':
+        formatter = JsonFormatter()
+    else:
+        formatter = TextFormatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    stream_handler = logging.StreamHandler(sys.stderr if os.getenv('LOG_STREAM', 'stdout').lower() == 'stderr' else sys.stdout)
+    stream_handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(DebugSampler(float(os.getenv('LOG_DEBUG_SAMPLE_RATE', '1.0'))))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
+
+    for name, level in parse_levels(os.getenv('LOG_LEVELS', '')).items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
@@ -0,0 +1,208 @@
+"""
+Prometheus metrics for the fetch pipeline.
+
+Stage latencies, upstream call outcomes, cache hits, fallbacks and queue
+depths are recorded here and exposed by app.py on /metrics. Under gunicorn
+set PROMETHEUS_MULTIPROC_DIR (gunicorn.conf.py does this by default) so the
+values from every worker are aggregated into one scrape.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+
+import tracing
+
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram,
+        REGISTRY, generate_latest, multiprocess,
+    )
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+    CONTENT_TYPE_LATEST = 'text/plain; version=0.0.4; charset=utf-8'
+
+    class _NoopMetric:
+        """Stand-in used when prometheus_client is not installed."""
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def labels(self, *args, **kwargs):
+            return self
+
+        def inc(self, amount=1):
+            pass
+
+        def dec(self, amount=1):
+            pass
+
+        def set(self, value):
+            pass
+
+        def observe(self, value):
+            pass
+
+    Counter = Gauge = Histogram = _NoopMetric
+
+# Latency buckets covering cache lookups (ms) up to the scraper retry path (tens of seconds)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+STAGE_LATENCY = Histogram(
+    'lava_stage_duration_seconds',
+    'Time spent in each stage of the player fetch pipeline',
+    ['stage'], buckets=LATENCY_BUCKETS,
+)
+REQUEST_LATENCY = Histogram(
+    'lava_http_request_duration_seconds',
+    'Time spent serving HTTP requests',
+    ['route', 'status'], buckets=LATENCY_BUCKETS,
+)
+UPSTREAM_REQUESTS = Counter(
+    'lava_upstream_requests_total',
+    'Outbound requests by upstream and HTTP status (or error)',
+    ['upstream', 'status'],
+)
+UPSTREAM_RETRIES = Counter(
+    'lava_upstream_retries_total',
+    'Retried outbound requests by upstream',
+    ['upstream'],
+)
+RATE_LIMITED = Counter(
+    'lava_upstream_rate_limited_total',
+    'HTTP 429 responses by upstream',
+    ['upstream'],
+)
+CACHE_LOOKUPS = Counter(
+    'lava_cache_lookups_total',
+    'Stats cache lookups by cache and result',
+    ['cache', 'result'],
+)
+FALLBACKS = Counter(
+    'lava_scraper_fallbacks_total',
+    'Lookups that fell back from the Hypixel API to the scraper',
+    ['reason'],
+)
+DEADLINE_EXCEEDED = Counter(
+    'lava_deadline_exceeded_total',
+    'Lookups whose request deadline ran out before a live answer, by what was served (stale, error)',
+    ['outcome'],
+)
+HEDGED_REQUESTS = Counter(
+    'lava_hedged_requests_total',
+    'Hedgeable lookups by outcome (not_needed, skipped, capped, primary_won, backup_won)',
+    ['hedge', 'outcome'],
+)
+HEDGE_LATENCY = Histogram(
+    'lava_hedge_latency_seconds',
+    'Latency of hedged lookups, by which leg answered',
+    ['hedge', 'winner'], buckets=LATENCY_BUCKETS,
+)
+QUEUE_DEPTH = Gauge(
+    'lava_queue_depth',
+    'Work items waiting or running in internal queues',
+    ['queue'], multiprocess_mode='livesum',
+)
+CONCURRENCY_LIMIT = Gauge(
+    'lava_concurrency_limit',
+    'Current limit of each adaptive (AIMD) concurrency limiter',
+    ['limiter'], multiprocess_mode='livemax',
+)
+CONCURRENCY_ADJUSTMENTS = Counter(
+    'lava_concurrency_adjustments_total',
+    'Changes of an adaptive concurrency limit, by direction and the signal that caused it',
+    ['limiter', 'direction', 'reason'],
+)
+PACING_WAIT = Histogram(
+    'lava_pacing_wait_seconds',
+    'Time callers waited for their assigned send time, by upstream host and reason (pacing, retry)',
+    ['host', 'reason'], buckets=LATENCY_BUCKETS,
+)
+PACING_GIVE_UPS = Counter(
+    'lava_pacing_give_ups_total',
+    'Fetches abandoned because the next send time was further away than the max wait',
+    ['host'],
+)
+PACING_BACKOFF = Counter(
+    'lava_pacing_backoffs_total',
+    'Host-wide backoffs started by a 429',
+    ['host'],
+)
+HYPIXEL_BUDGET_WAIT = Histogram(
+    'lava_hypixel_budget_wait_seconds',
+    'Time a Hypixel request waited for budget, by priority class',
+    ['priority'], buckets=LATENCY_BUCKETS,
+)
+HYPIXEL_BUDGET_DISPATCHED = Counter(
+    'lava_hypixel_budget_dispatched_total',
+    'Hypixel requests admitted by the budget scheduler, by priority class',
+    ['priority'],
+)
+HYPIXEL_BUDGET_REJECTED = Counter(
+    'lava_hypixel_budget_rejected_total',
+    'Hypixel requests that gave up waiting for budget, by priority class',
+    ['priority'],
+)
+HYPIXEL_BUDGET_HELD = Counter(
+    'lava_hypixel_budget_held_total',
+    'Times batch Hypixel requests were held back because the keys reported less quota left than the interactive reserve',
+)
+HYPIXEL_KEY_REQUESTS = Counter(
+    'lava_hypixel_key_requests_total',
+    'Hypixel requests by API key (position in the pool, key#N) and HTTP status',
+    ['key', 'status'],
+)
+HYPIXEL_KEY_QUARANTINES = Counter(
+    'lava_hypixel_key_quarantines_total',
+    'Times an API key was taken out of the pool, by reason (forbidden, throttled)',
+    ['key', 'reason'],
+)
+HYPIXEL_KEY_REMAINING = Gauge(
+    'lava_hypixel_key_ratelimit_remaining',
+    'RateLimit-Remaining last reported by Hypixel for each API key',
+    ['key'], multiprocess_mode='livemin',
+)
+HYPIXEL_BUDGET_WAITING = Gauge(
+    'lava_hypixel_budget_waiting',
+    'Hypixel requests currently waiting for budget, by priority class',
+    ['priority'], multiprocess_mode='livesum',
+)
+
+
+@contextmanager
+def timed(stage: str, **span_attrs):
+    """Records the duration of the enclosed block under the given pipeline stage (and in the request trace)."""
+    start = time.perf_counter()
+    try:
+        with tracing.span(stage, **span_attrs) as span:
+            yield span
+    finally:
+        STAGE_LATENCY.labels(stage=stage).observe(time.perf_counter() - start)
+
+
+def record_upstream(upstream: str, status):
+    """Counts an outbound call; `status` is an HTTP status code or a short error name."""
+    UPSTREAM_REQUESTS.labels(upstream=upstream, status=str(status)).inc()
+    if status == 429:
+        RATE_LIMITED.labels(upstream=upstream).inc()
+
+
+def record_cache(cache: str, hit: bool):
+    CACHE_LOOKUPS.labels(cache=cache, result='hit' if hit else 'miss').inc()
+
+
+def render_latest():
+    """Returns (body, content_type) for the /metrics endpoint, aggregating workers when configured."""
+    if not PROMETHEUS_AVAILABLE:
+        return b'# prometheus_client is not installed\n', CONTENT_TYPE_LATEST
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead(pid: int):
+    """Gunicorn child_exit hook: drop live gauges of a worker that exited."""
+    if PROMETHEUS_AVAILABLE and os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(pid)
@@ -0,0 +1,315 @@
+"""
+Typed Bedwars stats model shared by the API client, scraper path, tracker and cache.
+
+Per-mode counters live in `ModeStats` instances with `__slots__`; ratios are
+derived on access instead of being stored. Turning a model into the JSON
+shape (`to_dict`) or the template shape with `*_formatted` strings
+(`to_display`) only happens at the edge, when a response is actually built.
+"""
+
+from typing import Any, Dict, Optional, Tuple
+
+from bedwars_schema import CORE_MODES, MODES, MODE_TITLES, STANDARD_MODES, extract_bedwars
+
+# Counters every mode carries, in the order they are serialized
+COUNTERS = ('wins', 'losses', 'games_played', 'kills', 'deaths', 'final_kills', 'final_deaths', 'beds_broken', 'beds_lost')
+# Counters some sources provide and others do not; None when unknown
+OPTIONAL_COUNTERS = ('winstreak', 'items_purchased')
+RATIOS = ('wlr', 'kdr', 'fkdr', 'bblr', 'win_rate', 'finals_per_game')
+
+
+# Counters that get an `*_formatted` twin in the template shape
+_FORMATTED_MODE_KEYS = ('wins', 'losses', 'final_kills', 'final_deaths', 'beds_broken', 'beds_lost', 'kills', 'deaths', 'games_played')
+
+
+def calculate_ratio(numerator, denominator):
+    """Helper to calculate ratio, handling division by zero and None inputs."""
+    numerator = float(numerator) if numerator is not None else 0
+    denominator = float(denominator) if denominator is not None else 0
+    if denominator == 0:
+        return float(numerator) if numerator != 0 else 0.0
+    return round(numerator / denominator, 2)
+
+
+def calculate_win_rate(wins, games_played):
+    """Helper to calculate win rate, handling division by zero and None inputs."""
+    wins = float(wins) if wins is not None else 0
+    games_played = float(games_played) if games_played is not None else 0
+    if games_played == 0:
+        return 0.0
+    return round((wins / games_played) * 100, 2)
+
+
+def calculate_finals_per_game(final_kills, games_played):
+    """Helper to calculate finals per game, handling division by zero and None inputs."""
+    final_kills = float(final_kills) if final_kills is not None else 0
+    games_played = float(games_played) if games_played is not None else 0
+    if games_played == 0:
+        return final_kills
+    return round(final_kills / games_played, 2)
+
+
+def format_number(value):
+    """Formats a number with apostrophe as thousand separator, returns N/A for None/invalid."""
+    if value is None:
+        return 'N/A'
+    try:
+        return "{:,}".format(int(float(value))).replace(',', "'")
+    except (ValueError, TypeError):
+        return 'N/A'
+
+
+def format_ratio(value):
+    """Formats a ratio with two decimals, returns N/A for None/invalid."""
+    try:
+        return "{:,.2f}".format(float(value))
+    except (ValueError, TypeError):
+        return 'N/A'
+
+
+def get_safe_int(value):
+    """Converts a value to an integer, returning 0 if None or invalid."""
+    if value is None:
+        return 0
+    try:
+        return int(float(str(value).replace(',', '')))
+    except (ValueError, TypeError):
+        return 0
+
+
+class ModeStats:
+    """Counters for one Bedwars mode; ratios are computed from them on access."""
+
+    __slots__ = COUNTERS + OPTIONAL_COUNTERS
+
+    def __init__(self, wins=0, losses=0, games_played=0, kills=0, deaths=0, final_kills=0, final_deaths=0,
+                 beds_broken=0, beds_lost=0, winstreak=None, items_purchased=None):
+        self.wins = wins
+        self.losses = losses
+        self.games_played = games_played
+        self.kills = kills
+        self.deaths = deaths
+        self.final_kills = final_kills
+        self.final_deaths = final_deaths
+        self.beds_broken = beds_broken
+        self.beds_lost = beds_lost
+        self.winstreak = winstreak
+        self.items_purchased = items_purchased
+
+    @classmethod
+    def from_counters(cls, counters: Dict[str, Any]) -> 'ModeStats':
+        """Builds a mode from already numeric counters (see bedwars_schema); games played defaults to wins + losses."""
+        mode = cls(**counters)
+        if 'games_played' not in counters:
+            mode.games_played = mode.wins + mode.losses
+        return mode
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'ModeStats':
+        """Builds a mode from a serialized or scraped dict; numbers may be strings with separators."""
+        mode = cls(**{stat: get_safe_int(data.get(stat)) for stat in COUNTERS})
+        for stat in OPTIONAL_COUNTERS:
+            if data.get(stat) is not None:
+                setattr(mode, stat, get_safe_int(data[stat]))
+        return mode
+
+    def __add__(self, other: 'ModeStats') -> 'ModeStats':
+        return ModeStats(**{stat: getattr(self, stat) + getattr(other, stat) for stat in COUNTERS})
+
+    def __sub__(self, other: 'ModeStats') -> 'ModeStats':
+        return ModeStats(**{stat: getattr(self, stat) - getattr(other, stat) for stat in COUNTERS})
+
+    def __eq__(self, other):
+        if not isinstance(other, ModeStats):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self):
+        return f"ModeStats(wins={self.wins}, losses={self.losses}, final_kills={self.final_kills}, final_deaths={self.final_deaths})"
+
+    @property
+    def wlr(self):
+        return calculate_ratio(self.wins, self.losses)
+
+    @property
+    def kdr(self):
+        return calculate_ratio(self.kills, self.deaths)
+
+    @property
+    def fkdr(self):
+        return calculate_ratio(self.final_kills, self.final_deaths)
+
+    @property
+    def bblr(self):
+        return calculate_ratio(self.beds_broken, self.beds_lost)
+
+    @property
+    def win_rate(self):
+        return calculate_win_rate(self.wins, self.games_played)
+
+    @property
+    def finals_per_game(self):
+        return calculate_finals_per_game(self.final_kills, self.games_played)
+
+    def counters(self) -> Dict[str, int]:
+        """Raw counters only, including optional ones that are known."""
+        data = {stat: getattr(self, stat) for stat in COUNTERS}
+        for stat in OPTIONAL_COUNTERS:
+            if getattr(self, stat) is not None:
+                data[stat] = getattr(self, stat)
+        return data
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON shape: counters plus derived ratios."""
+        data = self.counters()
+        for ratio in RATIOS:
+            data[ratio] = getattr(self, ratio)
+        return data
+
+    def to_display(self) -> Dict[str, Any]:
+        """Template shape: raw counters, `*_formatted` counters and ratios as two-decimal strings."""
+        data = self.counters()
+        for stat in _FORMATTED_MODE_KEYS:
+            data[f"{stat}_formatted"] = format_number(getattr(self, stat))
+        for ratio in RATIOS:
+            data[ratio] = format_ratio(getattr(self, ratio))
+        return data
+
+
+def modes_from_bedwars(bw_stats: Dict[str, Any]) -> Tuple[ModeStats, Dict[str, ModeStats]]:
+    """
+    Overall and per-mode stats from a Hypixel stats.Bedwars object in one pass.
+    Standard modes are always present; dreams modes only when the player has stats for them.
+    """
+    buckets = extract_bedwars(bw_stats)
+    overall = ModeStats.from_counters(buckets.get('overall', {}))
+    modes = {mode_key: ModeStats.from_counters(buckets.get(mode_key, {}))
+             for mode_key in MODES if mode_key in STANDARD_MODES or mode_key in buckets}
+    return overall, modes
+
+
+class PlayerStats:
+    """One player's Bedwars stats: identity, overall counters and per-mode counters."""
+
+    __slots__ = ('username', 'uuid', 'display_rank', 'level', 'coins', 'slumber_tickets', 'overall', 'modes',
+                 'fetched_by', 'last_updated', 'original_search', 'name_match', 'api_error_details', 'stale')
+
+    def __init__(self, username, uuid=None, display_rank='Non', level=0, coins=None, slumber_tickets=None,
+                 overall: Optional[ModeStats] = None, modes: Optional[Dict[str, ModeStats]] = None,
+                 fetched_by='api', last_updated=None):
+        self.username = username
+        self.uuid = uuid
+        self.display_rank = display_rank
+        self.level = level
+        self.coins = coins
+        self.slumber_tickets = slumber_tickets
+        self.overall = overall or ModeStats()
+        self.modes = modes or {}
+        self.fetched_by = fetched_by
+        self.last_updated = last_updated
+        self.original_search = None
+        self.name_match = None
+        self.api_error_details = None
+        # True when served from cache past its freshness window because the request ran out of time
+        self.stale = None
+
+    def add_aggregates(self):
+        """Derives 'core' (the four core modes summed) and, without a 4v4 source, '4v4' as overall minus core."""
+        core = ModeStats()
+        for mode_key in CORE_MODES:
+            if mode_key in self.modes:
+                core = core + self.modes[mode_key]
+        self.modes['core'] = core
+        if '4v4' not in self.modes:
+            self.modes['4v4'] = self.overall - core
+        return self
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], uuid: Optional[str] = None) -> 'PlayerStats':
+        """
+        Builds a model from a bwstats page parse (string counters under modes.overall, level under 'star')
+        or from a serialized model (`to_dict` output, as stored in the caches).
+        """
+        modes = data.get('modes', {})
+        overall = modes.get('overall') or data.get('overall') or {}
+        level = data.get('star', data.get('level', 0))
+        if isinstance(level, str):
+            try:
+                level = int(level)
+            except (ValueError, TypeError):
+                level = 0
+        stats = cls(
+            username=data.get('username'),
+            uuid=uuid or data.get('uuid'),
+            display_rank=(data.get('rank_info') or {}).get('display_rank', 'LAVA'),
+            level=level or 0,
+            coins=overall.get('coins'),
+            slumber_tickets=overall.get('bedwars_slumber_ticket_master'),
+            overall=ModeStats.from_dict(overall),
+            modes={key: ModeStats.from_dict(mode) for key, mode in modes.items() if key not in ('overall', 'core') and mode},
+            fetched_by=data.get('fetched_by', 'scrapper'),
+            last_updated=data.get('last_updated'),
+        )
+        stats.original_search = data.get('original_search') or stats.username
+        stats.api_error_details = data.get('api_error_details')
+        return stats.add_aggregates()
+
+    @property
+    def finals_per_star(self):
+        final_kills = self.overall.final_kills
+        if self.level and self.level > 0:
+            return round(final_kills / self.level, 2)
+        return float(final_kills) if final_kills > 0 else 0.0
+
+    @property
+    def most_played_gamemode(self):
+        most_played, max_games = 'N/A', 0
+        for mode_key in STANDARD_MODES:
+            mode = self.modes.get(mode_key)
+            if mode is not None and mode.games_played > max_games:
+                most_played, max_games = MODE_TITLES[mode_key], mode.games_played
+        return most_played
+
+    def get(self, key, default=None):
+        """Read access by key, so code handling both models and error dicts can check `.get('error')`."""
+        if key in self.__slots__ or key in ('finals_per_star', 'most_played_gamemode'):
+            value = getattr(self, key)
+            return default if value is None else value
+        return default
+
+    def _overall_extras(self) -> Dict[str, Any]:
+        return {'coins': self.coins, 'bedwars_slumber_ticket_master': self.slumber_tickets}
+
+    def _envelope(self, overall, modes) -> Dict[str, Any]:
+        data = {
+            'username': self.username,
+            'uuid': self.uuid,
+            'rank_info': {'display_rank': self.display_rank},
+            'level': self.level,
+            'most_played_gamemode': self.most_played_gamemode,
+            'overall': overall,
+            'modes': modes,
+            'fetched_by': self.fetched_by,
+        }
+        for key in ('last_updated', 'original_search', 'name_match', 'api_error_details', 'stale'):
+            value = getattr(self, key)
+            if value is not None:
+                data[key] = value
+        return data
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON shape served by /api/player and stored as detailed stats."""
+        overall = self.overall.to_dict()
+        overall.update(self._overall_extras())
+        overall['finals_per_star'] = self.finals_per_star
+        return self._envelope(overall, {key: mode.to_dict() for key, mode in self.modes.items()})
+
+    def to_display(self) -> Dict[str, Any]:
+        """Template shape with `*_formatted` strings; built per render, never stored on the model."""
+        overall = self.overall.to_display()
+        extras = self._overall_extras()
+        overall.update(extras)
+        for key, value in extras.items():
+            overall[f"{key}_formatted"] = format_number(value)
+        overall['finals_per_star'] = format_ratio(self.finals_per_star)
+        return self._envelope(overall, {key: mode.to_display() for key, mode in self.modes.items()})
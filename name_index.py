@@ -0,0 +1,243 @@
+"""
+Local index of every player name we have seen, for resolving renames offline.
+
+Maps each observed name to the UUID last seen using it, and each UUID to its
+newest name. A lookup for a name whose UUID has since moved to another name
+is a rename: the name-change redirect can be answered without asking Mojang
+or the Hypixel historical lookup, and a current name goes straight to the
+stats fetch by UUID.
+
+Mojang holds a changed name for 37 days before anyone else may claim it, so
+a name last seen on a UUID within NAME_INDEX_MAX_AGE (37 days by default)
+still belongs to that UUID; older entries are ignored and the upstreams are
+asked as before.
+
+The index is fed by ensure_player_exists, the API fetch path and the
+tracker, persisted to NAME_INDEX_PATH (merged with what other processes
+wrote), and seeded once from the player_names and stats tables when it is
+empty. The file is shared by the workers of a host: one of them seeds it
+while the others wait and then load what it wrote.
+"""
+
+import atexit
+import datetime
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import file_lock
+import metrics
+from config import NAME_INDEX_FLUSH_INTERVAL, NAME_INDEX_MAX_AGE, NAME_INDEX_PATH, NAME_INDEX_SEED_MAX_ROWS
+
+logger = logging.getLogger(__name__)
+
+SEED_PAGE_SIZE = 1000
+
+
+def _uuid_key(uuid: str) -> str:
+    """Undashed lower-case form; Supabase stores dashed UUIDs, Hypixel and Mojang undashed ones."""
+    return uuid.replace('-', '').lower()
+
+
+class NameIndex:
+    """name -> (uuid, last seen) and uuid -> (current name, seen), kept in memory and flushed to a JSON file."""
+
+    def __init__(self, path: str, max_age: float, flush_interval: float):
+        self.path = path
+        self.max_age = max_age
+        self.flush_interval = flush_interval
+        self._names: Dict[str, list] = {}
+        self._current: Dict[str, list] = {}
+        self._dirty = False
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self._merge(self._read_file())
+
+    def __len__(self):
+        return len(self._names)
+
+    def _read_file(self) -> Dict[str, Any]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"Error reading name index {self.path}: {e}")
+            return {}
+
+    def reload(self):
+        """Merges in what other processes wrote to the file."""
+        self._merge(self._read_file())
+
+    def _merge(self, data: Dict[str, Any]):
+        """Takes entries from another copy of the index where they are newer than ours."""
+        with self._lock:
+            for name, (uuid, seen_at) in data.get('names', {}).items():
+                if name not in self._names or self._names[name][1] < seen_at:
+                    self._names[name] = [uuid, seen_at]
+            for uuid, (name, seen_at) in data.get('current', {}).items():
+                if uuid not in self._current or self._current[uuid][1] < seen_at:
+                    self._current[uuid] = [name, seen_at]
+
+    def observe(self, uuid: Optional[str], name: Optional[str], seen_at: Optional[float] = None):
+        """Records that `uuid` used `name` at `seen_at` (epoch seconds, default now)."""
+        if not uuid or not name:
+            return
+        uuid = _uuid_key(uuid)
+        seen_at = time.time() if seen_at is None else seen_at
+        with self._lock:
+            self._record_name(name, uuid, seen_at)
+            self._record_current(uuid, name, seen_at)
+        self._maybe_flush()
+
+    def observe_rename(self, uuid: Optional[str], old_name: Optional[str], current_name: Optional[str]):
+        """Records an upstream's answer that `old_name` now belongs to `uuid` as `current_name`."""
+        if not uuid or not old_name or not current_name:
+            return
+        uuid = _uuid_key(uuid)
+        seen_at = time.time()
+        with self._lock:
+            self._record_name(old_name, uuid, seen_at)
+            self._record_name(current_name, uuid, seen_at)
+            self._record_current(uuid, current_name, seen_at)
+        self._maybe_flush()
+
+    def _record_name(self, name: str, uuid: str, seen_at: float):
+        known = self._names.get(name.lower())
+        if known is None or known[1] < seen_at:
+            self._names[name.lower()] = [uuid, seen_at]
+            self._dirty = True
+
+    def _record_current(self, uuid: str, name: str, seen_at: float):
+        current = self._current.get(uuid)
+        if current is None or current[1] < seen_at:
+            if current is not None and current[0] != name:
+                logger.info(f"Name index: {current[0]} is now {name} ({uuid})")
+            self._current[uuid] = [name, seen_at]
+            self._dirty = True
+
+    def _maybe_flush(self):
+        with self._lock:
+            due = self._dirty and time.monotonic() - self._last_flush >= self.flush_interval
+        if due:
+            self.flush()
+
+    def current_names(self) -> List[str]:
+        """The newest name of every UUID in the index."""
+        with self._lock:
+            return [name for name, _ in self._current.values()]
+
+    def resolve(self, name: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns {'uuid', 'current_name', 'renamed'} for a name seen within max_age, or None.
+        `renamed` means the UUID has moved on to `current_name` since it used `name`.
+        """
+        with self._lock:
+            known = self._names.get(name.lower())
+            if known is None or time.time() - known[1] > self.max_age:
+                entry = None
+            else:
+                uuid = known[0]
+                current_name = self._current.get(uuid, [name])[0]
+                entry = {'uuid': uuid, 'current_name': current_name, 'renamed': current_name.lower() != name.lower()}
+        metrics.record_cache('name_index', entry is not None)
+        return entry
+
+    def flush(self):
+        """Writes the index, merged with what other processes wrote meanwhile, to its file."""
+        with self._lock:
+            if not self._dirty:
+                return
+            self._dirty = False
+            self._last_flush = time.monotonic()
+        self._merge(self._read_file())
+        with self._lock:
+            data = {'names': dict(self._names), 'current': dict(self._current)}
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+            logger.debug(f"Flushed {len(data['names'])} names to {self.path}")
+        except Exception as e:
+            logger.error(f"Failed to save name index: {e}")
+
+    def seed(self, client, max_rows: int = NAME_INDEX_SEED_MAX_ROWS):
+        """
+        Fills the index from the names stored with stats within max_age, newest first (older ones would not
+        resolve anyway), then from the current player_names; each table up to `max_rows` rows.
+        """
+        if client is None:
+            return
+        loaded = 0
+        since = datetime.datetime.fromtimestamp(time.time() - self.max_age, datetime.timezone.utc).isoformat()
+        try:
+            rows = _select_pages(lambda: client.table('stats').select('player_uuid, player_name, updated_at')
+                                 .gte('updated_at', since).order('updated_at', desc=True), max_rows)
+            for row in rows:
+                seen_at = _epoch(row.get('updated_at'))
+                if seen_at is not None:
+                    self.observe(row.get('player_uuid'), row.get('player_name'), seen_at)
+            loaded += len(rows)
+            rows = _select_pages(lambda: client.table('player_names').select('*').order('uuid'), max_rows)
+            for row in rows:
+                seen_at = _epoch(row.get('updated_at') or row.get('created_at'))
+                if seen_at is not None:
+                    self.observe(row.get('uuid'), row.get('player_name'), seen_at)
+            loaded += len(rows)
+        except Exception as e:
+            logger.error(f"Error seeding name index from Supabase: {e}")
+        logger.info(f"Name index seeded from {loaded} rows ({len(self)} names)")
+        self.flush()
+
+
+def _select_pages(make_query, max_rows: int) -> List[dict]:
+    """Rows of a select page by page (PostgREST caps each response), up to `max_rows`."""
+    rows = []
+    for start in range(0, max_rows, SEED_PAGE_SIZE):
+        page = make_query().range(start, min(start + SEED_PAGE_SIZE, max_rows) - 1).execute().data or []
+        rows.extend(page)
+        if len(page) < SEED_PAGE_SIZE:
+            break
+    return rows
+
+
+def _epoch(timestamp: Optional[str]) -> Optional[float]:
+    """Epoch seconds of a Supabase timestamp; None if missing or unreadable."""
+    if not timestamp:
+        return None
+    try:
+        parsed = datetime.datetime.fromisoformat(str(timestamp).replace('Z', '+00:00'))
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+        return parsed.timestamp()
+    except ValueError:
+        return None
+
+
+name_index = NameIndex(NAME_INDEX_PATH, NAME_INDEX_MAX_AGE, NAME_INDEX_FLUSH_INTERVAL)
+atexit.register(name_index.flush)
+
+
+def _seed_once():
+    # One worker per host seeds the shared file; the others wait for it and load the result
+    with file_lock.exclusive(f"{name_index.path}.lock"):
+        name_index.reload()
+        if len(name_index):
+            logger.info(f"Name index loaded from {name_index.path} ({len(name_index)} names)")
+            return
+        # Imported here: supabase_handler feeds the index, so it imports this module
+        from supabase_handler import get_client
+        name_index.seed(get_client())
+
+
+def seed_in_background():
+    """Seeds an empty index from Supabase (or another worker's seed) without holding up the caller."""
+    if len(name_index):
+        return
+    threading.Thread(target=_seed_once, name='name_index_seed', daemon=True).start()
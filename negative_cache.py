@@ -0,0 +1,51 @@
+"""
+Short-lived memory of lookups that found no player.
+
+A misspelled or non-existent name otherwise walks the whole chain every time:
+Mojang, Hypixel by name, the Hypixel historical lookup, then bwstats with its
+retries. Each upstream's definitive "no such player" answer is remembered per
+failure class for a short TTL, and a repeat lookup skips that upstream:
+
+    mojang      Mojang answered 204/404 for the name
+    hypixel     Hypixel answered success with no player for the name
+    scraper     bwstats answered 404 or a "Player not found" page
+
+Only definitive answers are recorded; timeouts, errors, 429s and deadline
+cut-offs never are, so an unhealthy upstream can't make a real player look
+unknown. The cache is bounded (least recently used entries go first).
+"""
+
+import logging
+
+import metrics
+from config import (
+    NEGATIVE_CACHE_HYPIXEL_TTL, NEGATIVE_CACHE_MAX_ENTRIES, NEGATIVE_CACHE_MOJANG_TTL, NEGATIVE_CACHE_SCRAPER_TTL,
+)
+from ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+TTLS = {
+    'mojang': NEGATIVE_CACHE_MOJANG_TTL,
+    'hypixel': NEGATIVE_CACHE_HYPIXEL_TTL,
+    'scraper': NEGATIVE_CACHE_SCRAPER_TTL,
+}
+
+_misses = TTLCache(NEGATIVE_CACHE_MAX_ENTRIES)
+
+
+def record(kind: str, username: str):
+    """Remembers that `kind` definitively found no player named `username`."""
+    _misses.set((kind, username.lower()), True, TTLS[kind])
+    logger.debug(f"Negative cache: {kind} has no player {username} for {TTLS[kind]:.0f}s")
+
+
+def known_missing(kind: str, username: str) -> bool:
+    """True if `kind` recently found no player named `username`, so asking it again can be skipped."""
+    hit = _misses.get((kind, username.lower())) is not None
+    metrics.record_cache(f'negative_{kind}', hit)
+    return hit
+
+
+def clear():
+    _misses.clear()
@@ -0,0 +1,82 @@
+"""
+Per-host request pacing.
+
+Instead of every caller sleeping on its own (a random delay before each
+fetch, a private exponential backoff after each 429), a `HostPacer` hands out
+send times for one upstream host centrally: consecutive sends are at least
+`min_interval` (+ jitter) apart, and a 429 pushes the next send time back for
+every caller at once. A caller whose assigned send time is further away than
+its max wait gets nothing reserved and gives up immediately, so a backed-off
+host fails fast to the caches instead of parking worker threads for tens of
+seconds.
+"""
+
+import logging
+import random
+import threading
+import time
+from typing import Optional
+
+import metrics
+import tracing
+
+logger = logging.getLogger(__name__)
+
+
+class HostPacer:
+    """Central send-time schedule and shared 429 backoff for one upstream host."""
+
+    def __init__(self, host: str, min_interval: float = 0.0, jitter: float = 0.0, max_wait: float = 10.0,
+                 backoff_base: float = 2.0, backoff_max: float = 300.0):
+        self.host = host
+        self.min_interval = min_interval
+        self.jitter = jitter
+        self.max_wait = max_wait
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._next_send = 0.0
+        self._blocked_until = 0.0
+        self._strikes = 0
+        self._lock = threading.Lock()
+
+    def schedule(self, delay: float = 0.0, max_wait: Optional[float] = None) -> Optional[float]:
+        """
+        Reserves the next send time at least `delay` seconds from now.
+        Returns how long to wait for it, or None (and reserves nothing) if that is longer than `max_wait`.
+        """
+        max_wait = self.max_wait if max_wait is None else max_wait
+        with self._lock:
+            now = time.monotonic()
+            send_at = max(now + delay, self._next_send, self._blocked_until)
+            wait = send_at - now
+            if wait > max_wait:
+                return None
+            self._next_send = send_at + self.min_interval + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+            return wait
+
+    def wait(self, delay: float = 0.0, max_wait: Optional[float] = None, reason: str = 'pacing') -> bool:
+        """Waits for this caller's send time; False if it is too far away to wait for."""
+        wait = self.schedule(delay, max_wait)
+        if wait is None:
+            metrics.PACING_GIVE_UPS.labels(host=self.host).inc()
+            return False
+        metrics.PACING_WAIT.labels(host=self.host, reason=reason).observe(wait)
+        if wait > 0:
+            tracing.sleep(wait, reason=reason)
+        return True
+
+    def throttled(self, retry_after: Optional[float] = None) -> float:
+        """Backs the whole host off after a 429; consecutive 429s back off exponentially. Returns the backoff."""
+        with self._lock:
+            self._strikes += 1
+            if retry_after is None:
+                retry_after = self.backoff_base ** self._strikes + random.uniform(2, 5)
+            backoff = min(retry_after, self.backoff_max)
+            self._blocked_until = max(self._blocked_until, time.monotonic() + backoff)
+        metrics.PACING_BACKOFF.labels(host=self.host).inc()
+        return backoff
+
+    def succeeded(self):
+        """A normal response: the next 429 starts the backoff from scratch."""
+        with self._lock:
+            self._strikes = 0
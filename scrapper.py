@@ -11,68 +11,98 @@ import time
 import random
 from typing import Optional, Dict, Any
 import threading
+import contextvars
+from urllib.parse import urlparse
+import metrics
+import deadlines
+import negative_cache
+from config import (
+    MOJANG_PROFILE_URL, BWSTATS_USER_URL, SCRAPER_BACKOFF_BASE, SCRAPER_BACKOFF_MAX, SCRAPER_CONCURRENCY_INITIAL,
+    SCRAPER_CONCURRENCY_MAX, SCRAPER_CONCURRENCY_MIN, SCRAPER_LATENCY_TARGET, SCRAPER_MAX_WAIT, SCRAPER_MIN_INTERVAL,
+    SCRAPER_PACING_JITTER, STALE_CACHE_TIMEOUT,
+)
+from aimd import AimdLimiter
+from pacing import HostPacer
 
-# Try to use cloudscraper if available, fallback to requests
-try:
-    import cloudscraper
-    # Create scraper with more aggressive browser impersonation
-    scraper = cloudscraper.create_scraper(
-        browser={
-            'browser': 'chrome',
-            'platform': 'windows',
-            'desktop': True,
-            'mobile': False
-        },
-        delay=10,  # Add delay between requests
-        interpreter='nodejs'  # Use nodejs interpreter if available
-    )
-    logger_msg = "Using cloudscraper for requests"
-except ImportError:
-    scraper = requests.Session()
-    scraper.headers.update({
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8',
-        'Accept-Language': 'en-US,en;q=0.5',
-        'Accept-Encoding': 'gzip, deflate, br',
-        'DNT': '1',
-        'Connection': 'keep-alive',
-        'Upgrade-Insecure-Requests': '1',
-        'Sec-Fetch-Dest': 'document',
-        'Sec-Fetch-Mode': 'navigate',
-        'Sec-Fetch-Site': 'none',
-        'Cache-Control': 'max-age=0'
-    })
-    logger_msg = "Using requests.Session"
+# Shared Supabase handler for caching (its client is created on first use)
+from supabase_handler import supabase_handler as supabase, dashed_uuid, execute_within_deadline
+from models import PlayerStats
+from bedwars_schema import SCRAPER_MODE_HEADERS, SCRAPER_STAT_LABELS
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
-logger.info(logger_msg)
-
-# Import Supabase handler for caching
-try:
-    from supabase_handler import SupabaseHandler
-    supabase = SupabaseHandler()
-    logger.info("Supabase handler initialized for caching")
-except Exception as e:
-    logger.warning(f"Could not initialize Supabase handler: {e}")
-    supabase = None
 
 # Keep old cache settings for fallback
 CACHE_DIR = "./cache"
 CACHE_DURATION = 900  # 15 minutes in seconds
-USE_SUPABASE_CACHE = supabase is not None and supabase.client is not None
 
 # Thread pool for background tasks
 background_executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix="supabase_save")
 
-# Ensure cache directory exists (fallback)
-if not USE_SUPABASE_CACHE:
-    os.makedirs(CACHE_DIR, exist_ok=True)
-    logger.info("Using local file cache (Supabase not available)")
-else:
-    logger.info("Using Supabase for caching")
+_scraper = None
+_scraper_lock = threading.Lock()
+
+# Send times for every bwstats request in this process
+bwstats_pacer = HostPacer(
+    urlparse(BWSTATS_USER_URL).netloc, SCRAPER_MIN_INTERVAL, SCRAPER_PACING_JITTER, SCRAPER_MAX_WAIT,
+    SCRAPER_BACKOFF_BASE, SCRAPER_BACKOFF_MAX,
+)
+
+# Shared by every bulk scrape; every bwstats response (bulk or single) adjusts it
+bwstats_limiter = AimdLimiter(
+    'bwstats', SCRAPER_CONCURRENCY_INITIAL, SCRAPER_CONCURRENCY_MIN, SCRAPER_CONCURRENCY_MAX, SCRAPER_LATENCY_TARGET,
+)
+
+def _create_scraper():
+    # Try to use cloudscraper if available, fallback to requests
+    try:
+        import cloudscraper
+        # Create scraper with more aggressive browser impersonation
+        new_scraper = cloudscraper.create_scraper(
+            browser={
+                'browser': 'chrome',
+                'platform': 'windows',
+                'desktop': True,
+                'mobile': False
+            },
+            delay=10,  # Add delay between requests
+            interpreter='nodejs'  # Use nodejs interpreter if available
+        )
+        logger.info("Using cloudscraper for requests")
+    except ImportError:
+        new_scraper = requests.Session()
+        new_scraper.headers.update({
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8',
+            'Accept-Language': 'en-US,en;q=0.5',
+            'Accept-Encoding': 'gzip, deflate, br',
+            'DNT': '1',
+            'Connection': 'keep-alive',
+            'Upgrade-Insecure-Requests': '1',
+            'Sec-Fetch-Dest': 'document',
+            'Sec-Fetch-Mode': 'navigate',
+            'Sec-Fetch-Site': 'none',
+            'Cache-Control': 'max-age=0'
+        })
+        logger.info("Using requests.Session")
+    return new_scraper
 
-# Keep session for backwards compatibility
-session = scraper
+def get_scraper():
+    """Returns the shared HTTP session for bwstats, creating it on first use."""
+    global _scraper
+    if _scraper is None:
+        with _scraper_lock:
+            if _scraper is None:
+                _scraper = _create_scraper()
+    return _scraper
+
+def use_supabase_cache() -> bool:
+    """True when Supabase is configured; otherwise the local file cache is used."""
+    return supabase.client is not None
+
+def __getattr__(name):
+    # `scraper` and `session` (kept for backwards compatibility) resolve lazily
+    if name in ('scraper', 'session'):
+        return get_scraper()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def get_cache_path():
     """Get local cache file path (fallback only)"""
@@ -80,27 +110,24 @@ def get_cache_path():
     return os.path.join(CACHE_DIR, f"cache_{today_str}.json")
 
 def fetch_page(username, retry_count=5):
-    """Fetch page using scraper with retries"""
-    url = f"https://bwstats.shivam.pro/user/{username}"
-    
-    # On Render, skip direct fetching if we've been rate limited before
-    if os.environ.get('RENDER'):
-        # Check if we should skip due to persistent rate limiting
-        rate_limit_cache_key = f"rate_limited_{url}"
-        if hasattr(scraper, '_rate_limited_urls'):
-            if rate_limit_cache_key in scraper._rate_limited_urls:
-                last_attempt = scraper._rate_limited_urls[rate_limit_cache_key]
-                if time.time() - last_attempt < 3600:  # Skip for 1 hour
-                    logger.warning(f"Skipping fetch for {username} - Render IP is rate limited")
-                    return None
-        else:
-            scraper._rate_limited_urls = {}
-        
-        initial_delay = random.uniform(0.5, 2.0)
-        logger.debug(f"Running on Render, adding {initial_delay:.1f}s initial delay")
-        time.sleep(initial_delay)
+    """Fetch page using scraper with retries; send times come from bwstats_pacer"""
+    url = f"{BWSTATS_USER_URL}{username}"
+    scraper = get_scraper()
     
+    retry_delay = 0.0
     for attempt in range(retry_count):
+        # Wait no longer than the pacer allows, nor past the request's deadline
+        time_left = deadlines.remaining()
+        if time_left is not None and time_left <= 0:
+            logger.warning(f"Request deadline reached before attempt {attempt + 1} for {username}")
+            return None
+        max_wait = bwstats_pacer.max_wait if time_left is None else min(bwstats_pacer.max_wait, time_left)
+        if not bwstats_pacer.wait(retry_delay, max_wait=max_wait, reason='retry' if attempt else 'pacing'):
+            logger.warning(f"Skipping fetch for {username} - no bwstats send slot within {max_wait:.1f}s")
+            return None
+        if attempt:
+            metrics.UPSTREAM_RETRIES.labels(upstream='bwstats').inc()
+        
         try:
             # cloudscraper handles user agents and anti-bot measures automatically
             # Add more headers for better success rate
@@ -110,46 +137,65 @@ def fetch_page(username, retry_count=5):
                 'Cache-Control': 'no-cache',
                 'Pragma': 'no-cache'
             }
-            response = scraper.get(url, headers=headers, timeout=30)
+            started = time.perf_counter()
+            with metrics.timed('scraper_fetch', attempt=attempt + 1) as span:
+                response = scraper.get(url, headers=headers, timeout=deadlines.clamp(30))
+            metrics.record_upstream('bwstats', response.status_code)
+            if response.status_code == 429:
+                bwstats_limiter.observe('throttled')
+            elif response.status_code in (200, 404):
+                bwstats_limiter.observe('ok', time.perf_counter() - started)
+            else:
+                bwstats_limiter.observe('error')
+            if span is not None:
+                span.attrs['status'] = response.status_code
             
             if response.status_code == 200:
+                bwstats_pacer.succeeded()
                 logger.info(f"Successfully fetched page for {username}")
                 return response.text
             elif response.status_code == 404:
+                bwstats_pacer.succeeded()
                 logger.warning(f"Player not found (404): {username}")
+                negative_cache.record('scraper', username)
                 return None
             elif response.status_code == 429:
-                # On Render, mark this URL as rate limited and stop trying
-                if os.environ.get('RENDER'):
-                    if not hasattr(scraper, '_rate_limited_urls'):
-                        scraper._rate_limited_urls = {}
-                    scraper._rate_limited_urls[f"rate_limited_{url}"] = time.time()
-                    logger.error(f"Render IP is rate limited for {username}. Will use cache only for 1 hour.")
-                    return None  # Don't retry, just use cache
-                
-                # Rate limited - use longer exponential backoff on local
-                base_wait = 2
-                wait_time = (base_wait ** (attempt + 1)) + random.uniform(2, 5)
-                logger.warning(f"Rate limited (429) for {username}. Waiting {wait_time:.1f}s before retry {attempt + 1}/{retry_count}")
-                if attempt < retry_count - 1:
-                    time.sleep(wait_time)
+                # Backs off every bwstats request in this process, not just this one
+                backoff = bwstats_pacer.throttled(_retry_after_seconds(response))
+                logger.warning(f"Rate limited (429) for {username}. bwstats backed off for {backoff:.1f}s (attempt {attempt + 1}/{retry_count})")
+                retry_delay = 0.0
             else:
                 logger.warning(f"Attempt {attempt + 1} failed with status {response.status_code} for {username}")
-                if attempt < retry_count - 1:
-                    time.sleep(3 + random.uniform(1, 2))
+                retry_delay = 3 + random.uniform(1, 2)
                     
         except requests.exceptions.Timeout:
+            if deadlines.expired():
+                # Cut short by the request's deadline, not a sign of an unhealthy upstream
+                logger.warning(f"Request deadline reached during attempt {attempt + 1} for {username}")
+                return None
             logger.warning(f"Timeout on attempt {attempt + 1} for {username}")
-            if attempt < retry_count - 1:
-                time.sleep(3)
+            metrics.record_upstream('bwstats', 'timeout')
+            bwstats_limiter.observe('error')
+            retry_delay = 3
         except Exception as e:
+            if deadlines.expired():
+                # A read cut short by the deadline can surface as a connection error
+                logger.warning(f"Request deadline reached during attempt {attempt + 1} for {username}: {e}")
+                return None
             logger.error(f"Error on attempt {attempt + 1} for {username}: {e}")
-            if attempt < retry_count - 1:
-                time.sleep(3)
+            metrics.record_upstream('bwstats', 'error')
+            bwstats_limiter.observe('error')
+            retry_delay = 3
     
     logger.error(f"All {retry_count} attempts failed for {username}")
     return None
 
+def _retry_after_seconds(response) -> Optional[float]:
+    try:
+        return float(response.headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
 def parse_stats_from_html(html_content, username):
     """Parse stats from HTML content"""
     soup = BeautifulSoup(html_content, 'html.parser')
@@ -157,6 +203,7 @@ def parse_stats_from_html(html_content, username):
     # Check for player not found
     if "Player not found" in html_content:
         logger.warning(f"Player not found: {username}")
+        negative_cache.record('scraper', username)
         return {"error": "Player not found"}
     
     data = {'username': username, 'modes': {}}
@@ -179,40 +226,12 @@ def parse_stats_from_html(html_content, username):
     header_cells = rows[0].find_all(['th', 'td'])
     modes_list = [cell.get_text(strip=True) for cell in header_cells[1:]] 
     
-    mode_key_map = {
-        'Overall': 'overall', 
-        'Solo': 'solos', 
-        'Doubles': 'doubles', 
-        '3v3v3v3': 'threes', 
-        '4v4v4v4': 'fours', 
-        '4v4': '4v4'
-    }
-    
     # Initialize mode dictionaries
     for mode_name in modes_list:
-        mode_key = mode_key_map.get(mode_name)
+        mode_key = SCRAPER_MODE_HEADERS.get(mode_name)
         if mode_key:
             data['modes'][mode_key] = {}
     
-    # Map stat names to keys
-    stat_key_map = {
-        'Games Played': 'games_played',
-        'Wins': 'wins',
-        'Losses': 'losses',
-        'Win/Loss Ratio': 'wlr',
-        'Kills': 'kills',
-        'Deaths': 'deaths',
-        'K/D Ratio (KDR)': 'kdr',
-        'Final Kills': 'final_kills',
-        'Final Deaths': 'final_deaths',
-        'Final K/D Ratio (FKDR)': 'fkdr',
-        'Beds Broken': 'beds_broken',
-        'Beds Lost': 'beds_lost',
-        'Beds B/L Ratio (BBLR)': 'bblr',
-        'Winstreak': 'winstreak',
-        'Items Purchased': 'items_purchased'
-    }
-    
     # Parse stats rows
     for row in rows[1:]:
         cells = row.find_all('td')
@@ -220,13 +239,13 @@ def parse_stats_from_html(html_content, username):
             continue
         
         stat_name_raw = cells[0].get_text(strip=True)
-        stat_key = stat_key_map.get(stat_name_raw)
+        stat_key = SCRAPER_STAT_LABELS.get(stat_name_raw)
         
         if stat_key:
             for i, value_cell in enumerate(cells[1:]):
                 if i < len(modes_list):
                     mode_name = modes_list[i]
-                    mode_key = mode_key_map.get(mode_name)
+                    mode_key = SCRAPER_MODE_HEADERS.get(mode_name)
                     if mode_key and mode_key in data['modes']:
                         value = value_cell.get_text(strip=True)
                         data['modes'][mode_key][stat_key] = value
@@ -253,15 +272,40 @@ def parse_stats_from_html(html_content, username):
     
     return data
 
-def check_supabase_cache_fast(username: str) -> Optional[Dict[str, Any]]:
-    """Check Supabase for cached stats - optimized version that skips UUID lookup"""
-    if not USE_SUPABASE_CACHE:
+def lookup_uuid(username: str) -> Optional[str]:
+    """Mojang id (undashed) for a scraped player, or None if it cannot be resolved"""
+    try:
+        with metrics.timed('mojang_lookup'):
+            response = requests.get(f"{MOJANG_PROFILE_URL}{username}", timeout=deadlines.clamp(5))
+        metrics.record_upstream('mojang', response.status_code)
+        if response.status_code == 200:
+            return response.json().get('id')
+    except Exception as e:
+        logger.warning(f"Error getting UUID from Mojang for {username}: {e}")
+    return None
+
+@metrics.timed('transform')
+def normalize_scraped(parsed: Dict[str, Any], username: str) -> PlayerStats:
+    """Turns a page parse into the canonical model (ints, ratios, core/4v4, UUID) once, at ingest"""
+    return PlayerStats.from_dict(parsed, lookup_uuid(username))
+
+def stats_from_supabase_row(row: Dict[str, Any]) -> Optional[PlayerStats]:
+    """Model for a cached Supabase stats row, or None if the row cannot be read"""
+    data = convert_supabase_to_scraper_format(row)
+    if data is None:
+        return None
+    return PlayerStats.from_dict(data, data.get('uuid') or row.get('player_uuid'))
+
+def check_supabase_cache_fast(username: str, max_age: Optional[float] = CACHE_DURATION) -> Optional[PlayerStats]:
+    """Check Supabase for cached stats - optimized version that skips UUID lookup; max_age=None accepts any age"""
+    if not use_supabase_cache():
         return None
     
     try:
         # Skip UUID lookup - go straight to username search
         # This is faster and UUID can be filled in later if needed
-        result = supabase.client.rpc('get_latest_stats_by_ign', {'p_ign': username}).execute()
+        with metrics.timed('supabase_rpc'):
+            result = execute_within_deadline(supabase.client.rpc('get_latest_stats_by_ign', {'p_ign': username}))
         
         if result.data and len(result.data) > 0:
             stats = result.data[0]
@@ -269,41 +313,29 @@ def check_supabase_cache_fast(username: str) -> Optional[Dict[str, Any]]:
             updated_at = datetime.datetime.fromisoformat(stats['updated_at'].replace('Z', '+00:00'))
             age_seconds = (datetime.datetime.utcnow().replace(tzinfo=updated_at.tzinfo) - updated_at).total_seconds()
             
-            if age_seconds < CACHE_DURATION:
-                logger.info(f"Found fresh cached stats in Supabase for {username} (age: {age_seconds:.0f}s)")
-                return convert_supabase_to_scraper_format(stats)
+            if max_age is None or age_seconds < max_age:
+                logger.info(f"Found cached stats in Supabase for {username} (age: {age_seconds:.0f}s)")
+                metrics.record_cache('supabase', True)
+                return stats_from_supabase_row(stats)
             else:
                 logger.info(f"Cached stats for {username} are stale (age: {age_seconds:.0f}s)")
         
+        metrics.record_cache('supabase', False)
         return None
     except Exception as e:
         logger.error(f"Error checking Supabase cache: {e}")
         return None
 
-def save_to_supabase_async(username: str, stats_data: Dict[str, Any]):
+def save_to_supabase_async(username: str, stats: PlayerStats, fetched_from: str = "scraper"):
     """Save to Supabase asynchronously in background - won't block the response"""
-    if not USE_SUPABASE_CACHE or 'error' in stats_data:
+    if not use_supabase_cache():
         return
     
     def _background_save():
+        metrics.QUEUE_DEPTH.labels(queue='supabase_save').dec()
         try:
-            # Make a copy to avoid modification issues
-            data_copy = json.loads(json.dumps(stats_data))
-            
-            # Try to get UUID, but don't fail if we can't
-            uuid = None
-            try:
-                response = requests.get(
-                    f"https://api.mojang.com/users/profiles/minecraft/{username}",
-                    timeout=5
-                )
-                if response.status_code == 200:
-                    uuid_raw = response.json().get('id')
-                    if uuid_raw and len(uuid_raw) == 32:
-                        uuid = f"{uuid_raw[:8]}-{uuid_raw[8:12]}-{uuid_raw[12:16]}-{uuid_raw[16:20]}-{uuid_raw[20:]}"
-            except Exception as e:
-                logger.debug(f"Could not get UUID for {username}: {e}")
-            
+            # The UUID was resolved at ingest; the table requires it
+            uuid = dashed_uuid(stats.uuid)
             if uuid:
                 # Ensure player exists
                 try:
@@ -317,18 +349,18 @@ def save_to_supabase_async(username: str, stats_data: Dict[str, Any]):
                     logger.debug(f"Error with player_names table: {e}")
                 
                 # Save stats with UUID
-                supabase.save_stats(username, data_copy, fetched_from="scraper")
+                supabase.save_stats(username, stats, fetched_from=fetched_from, uuid=uuid)
                 logger.info(f"Background save completed for {username} with UUID")
             else:
-                # Save without UUID - we can update it later
-                logger.info(f"Saving {username} without UUID (will update later)")
                 # For now, skip if no UUID since the table requires it
                 # In production, you might want to modify the schema to make UUID optional
+                logger.info(f"Skipping Supabase save for {username}: no UUID")
                 
         except Exception as e:
             logger.error(f"Error in background save for {username}: {e}")
     
     # Submit to background thread pool
+    metrics.QUEUE_DEPTH.labels(queue='supabase_save').inc()
     background_executor.submit(_background_save)
     logger.debug(f"Submitted background save task for {username}")
 
@@ -371,8 +403,8 @@ def convert_supabase_to_scraper_format(supabase_stats: Dict[str, Any]) -> Dict[s
         logger.error(f"Error converting Supabase format: {e}")
         return None
 
-def check_local_cache(username: str) -> Optional[Dict[str, Any]]:
-    """Check local file cache (fallback when Supabase not available)"""
+def check_local_cache(username: str, max_age: Optional[float] = CACHE_DURATION) -> Optional[PlayerStats]:
+    """Check local file cache (fallback when Supabase not available); max_age=None accepts any age"""
     cache_path = get_cache_path()
     if not os.path.exists(cache_path):
         return None
@@ -387,21 +419,34 @@ def check_local_cache(username: str) -> Optional[Dict[str, Any]]:
             if last_updated_str:
                 try:
                     last_updated_dt = datetime.datetime.fromisoformat(last_updated_str)
-                    if (datetime.datetime.utcnow() - last_updated_dt).total_seconds() < CACHE_DURATION:
+                    if max_age is None or (datetime.datetime.utcnow() - last_updated_dt).total_seconds() < max_age:
                         logger.info(f"Returning cached data from file for {username}")
-                        return user_cached_data
+                        metrics.record_cache('local', True)
+                        return PlayerStats.from_dict(user_cached_data)
                 except ValueError:
                     pass
     except Exception as e:
         logger.error(f"Error reading local cache: {e}")
     
+    metrics.record_cache('local', False)
     return None
 
-def save_to_local_cache(username: str, stats_data: Dict[str, Any]):
-    """Save to local file cache (fallback)"""
-    if 'error' in stats_data:
-        return
-    
+def check_stale_cache(username: str) -> Optional[PlayerStats]:
+    """
+    Newest cached stats whatever their age, marked stale; the answer of last resort when a deadline runs out,
+    so the lookup gets STALE_CACHE_TIMEOUT seconds of its own
+    """
+    if use_supabase_cache():
+        with deadlines.fresh(STALE_CACHE_TIMEOUT):
+            stats = check_supabase_cache_fast(username, max_age=None)
+    else:
+        stats = check_local_cache(username, max_age=None)
+    if stats is not None:
+        stats.stale = True
+    return stats
+
+def save_to_local_cache(username: str, stats: PlayerStats):
+    """Save the normalized stats to local file cache (fallback)"""
     cache_path = get_cache_path()
     all_cached_data = {}
     
@@ -412,9 +457,10 @@ def save_to_local_cache(username: str, stats_data: Dict[str, Any]):
         except:
             pass
     
-    all_cached_data[username.lower()] = stats_data
+    all_cached_data[username.lower()] = stats.to_dict()
     
     try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
         with open(cache_path, 'w') as f:
             json.dump(all_cached_data, f, indent=4)
         logger.info(f"Saved to local cache for {username}")
@@ -422,10 +468,13 @@ def save_to_local_cache(username: str, stats_data: Dict[str, Any]):
         logger.error(f"Failed to save local cache: {e}")
 
 def scrape_bwstats(username):
-    """Main function to scrape stats for a single user - optimized for speed"""
+    """
+    Main function to scrape stats for a single user - optimized for speed.
+    Returns a PlayerStats model, or an error dict.
+    """
     
     # Check cache first (fast path - no UUID lookup)
-    if USE_SUPABASE_CACHE:
+    if use_supabase_cache():
         cached_data = check_supabase_cache_fast(username)
         if cached_data:
             return cached_data
@@ -438,20 +487,25 @@ def scrape_bwstats(username):
     # On Render, check if we should use aggressive caching due to rate limits
     if os.environ.get('RENDER'):
         # Try to get any cached data, even if slightly stale
-        if USE_SUPABASE_CACHE:
+        if use_supabase_cache():
             try:
                 # Get data up to 1 hour old if on Render and getting rate limited
-                result = supabase.client.rpc('get_latest_stats_by_ign', {'p_ign': username}).execute()
+                result = execute_within_deadline(supabase.client.rpc('get_latest_stats_by_ign', {'p_ign': username}))
                 if result.data and len(result.data) > 0:
                     stats = result.data[0]
                     updated_at = datetime.datetime.fromisoformat(stats['updated_at'].replace('Z', '+00:00'))
                     age_seconds = (datetime.datetime.utcnow().replace(tzinfo=updated_at.tzinfo) - updated_at).total_seconds()
                     if age_seconds < 3600:  # 1 hour
                         logger.info(f"Using older cached data for {username} on Render (age: {age_seconds:.0f}s)")
-                        return convert_supabase_to_scraper_format(stats)
+                        return stats_from_supabase_row(stats)
             except:
                 pass
     
+    # bwstats recently had no such player; don't ask again
+    if negative_cache.known_missing('scraper', username):
+        logger.info(f"Skipping fetch for {username} - recently not found")
+        return {"error": "Player not found"}
+
     # Fetch fresh data
     logger.info(f"Fetching fresh stats for {username}")
     html_content = fetch_page(username)
@@ -460,12 +514,12 @@ def scrape_bwstats(username):
         logger.error(f"Failed to fetch page for {username}")
         
         # On Render, try to return ANY cached data as last resort
-        if os.environ.get('RENDER') and USE_SUPABASE_CACHE:
+        if os.environ.get('RENDER') and use_supabase_cache():
             try:
-                result = supabase.client.rpc('get_latest_stats_by_ign', {'p_ign': username}).execute()
+                result = execute_within_deadline(supabase.client.rpc('get_latest_stats_by_ign', {'p_ign': username}))
                 if result.data and len(result.data) > 0:
                     logger.warning(f"Returning stale cache for {username} due to fetch failure on Render")
-                    return convert_supabase_to_scraper_format(result.data[0])
+                    return stats_from_supabase_row(result.data[0])
             except:
                 pass
         
@@ -475,27 +529,35 @@ def scrape_bwstats(username):
             return {"error": "Failed to fetch player stats - try again later"}
     
     # Parse the HTML
-    result = parse_stats_from_html(html_content, username)
+    with metrics.timed('html_parse'):
+        result = parse_stats_from_html(html_content, username)
+    if "error" in result:
+        return result
+    
+    # Normalize once; the cached form is the one every later request is served from
+    stats = normalize_scraped(result, username)
     
     # Save to cache asynchronously (won't block the response)
-    if "error" not in result:
-        if USE_SUPABASE_CACHE:
-            # Save in background - return immediately
-            save_to_supabase_async(username, result)
-        else:
-            # Local cache is fast enough to do synchronously
-            save_to_local_cache(username, result)
+    if use_supabase_cache():
+        # Save in background - return immediately
+        save_to_supabase_async(username, stats)
+    else:
+        # Local cache is fast enough to do synchronously
+        save_to_local_cache(username, stats)
     
-    return result
+    return stats
+
+def _scrape_limited(username):
+    with bwstats_limiter:
+        return scrape_bwstats(username)
 
 def scrape_multiple_bwstats(usernames):
-    """Scrape multiple users concurrently with rate limiting"""
-    with ThreadPoolExecutor(max_workers=3) as executor:
-        # Submit all at once for better concurrency
-        futures = [executor.submit(scrape_bwstats, username) for username in usernames]
-        # Small delay to avoid hammering the server
-        time.sleep(0.2)
-        
+    """Scrape multiple users concurrently; how many run at once follows bwstats_limiter"""
+    if not usernames:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(len(usernames), bwstats_limiter.ceiling)) as executor:
+        # Each worker runs in a copy of the caller's context, so the request deadline and trace follow it
+        futures = [executor.submit(contextvars.copy_context().run, _scrape_limited, username) for username in usernames]
         results = [future.result() for future in futures]
     return dict(zip(usernames, results))
 
@@ -110,4 +110,96 @@ document.addEventListener('DOMContentLoaded', () => {
     } else {
         console.log("Single player stats page elements not found.");
     }
+
+    // --- Relative Fetch Times ---
+    // Pages are cached, so the server renders the absolute fetch time and the age is computed here
+    const timeAgo = (date) => {
+        const seconds = Math.floor((Date.now() - date.getTime()) / 1000);
+        if (seconds < 5) return 'just now';
+        if (seconds < 60) return `${seconds} seconds ago`;
+        const minutes = Math.round(seconds / 60);
+        if (minutes < 60) return `${minutes} minutes ago`;
+        const hours = Math.round(minutes / 60);
+        if (hours < 24) return `${hours} hours ago`;
+        return `${Math.round(hours / 24)} days ago`;
+    };
+    const fetchTimes = document.querySelectorAll('time[data-time-ago]');
+    const updateFetchTimes = () => {
+        fetchTimes.forEach(element => {
+            const date = new Date(element.getAttribute('datetime'));
+            if (!isNaN(date)) {
+                element.title = element.title || element.textContent;
+                element.textContent = timeAgo(date);
+            }
+        });
+    };
+    if (fetchTimes.length) {
+        updateFetchTimes();
+        setInterval(updateFetchTimes, 30000);
+    }
+
+    // --- Setup for Username Suggestions on Search Inputs ---
+    const suggestInputs = document.querySelectorAll('input[data-suggest]');
+    suggestInputs.forEach((input, index) => {
+        const datalist = document.createElement('datalist');
+        datalist.id = `suggest-list-${index}`;
+        input.setAttribute('list', datalist.id);
+        input.after(datalist);
+
+        // "Did you mean" hint shown under the form when no known name starts with what was typed
+        const hint = document.createElement('p');
+        hint.className = 'suggest-hint text-sm text-gray-400 mt-2 hidden';
+        (input.form || datalist).after(hint);
+
+        let debounceTimer = null;
+        let controller = null;
+
+        input.addEventListener('input', () => {
+            clearTimeout(debounceTimer);
+            const query = input.value.trim();
+            if (!/^[A-Za-z0-9_]{1,16}$/.test(query)) {
+                datalist.innerHTML = '';
+                hint.classList.add('hidden');
+                return;
+            }
+            debounceTimer = setTimeout(() => {
+                if (controller) controller.abort();
+                controller = new AbortController();
+                fetch(`/api/suggest?q=${encodeURIComponent(query)}`, { signal: controller.signal })
+                    .then(response => response.json())
+                    .then(data => {
+                        datalist.innerHTML = '';
+                        data.suggestions.forEach(name => {
+                            const option = document.createElement('option');
+                            option.value = name;
+                            datalist.appendChild(option);
+                        });
+                        hint.innerHTML = '';
+                        if (data.did_you_mean.length) {
+                            hint.append('Did you mean ');
+                            data.did_you_mean.slice(0, 3).forEach((name, i) => {
+                                if (i) hint.append(', ');
+                                const link = document.createElement('button');
+                                link.type = 'button';
+                                link.className = 'text-purple-300 hover:underline';
+                                link.textContent = name;
+                                link.addEventListener('click', () => {
+                                    input.value = name;
+                                    hint.classList.add('hidden');
+                                    input.focus();
+                                });
+                                hint.appendChild(link);
+                            });
+                            hint.append('?');
+                            hint.classList.remove('hidden');
+                        } else {
+                            hint.classList.add('hidden');
+                        }
+                    })
+                    .catch(error => {
+                        if (error.name !== 'AbortError') console.warn(`Suggestions failed for ${query}:`, error);
+                    });
+            }, 120);
+        });
+    });
 });
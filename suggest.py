@@ -0,0 +1,342 @@
+"""
+Username suggestions for the search boxes (/api/suggest).
+
+Known names live in a sorted array, so the names starting with a prefix are
+one contiguous slice found by two bisections, ranked by how often each name
+was looked up. Short prefixes match thousands of names; for those the top
+results are computed once and then kept up to date as names are added or
+looked up, so every query stays well under a millisecond.
+
+When nothing starts with the query, a BK-tree over the same names offers
+"did you mean" corrections within a small edit distance.
+
+Names come from the local name index, Supabase's player_names table and the
+tracked players table. New rows are pulled incrementally every
+SUGGEST_REFRESH_INTERVAL seconds into a snapshot file (SUGGEST_SNAPSHOT_PATH)
+that one worker per host updates and the others load, and every successful
+lookup adds or bumps its name.
+"""
+
+import bisect
+import heapq
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import file_lock
+from config import (
+    SUGGEST_LIMIT, SUGGEST_MAX_DISTANCE, SUGGEST_MAX_NAMES, SUGGEST_REFRESH_INTERVAL, SUGGEST_SNAPSHOT_PATH,
+)
+from name_index import name_index
+from supabase_handler import get_client
+from ttl_cache import TTLCache
+
+try:
+    from rapidfuzz.distance import Levenshtein
+except ImportError:
+    Levenshtein = None
+
+logger = logging.getLogger(__name__)
+
+VALID_QUERY = re.compile(r'^[A-Za-z0-9_]{1,16}$')
+# Prefixes matching more names than this keep a maintained top list instead of scanning their slice
+SCAN_LIMIT = 256
+# Length of the top lists kept for broad prefixes; queries never ask for more
+TOP_SIZE = 25
+# Rows per Supabase select; PostgREST caps each response
+PAGE_SIZE = 1000
+# Score a tracked player starts with, so sweeps' players rank above names seen once
+TRACKED_SCORE = 1
+# "Did you mean" answers are kept this long; bots retrying the same typo cost one tree search
+CORRECTION_TTL = 300
+
+
+def edit_distance(a: str, b: str) -> int:
+    """Levenshtein distance (rapidfuzz's C implementation when installed, about 100x faster)."""
+    if Levenshtein is not None:
+        return Levenshtein.distance(a, b)
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+class BKTree:
+    """
+    Metric tree over edit distance; finds every word within a distance without comparing against all of them.
+    Adds take the tree's lock; searches don't, since an add only ever links a new leaf into one child dict.
+    """
+
+    def __init__(self):
+        self._root = None
+        self._lock = threading.Lock()
+
+    def add(self, word: str):
+        with self._lock:
+            if self._root is None:
+                self._root = (word, {})
+                return
+            node = self._root
+            while True:
+                distance = edit_distance(word, node[0])
+                if distance == 0:
+                    return
+                child = node[1].get(distance)
+                if child is None:
+                    node[1][distance] = (word, {})
+                    return
+                node = child
+
+    def search(self, word: str, max_distance: int) -> List[tuple]:
+        """(distance, word) pairs within max_distance, in no particular order."""
+        if self._root is None:
+            return []
+        found = []
+        stack = [self._root]
+        while stack:
+            candidate, children = stack.pop()
+            distance = edit_distance(word, candidate)
+            if distance <= max_distance:
+                found.append((distance, candidate))
+            for child_distance in range(distance - max_distance, distance + max_distance + 1):
+                child = children.get(child_distance)
+                if child is not None:
+                    stack.append(child)
+        return found
+
+
+class SuggestIndex:
+    """Sorted array of lower-cased names with popularity scores, plus a BK-tree for corrections."""
+
+    def __init__(self):
+        self._keys: List[str] = []
+        self._names: Dict[str, str] = {}
+        self._scores: Dict[str, int] = {}
+        self._top: Dict[str, List[str]] = {}
+        self._tree = BKTree()
+        self._corrections = TTLCache(1024)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, name: Optional[str], score: int = 0):
+        """Adds a name (keeping the higher of its scores) or refreshes its display spelling."""
+        if not name or not VALID_QUERY.match(name):
+            return
+        key = name.lower()
+        with self._lock:
+            known = key in self._names
+            self._insert(key, name)
+            self._names[key] = name
+            if not known or score > self._scores[key]:
+                self._scores[key] = max(self._scores[key], score)
+                self._update_top(key)
+
+    def record_lookup(self, name: Optional[str]):
+        """Counts one lookup of `name`, adding it if it is new."""
+        if not name or not VALID_QUERY.match(name):
+            return
+        key = name.lower()
+        with self._lock:
+            self._insert(key, name)
+            self._scores[key] += 1
+            self._update_top(key)
+
+    def _insert(self, key: str, name: str):
+        if key in self._names:
+            return
+        bisect.insort(self._keys, key)
+        self._tree.add(key)
+        self._names[key] = name
+        self._scores[key] = 0
+
+    def _range(self, prefix: str):
+        start = bisect.bisect_left(self._keys, prefix)
+        end = bisect.bisect_left(self._keys, prefix + '\x7f', start)
+        return start, end
+
+    def _rank(self, keys) -> List[str]:
+        return heapq.nsmallest(TOP_SIZE, keys, key=lambda key: (-self._scores[key], key))
+
+    def _update_top(self, key: str):
+        """Keeps the maintained top lists of every prefix of `key` current after a change to `key`."""
+        for length in range(1, len(key) + 1):
+            top = self._top.get(key[:length])
+            if top is None:
+                continue
+            if key not in top:
+                top.append(key)
+            self._top[key[:length]] = self._rank(top)
+
+    def prefix(self, query: str, limit: int = SUGGEST_LIMIT) -> List[str]:
+        """Most looked-up names starting with `query` (case-insensitive)."""
+        prefix = query.lower()
+        limit = min(limit, TOP_SIZE)
+        with self._lock:
+            top = self._top.get(prefix)
+            if top is None:
+                start, end = self._range(prefix)
+                top = self._rank(self._keys[start:end])
+                if end - start > SCAN_LIMIT:
+                    self._top[prefix] = top
+            return [self._names[key] for key in top[:limit]]
+
+    def did_you_mean(self, query: str, limit: int = SUGGEST_LIMIT) -> List[str]:
+        """Known names within SUGGEST_MAX_DISTANCE edits of `query`, closest and most looked-up first."""
+        # One edit for very short names, where two would match almost anything
+        max_distance = min(SUGGEST_MAX_DISTANCE, max(1, len(query) // 4))
+        key = (query.lower(), limit)
+        cached = self._corrections.get(key)
+        if cached is not None:
+            return cached
+        # The search takes milliseconds on large indexes, so it runs outside the lock prefix queries wait on
+        found = self._tree.search(query.lower(), max_distance)
+        with self._lock:
+            found.sort(key=lambda item: (item[0], -self._scores[item[1]]))
+            corrections = [self._names[name] for _, name in found[:limit] if name != query.lower()]
+        self._corrections.set(key, corrections, CORRECTION_TTL)
+        return corrections
+
+    def suggest(self, query: str, limit: int = SUGGEST_LIMIT) -> Dict[str, List[str]]:
+        """The /api/suggest answer: prefix matches, and corrections when nothing matches."""
+        if not VALID_QUERY.match(query or ''):
+            return {'suggestions': [], 'did_you_mean': []}
+        suggestions = self.prefix(query, limit)
+        return {'suggestions': suggestions, 'did_you_mean': [] if suggestions else self.did_you_mean(query, limit)}
+
+
+suggest_index = SuggestIndex()
+
+
+class _Refresher:
+    """
+    Adds the name index's names every round, and the names pulled from Supabase through a snapshot file shared
+    by the workers of a host: one worker at a time pulls the rows newer than the snapshot into it (all of them
+    the first time), every worker loads the snapshot whenever it changed.
+    """
+
+    def __init__(self, index: SuggestIndex, interval: float, snapshot_path: str):
+        self.index = index
+        self.interval = interval
+        self.snapshot_path = snapshot_path
+        self._loaded_mtime = None
+        self._started = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        threading.Thread(target=self._run, name='suggest_refresh', daemon=True).start()
+
+    def _run(self):
+        while True:
+            self.refresh()
+            if self.interval <= 0:
+                return
+            time.sleep(self.interval)
+
+    def refresh(self):
+        # Names the app learned since the last round; known names are skipped cheaply
+        for name in name_index.current_names():
+            self.index.add(name)
+        try:
+            # Workers that wait here find the snapshot fresh once the puller releases it
+            with file_lock.exclusive(f"{self.snapshot_path}.lock"):
+                if self._pull_due():
+                    self._pull()
+            self._load()
+        except Exception as e:
+            logger.error(f"Error refreshing suggest index: {e}")
+
+    def _snapshot_age(self) -> Optional[float]:
+        try:
+            return time.time() - os.path.getmtime(self.snapshot_path)
+        except OSError:
+            return None
+
+    def _pull_due(self) -> bool:
+        """No snapshot yet, or (when refreshing) one older than half the interval, so workers don't all pull."""
+        age = self._snapshot_age()
+        return age is None or (self.interval > 0 and age >= self.interval / 2)
+
+    def _read_snapshot(self) -> Dict[str, Any]:
+        if not os.path.exists(self.snapshot_path):
+            return {}
+        with open(self.snapshot_path, 'r') as f:
+            return json.load(f)
+
+    def _pull(self):
+        client = get_client()
+        if client is None:
+            return
+        started = time.time()
+        snapshot = self._read_snapshot()
+        since = snapshot.get('since')
+        names = snapshot.get('names', {})
+        rows = _select_pages(lambda: client.table('player_names').select('player_name, updated_at'), since)
+        for row in rows:
+            name = row.get('player_name')
+            if name:
+                names.setdefault(name, 0)
+        if since is None:
+            tracked = _select_pages(lambda: client.table('players').select('player_name'))
+            for row in tracked:
+                name = row.get('player_name')
+                if name:
+                    names[name] = max(names.get(name, 0), TRACKED_SCORE)
+            rows += tracked
+        # Overlap the next pull a little so rows written while this one ran are not missed
+        data = {'since': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(started - 60)), 'names': names}
+        os.makedirs(os.path.dirname(self.snapshot_path) or '.', exist_ok=True)
+        tmp_path = f"{self.snapshot_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.snapshot_path)
+        logger.info(f"Suggest snapshot updated with {len(rows)} rows ({len(names)} names) in {time.time() - started:.2f}s")
+
+    def _load(self):
+        """Adds the snapshot's names when another round (here or in another worker) changed it."""
+        try:
+            mtime = os.path.getmtime(self.snapshot_path)
+        except OSError:
+            return
+        if mtime == self._loaded_mtime:
+            return
+        names = self._read_snapshot().get('names', {})
+        for name, score in names.items():
+            self.index.add(name, score)
+        self._loaded_mtime = mtime
+        logger.info(f"Suggest index loaded {len(names)} names from {self.snapshot_path} ({len(self.index)} names)")
+
+
+def _select_pages(make_query, updated_since: Optional[str] = None) -> List[dict]:
+    """
+    All rows of a select, page by page (PostgREST caps each response), up to SUGGEST_MAX_NAMES. Pages are
+    ordered by updated_at or the uuid key, since PostgREST keeps no row order between range requests.
+    """
+    rows = []
+    for start in range(0, SUGGEST_MAX_NAMES, PAGE_SIZE):
+        query = make_query()
+        if updated_since:
+            query = query.gte('updated_at', updated_since).order('updated_at')
+        query = query.order('uuid')
+        page = query.range(start, start + PAGE_SIZE - 1).execute().data or []
+        rows.extend(page)
+        if len(page) < PAGE_SIZE:
+            break
+    return rows
+
+
+refresher = _Refresher(suggest_index, SUGGEST_REFRESH_INTERVAL, SUGGEST_SNAPSHOT_PATH)
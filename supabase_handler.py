@@ -1,57 +1,110 @@
 import os
 import json
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
-from supabase import create_client, Client
 import requests
 from dotenv import load_dotenv
+import deadlines
+import metrics
+from config import MOJANG_PROFILE_URL, SUPABASE_TIMEOUT
+from models import PlayerStats
+from name_index import name_index
 
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
-class SupabaseHandler:
-    def __init__(self):
-        self.url = os.getenv('SUPABASE_URL')
-        self.key = os.getenv('SUPABASE_ANON_KEY')
-        
-        if not self.url or not self.key:
+_client = None
+_client_initialized = False
+_client_lock = threading.Lock()
+# Runs Supabase calls that must return by the request's deadline; the client timeout ends them soon after
+_bounded_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="supabase_call")
+
+def get_client():
+    """
+    Returns the process-wide Supabase client, creating it on first use.
+    Returns None if credentials are missing or the client cannot be created.
+    """
+    global _client, _client_initialized
+    if _client_initialized:
+        return _client
+    with _client_lock:
+        if _client_initialized:
+            return _client
+        url = os.getenv('SUPABASE_URL')
+        key = os.getenv('SUPABASE_ANON_KEY')
+        if not url or not key:
             logger.warning("Supabase credentials not found. Cache will be disabled.")
-            self.client = None
         else:
             try:
-                self.client: Client = create_client(self.url, self.key)
+                from supabase import create_client
+                from supabase.lib.client_options import ClientOptions
+                _client = create_client(url, key, options=ClientOptions(postgrest_client_timeout=SUPABASE_TIMEOUT))
                 logger.info("Supabase client initialized successfully")
             except TypeError as e:
                 # Handle version compatibility issues
                 if "proxy" in str(e):
                     logger.warning("Supabase client version incompatibility detected. Cache will be disabled.")
-                    self.client = None
                 else:
                     raise
             except Exception as e:
                 logger.error(f"Failed to initialize Supabase client: {e}")
-                self.client = None
+        _client_initialized = True
+        return _client
+
+def execute_within_deadline(query):
+    """
+    Executes a Supabase query without outliving the request's deadline: raises DeadlineExceeded when none is
+    left, or when the call is still running once it runs out (the call itself ends within SUPABASE_TIMEOUT).
+    """
+    timeout = deadlines.clamp(SUPABASE_TIMEOUT)
+    if deadlines.remaining() is None:
+        return query.execute()
+    future = _bounded_executor.submit(query.execute)
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeout:
+        raise deadlines.DeadlineExceeded("Request deadline exceeded waiting for Supabase")
+
+def dashed_uuid(uuid: Optional[str]) -> Optional[str]:
+    """Formats a 32 character Mojang id with dashes; anything else is returned unchanged."""
+    if uuid and len(uuid) == 32:
+        return f"{uuid[:8]}-{uuid[8:12]}-{uuid[12:16]}-{uuid[16:20]}-{uuid[20:]}"
+    return uuid
+
+class SupabaseHandler:
+    def __init__(self):
+        self.url = os.getenv('SUPABASE_URL')
+        self.key = os.getenv('SUPABASE_ANON_KEY')
+
+    @property
+    def client(self):
+        """Shared Supabase client, created lazily on first access."""
+        return get_client()
     
     def get_player_uuid(self, username: str) -> Optional[str]:
         """Get player UUID from Mojang API"""
         try:
-            response = requests.get(f"https://api.mojang.com/users/profiles/minecraft/{username}")
+            with metrics.timed('mojang_lookup'):
+                response = requests.get(f"{MOJANG_PROFILE_URL}{username}", timeout=deadlines.clamp(5))
+            metrics.record_upstream('mojang', response.status_code)
             if response.status_code == 200:
                 data = response.json()
                 uuid = data.get('id')
                 # Format UUID with dashes
                 if uuid and len(uuid) == 32:
-                    formatted_uuid = f"{uuid[:8]}-{uuid[8:12]}-{uuid[12:16]}-{uuid[16:20]}-{uuid[20:]}"
-                    return formatted_uuid
+                    return dashed_uuid(uuid)
             return None
         except Exception as e:
             logger.error(f"Error fetching UUID for {username}: {e}")
             return None
     
     def ensure_player_exists(self, uuid: str, username: str):
-        """Ensure player exists in player_names table"""
+        """Ensure player exists in player_names table (and in the local name index)"""
+        name_index.observe(uuid, username)
         if not self.client:
             return
         
@@ -107,14 +160,18 @@ class SupabaseHandler:
             logger.error(f"Error getting cached stats: {e}")
             return None
     
-    def save_stats(self, username: str, stats_data: Dict[str, Any], fetched_from: str = "scraper"):
-        """Save stats to Supabase"""
+    def save_stats(self, username: str, stats_data: PlayerStats, fetched_from: str = "scraper", uuid: Optional[str] = None):
+        """Save stats to Supabase; pass `uuid` when it is already known to skip the Mojang lookup"""
         if not self.client:
             return
         
+        with metrics.timed('supabase_write'):
+            self._save_stats(username, stats_data, fetched_from, uuid)
+
+    def _save_stats(self, username: str, stats_data: PlayerStats, fetched_from: str, uuid: Optional[str]):
         try:
             # Get player UUID
-            uuid = self.get_player_uuid(username)
+            uuid = dashed_uuid(uuid) or self.get_player_uuid(username)
             if not uuid:
                 logger.warning(f"Could not get UUID for {username}, skipping cache save")
                 return
@@ -130,63 +187,27 @@ class SupabaseHandler:
                 'updated_at': datetime.utcnow().isoformat()
             }
             
-            # Extract basic stats
-            if fetched_from == "api":
-                # Parse API response - get the actual stats from the response structure
-                # The API response has stats directly in stats_data for overall stats
-                stats_record.update({
-                    'level': stats_data.get('level', 0),
-                    'exp': stats_data.get('exp', 0),
-                    'wins': stats_data.get('overall_wins', 0),
-                    'losses': stats_data.get('overall_losses', 0),
-                    'wlr': float(stats_data.get('overall_wlr', 0)),
-                    'finals': stats_data.get('overall_final_kills', 0),
-                    'final_deaths': stats_data.get('overall_final_deaths', 0),
-                    'fkdr': float(stats_data.get('overall_fkdr', 0)),
-                    'beds_broken': stats_data.get('overall_beds_broken', 0),
-                    'beds_lost': stats_data.get('overall_beds_lost', 0),
-                    'bblr': float(stats_data.get('overall_bblr', 0)),
-                    'kills': stats_data.get('overall_kills', 0),
-                    'deaths': stats_data.get('overall_deaths', 0),
-                    'kdr': float(stats_data.get('overall_kdr', 0)),
-                    'winrate': float(stats_data.get('overall_win_rate', 0)),
-                    'finals_per_star': float(stats_data.get('overall_finals_per_star', 0)),
-                    'detailed_stats': json.dumps(stats_data)
-                })
-            else:
-                # Parse scraper response - data comes in modes.overall structure
-                modes = stats_data.get('modes', {})
-                overall = modes.get('overall', {})
-                star_level = stats_data.get('star', 0)
-                
-                # Calculate additional metrics
-                wins = self._safe_int(overall.get('wins', 0))
-                losses = self._safe_int(overall.get('losses', 0))
-                games_played = wins + losses
-                winrate = round((wins / games_played * 100), 2) if games_played > 0 else 0
-                
-                finals = self._safe_int(overall.get('final_kills', 0))
-                finals_per_star = round(finals / star_level, 2) if star_level > 0 else 0
-                
-                stats_record.update({
-                    'level': star_level,
-                    'exp': 0,  # Not available from scraper
-                    'wins': wins,
-                    'losses': losses,
-                    'wlr': self._safe_float(overall.get('wlr', 0)),
-                    'finals': finals,
-                    'final_deaths': self._safe_int(overall.get('final_deaths', 0)),
-                    'fkdr': self._safe_float(overall.get('fkdr', 0)),
-                    'beds_broken': self._safe_int(overall.get('beds_broken', 0)),
-                    'beds_lost': self._safe_int(overall.get('beds_lost', 0)),
-                    'bblr': self._safe_float(overall.get('bblr', 0)),
-                    'kills': self._safe_int(overall.get('kills', 0)),
-                    'deaths': self._safe_int(overall.get('deaths', 0)),
-                    'kdr': self._safe_float(overall.get('kdr', 0)),
-                    'winrate': winrate,
-                    'finals_per_star': finals_per_star,
-                    'detailed_stats': json.dumps(stats_data)
-                })
+            # Extract basic stats; API and scraper results share the PlayerStats model
+            overall = stats_data.overall
+            stats_record.update({
+                'level': stats_data.level,
+                'exp': 0,  # Level is stored, raw experience is not kept on the model
+                'wins': overall.wins,
+                'losses': overall.losses,
+                'wlr': overall.wlr,
+                'finals': overall.final_kills,
+                'final_deaths': overall.final_deaths,
+                'fkdr': overall.fkdr,
+                'beds_broken': overall.beds_broken,
+                'beds_lost': overall.beds_lost,
+                'bblr': overall.bblr,
+                'kills': overall.kills,
+                'deaths': overall.deaths,
+                'kdr': overall.kdr,
+                'winrate': overall.win_rate,
+                'finals_per_star': stats_data.finals_per_star,
+                'detailed_stats': json.dumps(stats_data.to_dict())
+            })
             
             # Insert stats
             self.client.table('stats').insert(stats_record).execute()
@@ -196,35 +217,6 @@ class SupabaseHandler:
             logger.error(f"Error saving stats to Supabase: {e}")
     
     
-    def _calculate_ratio(self, numerator: int, denominator: int) -> float:
-        """Calculate ratio safely"""
-        if denominator == 0:
-            return float(numerator)
-        return round(numerator / denominator, 2)
-    
-    def _safe_int(self, value) -> int:
-        """Safely convert value to int"""
-        if value is None:
-            return 0
-        try:
-            # Handle string numbers that might have commas
-            if isinstance(value, str):
-                value = value.replace(',', '')
-            return int(float(value))
-        except (ValueError, TypeError):
-            return 0
-    
-    def _safe_float(self, value) -> float:
-        """Safely convert value to float"""
-        if value is None:
-            return 0.0
-        try:
-            if isinstance(value, str):
-                value = value.replace(',', '')
-            return float(value)
-        except (ValueError, TypeError):
-            return 0.0
-    
     def _format_stats_response(self, stats: Dict[str, Any]) -> Dict[str, Any]:
         """Format stats from database to match app response format"""
         detailed = json.loads(stats.get('detailed_stats', '{}'))
@@ -264,5 +256,5 @@ class SupabaseHandler:
         
         return response
 
-# Create singleton instance
+# Create singleton instance (cheap: the client is only created on first use)
 supabase_handler = SupabaseHandler()
\ No newline at end of file
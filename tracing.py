@@ -0,0 +1,119 @@
+"""
+Per-request trace timelines.
+
+A trace is a tree of timed spans (outbound calls, retries, sleeps, parsing,
+rendering) collected for the current request through a context variable.
+Outside an active trace `span()` is a no-op, so instrumented code pays almost
+nothing when tracing is off.
+"""
+
+import contextvars
+import logging
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_current_span = contextvars.ContextVar('lava_current_span', default=None)
+
+
+class Span:
+    """One timed step of a request, with nested child steps."""
+
+    __slots__ = ('name', 'attrs', 'start', 'end', 'children')
+
+    def __init__(self, name: str, attrs: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.attrs = attrs or {}
+        self.start = time.perf_counter()
+        self.end = None
+        self.children: List['Span'] = []
+
+    @property
+    def duration(self) -> float:
+        end = self.end if self.end is not None else time.perf_counter()
+        return end - self.start
+
+    def to_dict(self, origin: Optional[float] = None) -> Dict[str, Any]:
+        origin = self.start if origin is None else origin
+        data = {
+            'name': self.name,
+            'start_ms': round((self.start - origin) * 1000, 2),
+            'duration_ms': round(self.duration * 1000, 2),
+        }
+        if self.attrs:
+            data['attrs'] = self.attrs
+        if self.children:
+            data['children'] = [child.to_dict(origin) for child in self.children]
+        return data
+
+
+def start_trace(name: str, **attrs):
+    """Makes a new root span current; returns (root, token) for finish_trace."""
+    root = Span(name, attrs)
+    return root, _current_span.set(root)
+
+
+def finish_trace(root: Span, token):
+    root.end = time.perf_counter()
+    _current_span.reset(token)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Records the enclosed block as a child of the current span, if a trace is active."""
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    child = Span(name, attrs)
+    parent.children.append(child)
+    token = _current_span.set(child)
+    try:
+        yield child
+    finally:
+        child.end = time.perf_counter()
+        _current_span.reset(token)
+
+
+def sleep(seconds: float, reason: str = 'sleep'):
+    """time.sleep that shows up in the trace timeline."""
+    with span('sleep', reason=reason, seconds=round(seconds, 3)):
+        time.sleep(seconds)
+
+
+def server_timing(root: Span) -> str:
+    """Server-Timing header value summing span durations by name."""
+    totals: Dict[str, float] = {}
+    stack = list(root.children)
+    while stack:
+        node = stack.pop()
+        totals[node.name] = totals.get(node.name, 0.0) + node.duration
+        stack.extend(node.children)
+    parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in sorted(totals.items())]
+    parts.append(f"total;dur={root.duration * 1000:.1f}")
+    return ", ".join(parts)
+
+
+def format_tree(root: Span) -> str:
+    """Indented text rendering of a trace, used for the slow-request log."""
+    lines = []
+
+    def walk(node: Span, depth: int):
+        attrs = " ".join(f"{key}={value}" for key, value in node.attrs.items())
+        lines.append(f"{'  ' * depth}{node.name} {node.duration * 1000:.1f}ms {attrs}".rstrip())
+        for child in node.children:
+            walk(child, depth + 1)
+
+    walk(root, 0)
+    return "\n".join(lines)
+
+
+def log_slow_trace(root: Span, threshold: float):
+    if threshold > 0 and root.duration >= threshold:
+        logger.warning(f"Slow request ({root.duration:.2f}s >= {threshold:.2f}s):\n{format_tree(root)}")
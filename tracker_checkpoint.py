@@ -0,0 +1,153 @@
+"""
+Checkpoints of single-process LavaTracker sweeps.
+
+track_all_players records every batch's results as it goes, in the
+tracker_checkpoints table (create_tracker_checkpoints_table.sql) and in a
+local file (TRACKER_CHECKPOINT_PATH). When a sweep crashes or the tracker is
+redeployed, the next run finds the unfinished checkpoint and only tracks the
+players it does not list as tracked, instead of spending the Hypixel budget
+on the whole players table again. Players whose fetch or save failed are
+retried on resume. A checkpoint older than TRACKER_CHECKPOINT_MAX_AGE, or one
+whose sweep finished, is not resumed; the next run starts a new sweep.
+
+Supabase is the checkpoint of record, since hosts like Render wipe the
+filesystem on every deploy. The file is only read when Supabase cannot be
+reached at start, so it only helps a run restarted on the same disk. Results
+that could not be sent to Supabase are sent again with the next batch.
+
+Sharded sweeps (tracker_leases.py) keep their state in tracker_leases instead.
+"""
+
+import datetime
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, Optional
+
+from config import TRACKER_CHECKPOINT_MAX_AGE, TRACKER_CHECKPOINT_PATH
+
+logger = logging.getLogger(__name__)
+
+
+class SweepCheckpoint:
+    """Players tracked and failed so far in one sweep, saved to Supabase and a JSON file after every batch."""
+
+    def __init__(self, path: str, started_at: Optional[float] = None, tracked=(), failed=(), elapsed: float = 0.0,
+                 client=None, synced: bool = False):
+        self.path = path
+        self.client = client
+        self.started_at = time.time() if started_at is None else started_at
+        started = datetime.datetime.fromtimestamp(self.started_at, datetime.timezone.utc)
+        self.sweep_id = started.strftime('%Y-%m-%dT%H:%M:%SZ')
+        self.tracked = set(tracked)
+        self.failed = set(failed) - self.tracked
+        # Results not yet in Supabase: everything, unless the checkpoint was loaded from there
+        self._unsynced_tracked = set() if synced else set(self.tracked)
+        self._unsynced_failed = set() if synced else set(self.failed)
+        # Seconds spent by earlier runs of this sweep; this run's are added on save
+        self.elapsed = elapsed
+        self.finished_at = None
+        self.resumed = bool(self.tracked or self.failed)
+        self._run_started = time.monotonic()
+        self._run_tracked = 0
+        self._run_failed = 0
+
+    @classmethod
+    def resume_or_start(cls, path: str = TRACKER_CHECKPOINT_PATH, max_age: float = TRACKER_CHECKPOINT_MAX_AGE,
+                        client=None) -> 'SweepCheckpoint':
+        """
+        The newest unfinished sweep if it is recent enough, otherwise a new one. The sweep is read from Supabase
+        when `client` is given, and from the file at `path` only when Supabase cannot be reached.
+        """
+        data = None
+        synced = False
+        if client is not None:
+            try:
+                rows = client.rpc('latest_tracker_checkpoint', {}).execute().data
+                data = rows[0] if rows else {}
+                synced = True
+            except Exception as e:
+                logger.warning(f"Could not read the tracker checkpoint from Supabase, falling back to {path}: {e}")
+        if data is None and os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    data = json.load(f)
+            except Exception as e:
+                logger.error(f"Error reading tracker checkpoint {path}: {e}")
+        if not data or data.get('finished_at') or time.time() - data.get('started_at', 0) > max_age:
+            return cls(path, client=client)
+        return cls(path, data['started_at'], data.get('tracked') or [], data.get('failed') or [],
+                   data.get('elapsed') or 0.0, client=client, synced=synced)
+
+    def record(self, results: Dict[str, bool]):
+        """Adds one batch's {uuid: saved} results."""
+        for uuid, ok in results.items():
+            if ok:
+                self.tracked.add(uuid)
+                self.failed.discard(uuid)
+                self._unsynced_tracked.add(uuid)
+                self._unsynced_failed.discard(uuid)
+                self._run_tracked += 1
+            else:
+                self.failed.add(uuid)
+                self._unsynced_failed.add(uuid)
+                self._run_failed += 1
+
+    def finish(self):
+        self.finished_at = time.time()
+        self.save()
+
+    def _run_seconds(self) -> float:
+        return time.monotonic() - self._run_started
+
+    def save(self):
+        """
+        Sends the results recorded since the last successful save to Supabase, then writes the local file
+        atomically, so a crash mid-write leaves the previous one intact.
+        """
+        elapsed = self.elapsed + self._run_seconds()
+        if self.client is not None:
+            try:
+                self.client.rpc('record_tracker_checkpoint', {
+                    'p_sweep_id': self.sweep_id,
+                    'p_started_at': self.started_at,
+                    'p_elapsed': elapsed,
+                    'p_tracked': sorted(self._unsynced_tracked),
+                    'p_failed': sorted(self._unsynced_failed),
+                    'p_finished': self.finished_at is not None,
+                }).execute()
+                self._unsynced_tracked.clear()
+                self._unsynced_failed.clear()
+            except Exception as e:
+                logger.error(f"Failed to save tracker checkpoint to Supabase, retrying with the next batch: {e}")
+        data = {
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'elapsed': elapsed,
+            'tracked': sorted(self.tracked),
+            'failed': sorted(self.failed),
+        }
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.error(f"Failed to save tracker checkpoint: {e}")
+
+    def summary(self, remaining: int) -> Dict[str, Any]:
+        """Counts for the sweep and for this run, with this run's throughput in players per minute."""
+        run_seconds = self._run_seconds()
+        processed = self._run_tracked + self._run_failed
+        return {
+            'tracked': len(self.tracked),
+            'failed': len(self.failed),
+            'remaining': remaining,
+            'run_tracked': self._run_tracked,
+            'run_failed': self._run_failed,
+            'run_seconds': round(run_seconds, 1),
+            'sweep_seconds': round(self.elapsed + run_seconds, 1),
+            'players_per_minute': round(processed / run_seconds * 60, 1) if run_seconds > 0 else 0.0,
+        }
@@ -0,0 +1,168 @@
+"""
+Lease-based work distribution for sharded LavaTracker sweeps.
+
+A sweep splits the players table into numbered batches in the tracker_leases
+table (create_tracker_leases_table.sql). Any number of workers, on one host
+or many, join the same sweep and repeatedly claim the next free batch. A
+claim is a lease: it holds for TRACKER_LEASE_SECONDS and is renewed by a
+heartbeat while the worker tracks the batch, then the batch is marked done.
+
+Workers started without TRACKER_SWEEP_ID / --sweep-id join the newest sweep
+that still has work left (join_tracker_sweep), and only start a new one when
+there is none, so a worker restarted at any time continues the sweep it left.
+
+If a worker crashes or hangs, its lease runs out and the batch is claimed
+again by another worker, so the sweep finishes. A worker treats its lease as
+lost once a renewal is refused or none has succeeded for two thirds of the
+lease period, and stops fetching that batch before its next player, which
+leaves a margin before another worker can claim it. Delivery is still
+at-least-once: a player fetch that outlasts the margin, or a crash between
+saving and completing a batch, means some players are tracked twice. Claims
+happen in the database with FOR UPDATE SKIP LOCKED, so workers don't block
+each other and throughput scales with their number (within the Hypixel keys'
+budget).
+"""
+
+import datetime
+import logging
+import os
+import socket
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from config import TRACKER_LEASE_SECONDS, TRACKER_MAX_ATTEMPTS, TRACKER_WORKER_ID
+
+logger = logging.getLogger(__name__)
+
+# Attempts of each lease call before the error is raised; transient Supabase errors shouldn't end a worker
+CALL_ATTEMPTS = 3
+
+# Share of the lease period after the last successful renewal at which a worker gives the batch up,
+# leaving the rest of the period for the player in flight to finish before another worker may claim it
+LEASE_SAFETY_MARGIN = 2 / 3
+
+
+def new_sweep_id() -> str:
+    """Id for a sweep started now: the UTC start time, unique per sweep and sortable."""
+    return datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def default_worker_id() -> str:
+    """TRACKER_WORKER_ID, or host:pid, which is unique across the workers of a sweep."""
+    return TRACKER_WORKER_ID or f"{socket.gethostname()}:{os.getpid()}"
+
+
+class SweepLeases:
+    """One worker's view of a sweep: creating it, claiming, renewing and completing batches."""
+
+    def __init__(self, client, sweep_id: Optional[str], worker_id: str,
+                 lease_seconds: int = TRACKER_LEASE_SECONDS, max_attempts: int = TRACKER_MAX_ATTEMPTS):
+        self.client = client
+        self.sweep_id = sweep_id
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+    def _call(self, function: str, params: Dict[str, Any], with_sweep_id: bool = True):
+        if with_sweep_id:
+            params = {'p_sweep_id': self.sweep_id, **params}
+        for attempt in range(CALL_ATTEMPTS):
+            try:
+                return self.client.rpc(function, params).execute().data
+            except Exception as e:
+                if attempt == CALL_ATTEMPTS - 1:
+                    raise
+                logger.warning(f"{function} failed for sweep {self.sweep_id}, retrying: {e}")
+                time.sleep(2 ** attempt)
+
+    def create(self, batch_size: int) -> int:
+        """Splits the players table into batches unless the sweep exists already; returns its batch count."""
+        return self._call('create_tracker_sweep', {'p_batch_size': batch_size}) or 0
+
+    def join(self, batch_size: int) -> str:
+        """
+        Sets sweep_id to the sweep this worker works on and returns it: the explicit sweep_id (created if needed),
+        otherwise the newest unfinished sweep, or a new one when every sweep is finished.
+        """
+        if self.sweep_id:
+            self.create(batch_size)
+        else:
+            self.sweep_id = self._call('join_tracker_sweep', {
+                'p_new_sweep_id': new_sweep_id(), 'p_batch_size': batch_size, 'p_max_attempts': self.max_attempts,
+            }, with_sweep_id=False)
+        return self.sweep_id
+
+    def claim(self) -> Optional[Dict[str, Any]]:
+        """Leases the next free or expired batch ({'batch_no', 'uuids', 'attempts', ...}); None when none is left."""
+        rows = self._call('claim_tracker_batch', {
+            'p_worker': self.worker_id, 'p_lease_seconds': self.lease_seconds, 'p_max_attempts': self.max_attempts,
+        })
+        return rows[0] if rows else None
+
+    def renew(self, batch_no: int) -> bool:
+        """Extends the lease on `batch_no`; False if this worker no longer holds it."""
+        return bool(self._call('renew_tracker_lease', {
+            'p_batch_no': batch_no, 'p_worker': self.worker_id, 'p_lease_seconds': self.lease_seconds,
+        }))
+
+    def complete(self, batch_no: int, tracked: int, failed: int) -> bool:
+        """Marks `batch_no` done; False if this worker no longer held it."""
+        return bool(self._call('complete_tracker_batch', {
+            'p_batch_no': batch_no, 'p_worker': self.worker_id, 'p_tracked': tracked, 'p_failed': failed,
+        }))
+
+    def progress(self) -> List[Dict[str, Any]]:
+        """Batches, players, tracked and failed counts per status (pending, leased, expired, done)."""
+        return self._call('tracker_sweep_progress', {}) or []
+
+    def hold(self, batch: Dict[str, Any]) -> 'Lease':
+        return Lease(self, batch['batch_no'])
+
+
+class Lease:
+    """
+    Context manager that renews a claimed batch's lease in the background, three times per lease period.
+    `lost` turns true once a renewal is refused, or when no renewal has succeeded for LEASE_SAFETY_MARGIN of
+    the lease period (Supabase unreachable or the heartbeat stuck in a slow call), so the worker stops before
+    the lease can expire and another worker claim the batch.
+    """
+
+    def __init__(self, leases: SweepLeases, batch_no: int):
+        self.leases = leases
+        self.batch_no = batch_no
+        self._refused = False
+        self._renewed_at = time.monotonic()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self) -> 'Lease':
+        self._thread = threading.Thread(target=self._heartbeat, name=f'lease_{self.batch_no}', daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+    @property
+    def lost(self) -> bool:
+        # Checked on every read rather than by the heartbeat, which may itself be blocked in a renewal
+        overdue = time.monotonic() - self._renewed_at >= self.leases.lease_seconds * LEASE_SAFETY_MARGIN
+        return self._refused or overdue
+
+    def _heartbeat(self):
+        interval = self.leases.lease_seconds / 3
+        while not self._stop.wait(interval) and not self.lost:
+            # The server extends the lease from when it runs the renewal, not from when the reply arrives
+            started = time.monotonic()
+            try:
+                if self.leases.renew(self.batch_no):
+                    self._renewed_at = started
+                else:
+                    self._refused = True
+            except Exception as e:
+                logger.error(f"Error renewing lease on batch {self.batch_no}: {e}")
+            if self.lost:
+                logger.warning(f"Lost the lease on batch {self.batch_no} of sweep {self.leases.sweep_id}")